@@ -0,0 +1,55 @@
+"""Add report query indexes
+
+Revision ID: a7c4e2f91b3d
+Revises: 3833764abdcb
+Create Date: 2025-09-15 10:12:41.508372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e2f91b3d'
+down_revision: Union[str, Sequence[str], None] = '3833764abdcb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nombre, tabla, columnas, opciones); deben coincidir con __table_args__ de app/db/models.py
+INDEXES = [
+    ('ix_projects_name', 'projects', ['name'], {}),
+    ('ix_reports_created_by_created_at', 'reports', ['created_by', 'created_at', 'id'], {}),
+    ('ix_reports_project_id_created_at', 'reports', ['project_id', 'created_at', 'id'], {}),
+    ('ix_reports_id_version', 'reports', ['id'], {'postgresql_include': ['created_at', 'updated_at']}),
+    ('ix_report_sections_report_id_severity', 'report_sections', ['report_id', 'severity'], {}),
+    ('ix_report_analytics_report_id', 'report_analytics', ['report_id'], {}),
+]
+
+
+def _drop_if_invalid(name: str) -> None:
+    """Un CREATE INDEX CONCURRENTLY interrumpido deja el índice INVALID: eliminarlo para reintentar"""
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY no bloquea escrituras, pero no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            _drop_if_invalid(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
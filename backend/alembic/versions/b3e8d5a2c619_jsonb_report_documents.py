@@ -0,0 +1,72 @@
+"""JSONB report documents
+
+Revision ID: b3e8d5a2c619
+Revises: a7c4e2f91b3d
+Create Date: 2025-09-22 09:41:17.203554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8d5a2c619'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e2f91b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tabla, columna) que pasan de json a jsonb
+COLUMNS = [
+    ('reports', 'sections_data'),
+    ('reports', 'raw_data'),
+    ('report_sections', 'data'),
+]
+
+# (nombre, columnas o expresiones, opciones); deben coincidir con app/db/models.py
+# (__table_args__ de Report e INDEXED_RAW_FIELDS)
+INDEXES = [
+    ('ix_reports_raw_data', ['raw_data'], {'postgresql_using': 'gin', 'postgresql_ops': {'raw_data': 'jsonb_path_ops'}}),
+    ('ix_reports_sections_data', ['sections_data'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'sections_data': 'jsonb_path_ops'}}),
+    ('ix_reports_raw_data_ubicacion', [sa.text("(raw_data ->> 'ubicacion')")], {}),
+    ('ix_reports_raw_data_tipo_contrato', [sa.text("(raw_data ->> 'tipo_contrato')")], {}),
+]
+
+
+def _drop_if_invalid(name: str) -> None:
+    """Un CREATE INDEX CONCURRENTLY interrumpido deja el índice INVALID: eliminarlo para reintentar"""
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El cambio de tipo reescribe la tabla con un lock exclusivo: ejecutar en una
+    # ventana de mantenimiento. Falla si algún documento contiene \u0000 (jsonb no lo admite)
+    for table, column in COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), existing_type=sa.JSON(),
+                        postgresql_using=f'{column}::jsonb')
+
+    with op.get_context().autocommit_block():
+        for name, columns, options in INDEXES:
+            _drop_if_invalid(name)
+            op.create_index(name, 'reports', columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='reports', postgresql_concurrently=True, if_exists=True)
+
+    for table, column in reversed(COLUMNS):
+        op.alter_column(table, column, type_=sa.JSON(), existing_type=postgresql.JSONB(),
+                        postgresql_using=f'{column}::json')
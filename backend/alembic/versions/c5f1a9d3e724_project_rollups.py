@@ -0,0 +1,69 @@
+"""Project rollups
+
+Revision ID: c5f1a9d3e724
+Revises: b3e8d5a2c619
+Create Date: 2025-09-29 10:12:48.516307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f1a9d3e724'
+down_revision: Union[str, Sequence[str], None] = 'b3e8d5a2c619'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Backfill con los informes existentes; equivale a `python -m app.db.rollups`
+BACKFILL_SQL = """
+INSERT INTO project_rollups (
+    project_id, report_count, latest_report_id, latest_report_at, latest_execution_pct,
+    worst_severity_rank, risk_score_sum, risk_score_count, updated_at
+)
+SELECT project_id, count(*),
+       (array_agg(id ORDER BY created_at DESC, id DESC))[1],
+       max(created_at),
+       (array_agg(execution_pct ORDER BY created_at DESC, id DESC))[1],
+       max(worst_rank), coalesce(sum(risk_score), 0), count(risk_score), now()
+FROM (
+    SELECT r.project_id, r.id, r.created_at, s.worst_rank,
+           a.budget_efficiency * 100 AS execution_pct, a.risk_score
+    FROM reports r
+    LEFT JOIN LATERAL (
+        SELECT max(CASE severity WHEN 'CRITICAL' THEN 2 WHEN 'WARNING' THEN 1 WHEN 'INFO' THEN 0 END) AS worst_rank
+        FROM report_sections WHERE report_id = r.id
+    ) s ON true
+    LEFT JOIN report_analytics a ON a.report_id = r.id
+    WHERE r.project_id IS NOT NULL
+) report_rows
+GROUP BY project_id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('project_rollups',
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('latest_report_id', sa.UUID(), nullable=True),
+    sa.Column('latest_report_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('latest_execution_pct', sa.Float(), nullable=True),
+    sa.Column('worst_severity_rank', sa.Integer(), nullable=True),
+    sa.Column('risk_score_sum', sa.Float(), nullable=False),
+    sa.Column('risk_score_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+    # Los informes guardados durante el backfill esperan a que termine la migración
+    op.execute("LOCK TABLE reports IN SHARE MODE")
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('project_rollups')
@@ -0,0 +1,169 @@
+"""Partition reports by month
+
+Revision ID: d8a2f6c4b917
+Revises: c5f1a9d3e724
+Create Date: 2025-10-06 08:55:31.904172
+
+"""
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a2f6c4b917'
+down_revision: Union[str, Sequence[str], None] = 'c5f1a9d3e724'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Claves foráneas hacia reports.id (tabla, nombre): en una tabla particionada la clave
+# única debe incluir created_at, así que se reemplazan por report_fkey sobre
+# (report_created_at, report_id), la fecha del informe copiada en cada fila hija
+REFERENCING_FKS = [
+    ('report_sections', 'report_sections_report_id_fkey'),
+    ('report_analytics', 'report_analytics_report_id_fkey'),
+]
+
+# Claves foráneas de reports (nombre, tabla referida, columna); se recrean en la tabla nueva
+REPORT_FKS = [
+    ('reports_project_id_fkey', 'projects', 'project_id'),
+    ('reports_created_by_fkey', 'users', 'created_by'),
+]
+
+# Particiones creadas por adelantado; las siguientes las crea la aplicación (app/db/partitions.py).
+# Los helpers de esta revisión son una copia fija de los de ese módulo en esta versión del esquema
+MONTHS_AHEAD = 3
+
+_INDEX_DEFINITION = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (USING .*)$")
+
+
+def _month_start(value: Optional[datetime] = None) -> datetime:
+    value = (value or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _index_definitions(bind, table: str) -> List[Tuple[str, str]]:
+    """(nombre, CREATE INDEX) de los índices de `table` salvo la clave primaria"""
+    rows = bind.execute(sa.text(
+        "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary ORDER BY c.relname"
+    ), {'table': table})
+    return [(name, definition) for name, definition in rows]
+
+
+def _copy_index(definition: str, name: str, table: str) -> str:
+    """La definición de un índice (pg_get_indexdef) aplicada a otra tabla con otro nombre"""
+    match = _INDEX_DEFINITION.match(definition)
+    if match is None:
+        raise ValueError(f"Definición de índice no reconocida: {definition}")
+    return f"CREATE {match.group(1) or ''}INDEX {name} ON {table} {match.group(2)}"
+
+
+def _create_partitions(bind, table: str, first: Optional[datetime]) -> None:
+    """Particiones mensuales de `table` desde el mes de `first` hasta MONTHS_AHEAD meses después del actual"""
+    indexes = _index_definitions(bind, table)
+    month, last = _month_start(first), _add_months(_month_start(), MONTHS_AHEAD)
+    while month <= last:
+        name = f'{table}_p{month:%Y%m}'
+        op.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+        for index, definition in indexes:
+            op.execute(_copy_index(definition, f'{index}{name[len(table):]}', name))
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+
+def _partition(table: str, child: bool = False) -> None:
+    """
+    Reemplazar `table` por una tabla particionada por mes con las mismas columnas,
+    índices y filas. Las tablas hijas de reports (`child`) ganan la columna
+    report_created_at y se particionan por ella: cada fila queda en la partición
+    del mes de su informe.
+    """
+    bind = op.get_bind()
+    old = f'{table}_unpartitioned'
+    key = 'report_created_at' if child else 'created_at'
+    if not child:
+        op.execute(f'UPDATE {table} SET created_at = now() WHERE created_at IS NULL')
+    op.rename_table(table, old)
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {old}_pkey')
+    indexes = _index_definitions(bind, old)
+    for name, _ in indexes:
+        op.drop_index(name, table_name=old)
+
+    columns = ', report_created_at timestamptz DEFAULT now() NOT NULL' if child else ''
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS{columns}) PARTITION BY RANGE ({key})')
+    op.create_primary_key(f'{table}_pkey', table, [key, 'id'])
+    for name, definition in indexes:
+        op.execute(_copy_index(definition, name, table))
+
+    # Las filas hijas sin informe (report_id nulo) conservan su propia fecha
+    source = (
+        f'SELECT o.*, coalesce(r.created_at, o.created_at, now()) AS report_created_at '
+        f'FROM {old} o LEFT JOIN reports r ON r.id = o.report_id'
+    ) if child else f'SELECT * FROM {old}'
+    # Particiones desde el mes de la fila más antigua (las crea con los índices de la tabla padre)
+    first = bind.execute(sa.text(f'SELECT min({key}) FROM ({source}) AS source')).scalar()
+    _create_partitions(bind, table, first)
+
+    op.execute(f'INSERT INTO {table} {source}')
+    op.drop_table(old)
+
+
+def _unpartition(table: str, child: bool = False) -> None:
+    """Reemplazar la tabla particionada `table` por una tabla simple con los mismos índices y filas"""
+    bind = op.get_bind()
+    old = f'{table}_partitioned'
+    op.rename_table(table, old)
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {old}_pkey')
+    indexes = _index_definitions(bind, old)
+
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    op.drop_table(old)
+    if child:
+        op.drop_column(table, 'report_created_at')
+    op.alter_column(table, 'created_at', nullable=True, existing_type=sa.DateTime(timezone=True))
+    op.create_primary_key(f'{table}_pkey', table, ['id'])
+    for name, definition in indexes:
+        op.execute(_copy_index(definition, name, table))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Reescribe las tres tablas (INSERT ... SELECT de una vez) con un lock exclusivo de principio a
+    # fin, y valida las claves foráneas nuevas leyendo las tablas hijas: ejecutar en una ventana de
+    # mantenimiento. Por lotes no se acortaría el lock, que dura hasta el commit de la migración
+    for table, name in REFERENCING_FKS:
+        op.drop_constraint(name, table, type_='foreignkey')
+    _partition('reports')
+    for name, referred, column in REPORT_FKS:
+        op.create_foreign_key(name, 'reports', referred, [column], ['id'])
+    for table, _ in REFERENCING_FKS:
+        _partition(table, child=True)
+        op.create_foreign_key(
+            f'{table}_report_fkey', table, 'reports',
+            ['report_created_at', 'report_id'], ['created_at', 'id'], ondelete='CASCADE',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _ in REFERENCING_FKS:
+        _unpartition(table, child=True)
+    _unpartition('reports')
+    for name, referred, column in REPORT_FKS:
+        op.create_foreign_key(name, 'reports', referred, [column], ['id'])
+    for table, name in REFERENCING_FKS:
+        op.create_foreign_key(name, table, 'reports', ['report_id'], ['id'])
@@ -0,0 +1,97 @@
+"""Unique normalized project name
+
+Revision ID: e2b7c9a4f183
+Revises: d8a2f6c4b917
+Create Date: 2025-10-13 09:21:07.635518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c9a4f183'
+down_revision: Union[str, Sequence[str], None] = 'd8a2f6c4b917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Igual que app.db.models.normalized_project_name
+NORMALIZED_NAME = r"lower(btrim(regexp_replace(name, '\s+', ' ', 'g')))"
+
+# Proyectos duplicados (mismo nombre normalizado) -> el más antiguo, que se conserva
+MERGES_SQL = f"""
+CREATE TEMPORARY TABLE project_merges ON COMMIT DROP AS
+SELECT id AS duplicate_id, keep_id
+FROM (
+    SELECT id, first_value(id) OVER (
+        PARTITION BY {NORMALIZED_NAME} ORDER BY created_at NULLS LAST, id
+    ) AS keep_id
+    FROM projects
+) ranked
+WHERE id <> keep_id
+"""
+
+# Reconstrucción de todos los rollups (copia fija de app.db.rollups.REBUILD_SQL en esta versión del esquema)
+REBUILD_SQL = """
+WITH report_rows AS (
+    SELECT r.project_id, r.id, r.created_at, s.worst_rank,
+           a.budget_efficiency * 100 AS execution_pct, a.risk_score
+    FROM reports r
+    LEFT JOIN LATERAL (
+        SELECT max(CASE severity WHEN 'CRITICAL' THEN 2 WHEN 'WARNING' THEN 1 WHEN 'INFO' THEN 0 END) AS worst_rank
+        FROM report_sections WHERE report_id = r.id
+    ) s ON true
+    LEFT JOIN report_analytics a ON a.report_id = r.id
+    WHERE r.project_id IS NOT NULL
+)
+INSERT INTO project_rollups (
+    project_id, report_count, latest_report_id, latest_report_at, latest_execution_pct,
+    worst_severity_rank, risk_score_sum, risk_score_count, updated_at
+)
+SELECT project_id, count(*),
+       (array_agg(id ORDER BY created_at DESC, id DESC))[1],
+       max(created_at),
+       (array_agg(execution_pct ORDER BY created_at DESC, id DESC))[1],
+       max(worst_rank), coalesce(sum(risk_score), 0), count(risk_score), now()
+FROM report_rows
+GROUP BY project_id
+ON CONFLICT (project_id) DO UPDATE SET
+    report_count = excluded.report_count,
+    latest_report_id = excluded.latest_report_id,
+    latest_report_at = excluded.latest_report_at,
+    latest_execution_pct = excluded.latest_execution_pct,
+    worst_severity_rank = excluded.worst_severity_rank,
+    risk_score_sum = excluded.risk_score_sum,
+    risk_score_count = excluded.risk_score_count,
+    updated_at = excluded.updated_at
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Los proyectos creados durante la fusión esperan a que termine la migración
+    op.execute("LOCK TABLE projects IN SHARE ROW EXCLUSIVE MODE")
+    op.execute(MERGES_SQL)
+    merged = bind.execute(sa.text("SELECT count(*) FROM project_merges")).scalar()
+    if merged:
+        op.execute("""
+            UPDATE reports r SET project_id = m.keep_id
+            FROM project_merges m WHERE r.project_id = m.duplicate_id
+        """)
+        op.execute("DELETE FROM project_rollups WHERE project_id IN (SELECT duplicate_id FROM project_merges)")
+        op.execute("DELETE FROM projects WHERE id IN (SELECT duplicate_id FROM project_merges)")
+        op.execute(REBUILD_SQL)
+
+    op.drop_index('ix_projects_name', table_name='projects')
+    op.create_index('ix_projects_name_key', 'projects', [sa.text(NORMALIZED_NAME)], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Los proyectos fusionados no se separan de nuevo
+    op.drop_index('ix_projects_name_key', table_name='projects')
+    op.create_index('ix_projects_name', 'projects', ['name'])
@@ -9,9 +9,12 @@ import redis.asyncio as redis
 import time
 import psutil
 import os
-from app.db.session import get_db_optional
+from app.db.pool import pool_monitor
+from app.db.session import get_db_optional, pool_stats, read_routing_stats
 from app.core.config import settings
 from app.core.metrics import metrics_collector
+from app.core.profiling import memory_profiler
+from app.core.single_flight import single_flight_stats
 
 router = APIRouter()
 
@@ -53,11 +56,18 @@ async def detailed_health(db: AsyncSession = Depends(get_db_optional)):
                 "response_time": f"{db_response_time}ms"
             }
         except Exception as e:
-            health_status["checks"]["database"] = {
-                "status": "unhealthy",
-                "error": str(e)
-            }
-            overall_healthy = False
+            if not pool_monitor.available():
+                # No se pudo conectar: igual que sin BD (es opcional)
+                health_status["checks"]["database"] = {
+                    "status": "unavailable",
+                    "error": str(e)
+                }
+            else:
+                health_status["checks"]["database"] = {
+                    "status": "unhealthy",
+                    "error": str(e)
+                }
+                overall_healthy = False
     else:
         health_status["checks"]["database"] = {
             "status": "unavailable",
@@ -131,5 +141,17 @@ async def get_metrics():
     return {
         "timestamp": int(time.time()),
         "system": system_info,
-        "application_metrics": metrics_summary
+        "application_metrics": metrics_summary,
+        "single_flight": single_flight_stats(),
+        "database_pool": pool_stats(),
+        "database_reads": read_routing_stats()
     }
+
+@router.get("/metrics/memory", tags=["Health"], summary="Perfiles de Memoria Muestreados")
+async def get_memory_profiles():
+    """
+    Perfiles de memoria de los análisis de IA muestreados con tracemalloc:
+    pico y memoria retenida por etapa y principales sitios de asignación.
+    Se activa con PROFILING_ENABLED y PROFILING_SAMPLE_RATE.
+    """
+    return memory_profiler.get_summary()
@@ -1,29 +1,96 @@
 # Fichero: backend/app/api/endpoints/reports.py
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Path, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 import tempfile
 import os
 import pandas as pd
-from typing import Optional
+from typing import Optional, Tuple
+from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.report import GeneratedReport
 from app.services.report_generator import ReportGeneratorService
 from app.services.enhanced_report_service import EnhancedReportService
 from app.services.intelligent_report_service import IntelligentReportService
-from app.services.ai_intelligence_engine import ContractIntelligenceEngine
-from app.db.session import get_db_optional
+from app.services.ai_intelligence_engine import get_intelligence_engine
+from app.services.portfolio_delta import portfolio_delta_service, compute_contract_keys
+from app.services.report_jobs import REPORT_JOB
+from app.services.xlsx_export import XLSX_MEDIA_TYPE, write_reports_xlsx
+from app.services.pdf_export import PDF_MEDIA_TYPE, pdf_export_service
+from app.db.session import get_db, get_db_optional, get_db_read
 from app.db.models import User
+from app.db.partitions import months_ago
+from app.db.rollups import rollup_summary
 # from app.core.rate_limiter import rate_limit  # DESHABILITADO TEMPORALMENTE
 # from app.core.metrics import measure_execution_time, record_api_call  # DESHABILITADO TEMPORALMENTE
 from app.core.logging.config import get_logger
+from app.core.config import settings
+from app.core.streaming import format_sse, SSE_HEADERS
+from app.core.serialization import FastJSONResponse, dumps, model_response
+from app.core.job_queue import job_queue, JOB_PRIORITIES, QueueFullError
+from app.core.artifact_cache import artifact_cache
+from app.core.fingerprint import content_fingerprint, dataframe_fingerprint
+from app.core.etag import etag_headers, etag_matches, not_modified, report_etag, weak_etag
 # from app.auth.dependencies import get_current_user_optional
 import uuid
 import time
 
 router = APIRouter()
 
+async def _read_upload_dataframe(file: UploadFile) -> Tuple[pd.DataFrame, str]:
+    """
+    Validar la extensión y leer el archivo subido como DataFrame.
+    Retorna el DataFrame y la extensión del archivo.
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Debe proporcionar un nombre de archivo")
+    
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in ['.xlsx', '.xls', '.csv']:
+        raise HTTPException(
+            status_code=400,
+            detail="Formato de archivo no soportado. Use Excel (.xlsx, .xls) o CSV (.csv)"
+        )
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
+        contents = await file.read()
+        temp_file.write(contents)
+        temp_file_path = temp_file.name
+    
+    try:
+        if file_ext == '.csv':
+            df = pd.read_csv(temp_file_path)
+        else:  # Excel
+            df = pd.read_excel(temp_file_path)
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error al procesar el archivo: {str(e)}"
+        )
+    finally:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+    
+    return df, file_ext
+
+def _contract_records(df: pd.DataFrame) -> list:
+    """Registros de contratos sin celdas vacías (los servicios aplican sus valores por defecto)"""
+    return [
+        {key: value for key, value in row.items() if not pd.isna(value)}
+        for row in df.to_dict(orient='records')
+    ]
+
+def _latency_budget_seconds(latency_budget_ms: Optional[int]) -> Optional[float]:
+    """Convertir el presupuesto de latencia recibido en milisegundos a segundos"""
+    if latency_budget_ms is None:
+        return None
+    if latency_budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget_ms debe ser mayor que cero")
+    return latency_budget_ms / 1000
+
 @router.post("/generate-simple", response_model=GeneratedReport, summary="Generar Informe Simple (Prueba)")
 async def generate_report_simple(
+    request: Request,
     file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con datos del contrato")
 ):
     """
@@ -44,9 +111,14 @@ async def generate_report_simple(
         )
     
     try:
+        contents = await file.read()
+        etag = report_etag(contents, "generate-simple")
+        if etag_matches(request, etag):
+            logger.info("Simple endpoint - Report not modified")
+            return not_modified(etag)
+        
         # Guardar archivo temporalmente
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-            contents = await file.read()
             temp_file.write(contents)
             temp_file_path = temp_file.name
         
@@ -81,11 +153,11 @@ async def generate_report_simple(
         
         # Generar informe usando el servicio inteligente de IA
         intelligent_service = IntelligentReportService()
-        report = intelligent_service.generate_intelligent_report(contract_data)
+        report = await intelligent_service.generate_intelligent_report(contract_data)
 
         logger.info("Simple endpoint - Intelligent report generation completed successfully")
         
-        return report
+        return model_response(report, headers=etag_headers(etag))
         
     except ValueError as e:
         logger.error(f"Simple endpoint - Validation error: {e}")
@@ -98,9 +170,11 @@ async def generate_report_simple(
 # @rate_limit(max_requests=10, window_seconds=60)  # 10 requests por minuto - DESHABILITADO TEMPORALMENTE
 # @measure_execution_time("generate_report_endpoint")  # DESHABILITADO TEMPORALMENTE
 async def generate_report_endpoint(
+    request: Request,
     file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con datos del contrato"),
     nombre_supervisor: Optional[str] = Form(None, description="Nombre del supervisor del proyecto"),
     nombre_proyecto: Optional[str] = Form(None, description="Nombre del proyecto"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis de IA en milisegundos"),
     # db: Optional[AsyncSession] = Depends(get_db_optional),  # DESHABILITADO TEMPORALMENTE
     # current_user: Optional[User] = Depends(get_current_user_optional)
 ):
@@ -111,6 +185,11 @@ async def generate_report_endpoint(
     - **Procesa**: Valida, extrae y analiza los datos según las reglas de negocio.
     - **Devuelve**: Un informe estructurado en formato JSON con mensajes técnicos.
     - **Guarda**: El informe en base de datos para análisis histórico.
+    - **Latencia**: Con `latency_budget_ms`, las etapas opcionales del análisis de IA
+      se omiten o se sirven desde cache cuando el presupuesto está por agotarse.
+    - **ETag**: La respuesta lleva un ETag débil derivado del archivo, los parámetros y
+      las versiones del motor y las reglas; con `If-None-Match` coincidente responde 304
+      sin regenerar el informe.
     
     **Seguridad**: Este endpoint procesa archivos subidos directamente, evitando 
     riesgos de seguridad asociados con la descarga de archivos desde URLs externas.
@@ -132,9 +211,14 @@ async def generate_report_endpoint(
         )
     
     try:
+        contents = await file.read()
+        etag = report_etag(contents, "generate", nombre_supervisor, nombre_proyecto, latency_budget_ms)
+        if etag_matches(request, etag):
+            logger.info(f"Report not modified for file: {file.filename}")
+            return not_modified(etag)
+        
         # Guardar archivo temporalmente
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-            contents = await file.read()
             temp_file.write(contents)
             temp_file_path = temp_file.name
         
@@ -193,14 +277,16 @@ async def generate_report_endpoint(
         
         # Usar el servicio inteligente de IA
         intelligent_service = IntelligentReportService()
-        report = await intelligent_service.generate_intelligent_report(contract_data)
+        report = await intelligent_service.generate_intelligent_report(
+            contract_data, latency_budget=_latency_budget_seconds(latency_budget_ms)
+        )
 
         # Registrar métricas y logging
         execution_time = time.time() - start_time
         logger.info(f"Intelligent report generation completed successfully in {execution_time:.2f}s")
         # record_api_call("/api/v1/reports/generate", "POST", 200, execution_time)  # DESHABILITADO TEMPORALMENTE
         
-        return report
+        return model_response(report, headers=etag_headers(etag))
         
     except ValueError as e:
         execution_time = time.time() - start_time
@@ -214,7 +300,7 @@ async def generate_report_endpoint(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {e}")
 
 @router.post("/generate-demo", response_model=GeneratedReport, summary="Generar Informe de Demostración")
-async def generate_demo_report():
+async def generate_demo_report(request: Request):
     """
     Endpoint de demostración que genera un informe con datos de ejemplo.
     Útil para probar la funcionalidad sin necesidad de un archivo Excel externo.
@@ -226,24 +312,127 @@ async def generate_demo_report():
         'fecha_fin_planificada': '2025-12-31',
         'porcentaje_avance_fisico': 85.0
     }
+    etag = report_etag(dumps(demo_data), "generate-demo")
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
     try:
         intelligent_service = IntelligentReportService()
         report = await intelligent_service.generate_intelligent_report(demo_data)
 
-        return report
+        return model_response(report, headers=etag_headers(etag))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generando informe de demostración: {e}")
 
-@router.post("/ai-analysis", summary="Análisis Avanzado de IA")
+@router.get("/stored", response_class=FastJSONResponse, summary="Listar Informes Guardados")
+async def list_stored_reports(
+    user_id: Optional[uuid.UUID] = Query(None, description="Informes creados por este usuario"),
+    project_id: Optional[uuid.UUID] = Query(None, description="Informes de este proyecto"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(settings.REPORT_PAGE_SIZE, ge=1, le=settings.REPORT_PAGE_MAX_SIZE),
+    fields: Optional[str] = Query(None, description="Columnas separadas por coma (p.ej. id,created_at,contract_type)"),
+    severity: Optional[str] = Query(None, description="Solo informes con alguna sección de esta severidad"),
+    ubicacion: Optional[str] = Query(None),
+    tipo_contrato: Optional[str] = Query(None),
+    months: Optional[int] = Query(None, ge=1, description="Solo informes de los últimos N meses (incluido el actual)"),
+    read_db: AsyncSession = Depends(get_db_read)
+):
+    """
+    Lista informes guardados de un usuario o de un proyecto, más recientes primero.
+
+    - **Paginación por cursor**: la respuesta incluye `next_cursor` (null en la última
+      página); el tiempo de respuesta no depende de la profundidad de la página.
+    - **fields**: por defecto se omiten `sections_data` y `raw_data`; pueden pedirse
+      explícitamente. `id` y `created_at` se incluyen siempre.
+    - **months**: acota la búsqueda a las particiones mensuales de esos meses.
+    - **Réplicas**: se lee de una réplica al día si hay (DATABASE_REPLICA_URLS); un
+      informe recién creado puede tardar hasta DB_REPLICA_MAX_LAG segundos en aparecer.
+    """
+    if user_id is None and project_id is None:
+        raise HTTPException(status_code=400, detail="Debe indicar user_id o project_id")
+
+    filters = {key: value for key, value in (('ubicacion', ubicacion), ('tipo_contrato', tipo_contrato)) if value}
+    try:
+        items, next_cursor = await EnhancedReportService(read_db).list_reports(
+            user_id=user_id,
+            project_id=project_id,
+            filters=filters,
+            severity=severity,
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields else None,
+            cursor=cursor,
+            limit=limit,
+            since=months_ago(months) if months else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@router.get("/stored/{report_id}", response_model=GeneratedReport, summary="Obtener Informe Guardado")
+async def get_stored_report(
+    report_id: uuid.UUID,
+    request: Request,
+    created_at: Optional[datetime] = Query(None, description="created_at del informe, tal como aparece en /stored"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Devuelve un informe guardado en base de datos.
+    
+    - **ETag**: Derivado del ID y de la versión del informe (última modificación);
+      con `If-None-Match` coincidente responde 304 sin cargar las secciones.
+    - **created_at**: opcional; con la fecha de creación del listado la búsqueda
+      consulta solo la partición mensual del informe en lugar de todas.
+    """
+    service = EnhancedReportService(db)
+    version = await service.get_report_version(report_id, created_at)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Informe no encontrado")
+    
+    etag = weak_etag(content_fingerprint(report_id.bytes, version.isoformat()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    stored = await service.get_report_by_id(report_id, created_at)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Informe no encontrado")
+    report = GeneratedReport(
+        contract_type=stored.contract_type,
+        year=stored.year,
+        context=stored.context,
+        sections=stored.sections_data or []
+    )
+    return model_response(report, headers=etag_headers(etag))
+
+@router.get("/projects/{project_id}/rollup", response_class=FastJSONResponse, summary="Resumen de un Proyecto")
+async def get_project_rollup(
+    project_id: uuid.UUID,
+    read_db: AsyncSession = Depends(get_db_read)
+):
+    """
+    Totales del proyecto para tableros: número de informes, ejecución del informe
+    más reciente, peor severidad y riesgo promedio.
+    
+    Se leen de la tabla de rollups (mantenida al guardar cada informe), sin
+    recorrer los informes del proyecto.
+    """
+    rollup = await EnhancedReportService(read_db).get_project_rollup(project_id)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail="Proyecto sin informes guardados")
+    return FastJSONResponse(rollup_summary(rollup))
+
+@router.post("/ai-analysis", response_class=FastJSONResponse, summary="Análisis Avanzado de IA")
 async def ai_analysis_endpoint(
-    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con datos del contrato")
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con datos del contrato"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis en milisegundos")
 ):
     """
     Endpoint especializado para análisis avanzado de IA.
     Proporciona análisis detallado con múltiples algoritmos de machine learning.
+    
+    Con `latency_budget_ms`, las etapas que no alcanzan a ejecutarse se listan en
+    `skipped_stages` (y reducen `confidence`) o en `cached_stages` si se sirvieron desde cache.
     """
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
     logger = get_logger(__name__)
     logger.info(f"Starting AI analysis for file: {file.filename}")
     
@@ -284,27 +473,340 @@ async def ai_analysis_endpoint(
                 os.unlink(temp_file_path)
         
         # Análisis directo con el motor de IA
-        ai_engine = ContractIntelligenceEngine()
-        ai_analysis = await ai_engine.analyze_contract_data(contract_data)
+        ai_engine = get_intelligence_engine()
+        ai_analysis = await ai_engine.analyze_contract_data(contract_data, latency_budget=latency_budget)
         
         # Preparar respuesta detallada
         response = {
-            "ai_analysis": {
-                "risk_score": ai_analysis.risk_score,
-                "confidence": ai_analysis.confidence,
-                "severity": ai_analysis.severity.value,
-                "predictions": ai_analysis.predictions,
-                "anomalies": ai_analysis.anomalies,
-                "recommendations": ai_analysis.recommendations,
-                "insights": ai_analysis.insights
-            },
+            "ai_analysis": ai_analysis.to_dict(),
             "contract_data": contract_data,
             "analysis_timestamp": datetime.now().isoformat()
         }
         
         logger.info("AI analysis completed successfully")
-        return response
+        # Serializar con orjson: el resultado contiene escalares NumPy anidados
+        return FastJSONResponse(response)
         
     except Exception as e:
         logger.error(f"Error in AI analysis: {e}")
-        raise HTTPException(status_code=500, detail=f"Error en análisis de IA: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error en análisis de IA: {e}")
+
+@router.post("/portfolio-analysis", response_class=FastJSONResponse, summary="Re-análisis Incremental de Portafolio")
+async def portfolio_analysis_endpoint(
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con el portafolio completo"),
+    portfolio_id: Optional[str] = Form(None, description="Identificador del portafolio (por defecto, el nombre del archivo)"),
+    approximate: bool = Form(False, description="Ejecutar las etapas costosas sobre una muestra estratificada")
+):
+    """
+    Re-análisis incremental de un portafolio de contratos.
+    
+    - **Compara**: Cada contrato contra el último snapshot del portafolio usando
+      una clave de identidad y una huella de contenido por fila.
+    - **Analiza**: Solo los contratos nuevos o modificados pasan por el motor de IA.
+    - **Devuelve**: El resumen de cambios y los agregados del portafolio actualizados
+      de forma incremental.
+    """
+    logger = get_logger(__name__)
+    df, _ = await _read_upload_dataframe(file)
+    
+    if df.empty:
+        raise HTTPException(status_code=400, detail="El archivo no contiene contratos")
+    
+    portfolio_id = portfolio_id or os.path.splitext(file.filename)[0]
+    
+    try:
+        result = await portfolio_delta_service.analyze(portfolio_id, df, approximate=approximate)
+    except Exception as e:
+        logger.error(f"Error in portfolio analysis: {e}")
+        raise HTTPException(status_code=500, detail=f"Error en análisis de portafolio: {e}")
+    
+    return FastJSONResponse({
+        "portfolio_id": result.portfolio_id,
+        "delta": result.delta.to_dict(),
+        "aggregates": result.aggregates,
+        "ai_analysis": result.ai_analysis.to_dict() if result.ai_analysis else None,
+        "analysis_timestamp": datetime.now().isoformat()
+    })
+
+
+@router.post("/ai-analysis/stream", summary="Análisis de IA Progresivo (Server-Sent Events)")
+async def ai_analysis_stream_endpoint(
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con datos del contrato"),
+    portfolio: bool = Form(False, description="Analizar todas las filas del archivo por bloques"),
+    approximate: bool = Form(False, description="Con portfolio=true, analizar todo el portafolio sobre una muestra estratificada"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis en milisegundos")
+):
+    """
+    Variante en streaming de `/ai-analysis` usando Server-Sent Events.
+    
+    - **Contrato individual**: envía un evento por etapa a medida que termina
+      (`risk_factors`, `anomalies`, `temporal_analysis`, `predictions`, `sentiment`)
+      y al final un evento `result` con el score de riesgo final.
+    - **Portafolio** (`portfolio=true`): envía un evento `progress` por cada bloque
+      de contratos analizado y un evento `summary` al terminar.
+    - **Portafolio aproximado** (`portfolio=true&approximate=true`): analiza todas las
+      filas en una sola pasada, con anomalías y sentimiento sobre una muestra
+      estratificada por `ubicacion` y `tipo_contrato`; el evento `result` incluye
+      intervalos de confianza en `insights.approximation`.
+    
+    Los errores durante el análisis se envían como un evento `error`.
+    """
+    logger = get_logger(__name__)
+    logger.info(f"Starting streaming AI analysis for file: {file.filename}")
+    
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
+    df, _ = await _read_upload_dataframe(file)
+    ai_engine = get_intelligence_engine()
+    
+    async def event_stream():
+        try:
+            if portfolio and approximate:
+                stream = ai_engine.analyze_contract_data_stream(
+                    df, approximate=True, latency_budget=latency_budget
+                )
+            elif portfolio:
+                stream = ai_engine.analyze_portfolio_stream(df, settings.STREAM_CHUNK_SIZE)
+            else:
+                contract_data = df.to_dict(orient='records')[0] if not df.empty else {}
+                stream = ai_engine.analyze_contract_data_stream(
+                    contract_data, latency_budget=latency_budget
+                )
+            
+            async for stage, payload in stream:
+                if stage == "result":
+                    payload = payload.to_dict()
+                yield format_sse(stage, payload)
+            
+            yield format_sse("done", {"analysis_timestamp": datetime.now().isoformat()})
+        except Exception as e:
+            logger.error(f"Error in streaming AI analysis: {e}")
+            yield format_sse("error", {"detail": f"Error en análisis de IA: {e}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/batch", summary="Informes por Contrato en Streaming (NDJSON)")
+async def batch_reports_endpoint(
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con uno o más contratos"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis de IA por contrato en milisegundos")
+):
+    """
+    Genera el informe de cada contrato del archivo y lo envía como una línea JSON
+    (`application/x-ndjson`) en cuanto está listo, por bloques de `BATCH_CHUNK_SIZE`.
+    
+    - **Línea `report`**: `index`, `contract_key` y `report` (mismo formato que `/generate`).
+    - **Línea `error`**: `index`, `contract_key` y `error`; el resto del lote continúa.
+    - **Línea `summary`**: al final, totales de informes y errores.
+    
+    La respuesta nunca se construye completa en memoria.
+    """
+    logger = get_logger(__name__)
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
+    df, _ = await _read_upload_dataframe(file)
+    keys = compute_contract_keys(df).tolist()
+    intelligent_service = IntelligentReportService()
+    
+    async def ndjson_stream():
+        reports = errors = 0
+        for start in range(0, len(df), settings.BATCH_CHUNK_SIZE):
+            chunk = df.iloc[start:start + settings.BATCH_CHUNK_SIZE]
+            try:
+                outcomes = await intelligent_service.generate_intelligent_reports(
+                    _contract_records(chunk), latency_budget=latency_budget, return_exceptions=True
+                )
+            except Exception as e:
+                outcomes = [e] * len(chunk)
+            
+            lines = []
+            for index, outcome in enumerate(outcomes, start):
+                if isinstance(outcome, Exception):
+                    errors += 1
+                    line = {"type": "error", "index": index, "contract_key": keys[index], "error": str(outcome)}
+                else:
+                    reports += 1
+                    line = {"type": "report", "index": index, "contract_key": keys[index], "report": outcome.model_dump()}
+                lines.append(dumps(line))
+            yield b"\n".join(lines) + b"\n"
+        
+        logger.info(f"Batch stream completed: {reports} reports, {errors} errors")
+        yield dumps({"type": "summary", "total_contratos": len(df), "reports": reports, "errors": errors}) + b"\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@router.post("/export/xlsx", summary="Exportar Informes a Excel")
+async def export_reports_xlsx_endpoint(
+    request: Request,
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con uno o más contratos"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis de IA por contrato en milisegundos")
+):
+    """
+    Genera los informes inteligentes de todos los contratos del archivo y los
+    devuelve como libro de Excel con las hojas "Resumen" y "Secciones".
+    
+    - **Streaming**: El libro se escribe en modo write-only por bloques de `BATCH_CHUNK_SIZE`.
+    - **Cache**: Las exportaciones se guardan por huella del contenido del archivo
+      (y de la fecha de análisis); una descarga repetida no vuelve a generar nada.
+      La cabecera `X-Cache` indica `HIT` o `MISS`.
+    - **ETag**: Con `If-None-Match` coincidente responde 304 sin enviar el archivo.
+    """
+    logger = get_logger(__name__)
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
+    df, _ = await _read_upload_dataframe(file)
+    
+    if df.empty:
+        raise HTTPException(status_code=400, detail="El archivo no contiene contratos")
+    
+    # El análisis temporal depende de la fecha actual: forma parte de la huella
+    key = dataframe_fingerprint(df, "xlsx", latency_budget, date.today().isoformat())
+    etag = weak_etag(key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    path = artifact_cache.get(key, ".xlsx")
+    cache_status = "HIT"
+    if path is None:
+        cache_status = "MISS"
+        keys = compute_contract_keys(df).tolist()
+        intelligent_service = IntelligentReportService()
+        path = await artifact_cache.put(
+            key, ".xlsx",
+            lambda target: write_reports_xlsx(df, keys, target, intelligent_service, latency_budget)
+        )
+    
+    logger.info(f"XLSX export {key[:12]} served ({cache_status}) for {len(df)} contracts")
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=f"informes_{date.today().isoformat()}_{key[:8]}.xlsx",
+        headers={"X-Cache": cache_status, **etag_headers(etag)}
+    )
+
+
+FINGERPRINT_PATTERN = "^[0-9a-f]{64}$"
+
+
+def _pdf_export_urls(request: Request, state: dict) -> dict:
+    """Agregar las URLs de estado y descarga al estado de una exportación PDF"""
+    fingerprint = state["fingerprint"]
+    return state | {
+        "status_url": str(request.url_for("get_pdf_export_status", fingerprint=fingerprint)),
+        "download_url": str(request.url_for("download_pdf_export", fingerprint=fingerprint)),
+    }
+
+
+@router.post("/export/pdf", status_code=202, summary="Solicitar Exportación PDF de Informes")
+async def request_pdf_export(
+    request: Request,
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con uno o más contratos"),
+    priority: str = Form("normal", description="Prioridad del trabajo: high, normal o low"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis de IA por contrato en milisegundos")
+):
+    """
+    Solicita el PDF con los informes inteligentes de todos los contratos del archivo.
+    El PDF se genera en segundo plano y la respuesta es inmediata.
+    
+    - **Estado**: `status_url` devuelve estado y progreso (0 a 1).
+    - **Descarga**: `download_url` entrega el PDF cuando el estado es `succeeded`.
+    - **Agrupamiento**: Solicitudes del mismo contenido en curso comparten un único renderizado (`coalesced`).
+    - **Cache**: Un PDF ya renderizado se entrega sin volver a generarlo.
+    """
+    logger = get_logger(__name__)
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Prioridad inválida. Use una de: {', '.join(JOB_PRIORITIES)}")
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
+    df, _ = await _read_upload_dataframe(file)
+    
+    if df.empty:
+        raise HTTPException(status_code=400, detail="El archivo no contiene contratos")
+    
+    # El análisis temporal depende de la fecha actual: forma parte de la huella
+    fingerprint = dataframe_fingerprint(df, "pdf", latency_budget, date.today().isoformat())
+    try:
+        state = await pdf_export_service.request(
+            fingerprint, _contract_records(df), compute_contract_keys(df).tolist(),
+            latency_budget=latency_budget, priority=priority
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    logger.info(f"PDF export {fingerprint[:12]} requested: {state['status']} (coalesced={state['coalesced']})")
+    return _pdf_export_urls(request, state)
+
+
+@router.get("/export/pdf/{fingerprint}/status", response_class=FastJSONResponse, summary="Estado de una Exportación PDF")
+async def get_pdf_export_status(request: Request, fingerprint: str = Path(..., pattern=FINGERPRINT_PATTERN)):
+    """
+    Estado (`queued`, `running`, `succeeded`, `failed`), progreso y error de una exportación PDF.
+    """
+    state = await pdf_export_service.status(fingerprint)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o expirada")
+    return FastJSONResponse(_pdf_export_urls(request, state))
+
+
+@router.get("/export/pdf/{fingerprint}", summary="Descargar Exportación PDF")
+async def download_pdf_export(fingerprint: str = Path(..., pattern=FINGERPRINT_PATTERN)):
+    """
+    Descarga el PDF renderizado. Responde 409 si aún se está generando.
+    """
+    path = pdf_export_service.cache.get(fingerprint, ".pdf")
+    if path is None:
+        state = await pdf_export_service.status(fingerprint)
+        if state is not None and state["status"] in ("queued", "running"):
+            raise HTTPException(status_code=409, detail="El PDF aún se está generando", headers={"Retry-After": "5"})
+        raise HTTPException(status_code=404, detail="Exportación no encontrada o expirada")
+    return FileResponse(path, media_type=PDF_MEDIA_TYPE, filename=f"informes_{fingerprint[:8]}.pdf")
+
+
+@router.post("/jobs", status_code=202, summary="Encolar Generación de Informes")
+async def create_report_job(
+    request: Request,
+    file: UploadFile = File(..., description="Archivo Excel (.xlsx, .xls) o CSV (.csv) con uno o más contratos"),
+    priority: str = Form("normal", description="Prioridad del trabajo: high, normal o low"),
+    latency_budget_ms: Optional[int] = Form(None, description="Presupuesto de latencia del análisis de IA por contrato en milisegundos")
+):
+    """
+    Encola la generación de informes de todos los contratos del archivo y
+    responde de inmediato con el ID del trabajo.
+    
+    - **Procesa**: Un pool de workers atiende los trabajos por prioridad.
+    - **Consulta**: `GET /reports/jobs/{job_id}` devuelve estado, progreso y resultado.
+    - **Cola llena**: Responde 503 con `Retry-After` cuando hay `JOB_QUEUE_MAX_SIZE` trabajos pendientes.
+    """
+    logger = get_logger(__name__)
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Prioridad inválida. Use una de: {', '.join(JOB_PRIORITIES)}")
+    latency_budget = _latency_budget_seconds(latency_budget_ms)
+    df, _ = await _read_upload_dataframe(file)
+    
+    if df.empty:
+        raise HTTPException(status_code=400, detail="El archivo no contiene contratos")
+    
+    try:
+        job = await job_queue.submit(
+            REPORT_JOB,
+            {"contracts": _contract_records(df), "latency_budget": latency_budget},
+            priority=priority
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    
+    logger.info(f"Report job {job.id} queued with {len(df)} contracts")
+    return {
+        "job_id": job.id,
+        "status": job.status.value,
+        "priority": priority,
+        "total_contratos": len(df),
+        "status_url": str(request.url_for("get_report_job", job_id=job.id))
+    }
+
+
+@router.get("/jobs/{job_id}", response_class=FastJSONResponse, summary="Estado de un Trabajo de Informes")
+async def get_report_job(job_id: str):
+    """
+    Estado, progreso (0 a 1) y, al terminar, resultado o error de un trabajo.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return FastJSONResponse(job.to_dict())
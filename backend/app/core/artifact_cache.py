@@ -0,0 +1,80 @@
+"""
+Cache en disco de artefactos direccionados por contenido (exportaciones XLSX, PDF)
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.logging.config import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArtifactCache:
+    """
+    Guarda cada artefacto en `<directorio>/<clave[:2]>/<clave><sufijo>`.
+
+    La clave es una huella de contenido (ver app.core.fingerprint), de modo que un
+    artefacto nunca se invalida: solo se expulsa el menos usado recientemente
+    cuando el total supera `max_bytes`. Las escrituras son atómicas (archivo
+    temporal + rename), así que una descarga concurrente nunca ve un archivo a medias.
+    """
+
+    def __init__(self, directory: str = settings.ARTIFACT_CACHE_DIR,
+                 max_bytes: int = settings.ARTIFACT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path_for(self, key: str, suffix: str) -> Path:
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """Ruta del artefacto si está en cache (y lo marca como usado)"""
+        path = self.path_for(key, suffix)
+        if not path.exists():
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    async def put(self, key: str, suffix: str, write: Callable[[Path], Awaitable[None]]) -> Path:
+        """Generar el artefacto con `await write(ruta_temporal)` y publicarlo en cache"""
+        path = self.path_for(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=f"{suffix}.tmp")
+        os.close(fd)
+        try:
+            await write(Path(tmp_name))
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """Expulsar artefactos menos usados recientemente hasta respetar max_bytes"""
+        files = [
+            (entry.stat().st_mtime, entry.stat().st_size, entry)
+            for entry in self.directory.glob("*/*")
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        ]
+        total = sum(size for _, size, _ in files)
+        for _, size, entry in sorted(files, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+                total -= size
+                logger.info(f"Artefacto expulsado del cache: {entry.name}")
+            except OSError:
+                pass
+
+
+# Instancia global del cache de artefactos
+artifact_cache = ArtifactCache()
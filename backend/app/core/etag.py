@@ -0,0 +1,50 @@
+"""
+ETags débiles y solicitudes condicionales (If-None-Match) para endpoints de informes
+
+Los ETags son débiles: identifican el contenido del informe, no los bytes de la
+respuesta, que cambian con la compresión GZIP y con las predicciones del motor de IA
+(no deterministas para unos mismos datos).
+"""
+from datetime import date
+from typing import Any, Dict
+
+from fastapi import Request, Response
+
+from app.core.fingerprint import content_fingerprint
+
+# El cliente puede guardar la respuesta, pero debe revalidarla con If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(fingerprint: str) -> str:
+    """ETag débil a partir de una huella de contenido"""
+    return f'W/"{fingerprint}"'
+
+
+def report_etag(content: bytes, *parts: Any) -> str:
+    """
+    ETag de un informe generado a partir de `content` (archivo subido o datos de
+    demostración). Incluye las versiones del motor y de las reglas, los parámetros
+    que cambian el resultado y la fecha de análisis, de la que depende la etapa temporal.
+    """
+    return weak_etag(content_fingerprint(content, date.today().isoformat(), *parts))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Si el ETag coincide con alguno de If-None-Match (comparación débil, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    """Respuesta 304 sin cuerpo"""
+    return Response(status_code=304, headers=etag_headers(etag))
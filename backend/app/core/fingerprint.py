@@ -0,0 +1,37 @@
+"""
+Huellas de contenido para cachear artefactos derivados de los datos de contratos
+"""
+import hashlib
+from typing import Any
+
+import pandas as pd
+
+# Incrementar al cambiar el motor de IA o las reglas/plantillas de los informes:
+# invalida todos los artefactos cacheados con la versión anterior
+ENGINE_VERSION = "2.0.0"
+RULES_VERSION = "2025.1"
+
+
+def dataframe_fingerprint(df: pd.DataFrame, *parts: Any) -> str:
+    """
+    Huella SHA-256 del contenido de un DataFrame y de los parámetros que afectan al
+    artefacto (formato, fecha de análisis, ...). No depende del formato del archivo
+    de origen ni del orden de las columnas.
+    """
+    ordered = df[sorted(df.columns, key=str)]
+    digest = hashlib.sha256()
+    digest.update(repr([str(column) for column in ordered.columns]).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(ordered, index=False).to_numpy().tobytes())
+    except TypeError:
+        # Columnas con valores no hashables (listas, diccionarios)
+        digest.update(ordered.to_csv(index=False).encode())
+    digest.update(repr((ENGINE_VERSION, RULES_VERSION) + tuple(str(part) for part in parts)).encode())
+    return digest.hexdigest()
+
+
+def content_fingerprint(content: bytes, *parts: Any) -> str:
+    """Huella SHA-256 de un contenido binario (p.ej. un archivo subido) y sus parámetros"""
+    digest = hashlib.sha256(content)
+    digest.update(repr((ENGINE_VERSION, RULES_VERSION) + tuple(str(part) for part in parts)).encode())
+    return digest.hexdigest()
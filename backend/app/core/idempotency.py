@@ -0,0 +1,374 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para endpoints que generan informes
+La primera solicitud con una clave hace el trabajo; los reintentos con la misma clave
+esperan ese resultado o reciben la respuesta guardada, sin repetir el análisis.
+"""
+import asyncio
+import base64
+import hashlib
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.serialization import dumps
+
+logger = get_logger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+MAX_KEY_LENGTH = 255
+
+# Guardar la respuesta solo si la reserva sigue siendo de quien la hizo (o ya expiró
+# sin que nadie la tomara), en un paso atómico. KEYS: clave; ARGV: token, registro, TTL
+COMPLETE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if raw and cjson.decode(raw)['token'] ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Borrar la reserva solo si sigue siendo de quien la hizo. KEYS: clave; ARGV: token
+RELEASE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if raw and cjson.decode(raw)['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(slots=True)
+class StoredResponse:
+    """Respuesta guardada para reenviarla a los reintentos"""
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "headers": self.headers, "body": base64.b64encode(self.body).decode()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoredResponse":
+        return cls(status=data["status"], headers=[tuple(h) for h in data["headers"]],
+                   body=base64.b64decode(data["body"]))
+
+
+@dataclass(slots=True)
+class IdempotencyRecord:
+    """Estado de una clave: en curso (response None, con el token de su dueño) o terminada"""
+    fingerprint: str
+    response: Optional[StoredResponse] = None
+    token: Optional[str] = None
+    expires_at: float = 0.0
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class IdempotencyBackend(ABC):
+    """Interfaz de almacenamiento de claves de idempotencia"""
+
+    @abstractmethod
+    async def reserve(self, key: str, fingerprint: str, token: str) -> Optional[IdempotencyRecord]:
+        """Reservar la clave a nombre de `token`. Devuelve None si se reservó, o el registro existente"""
+
+    @abstractmethod
+    async def wait(self, key: str, timeout: float) -> Optional[IdempotencyRecord]:
+        """Esperar a que termine la solicitud en curso; devuelve el registro actual"""
+
+    @abstractmethod
+    async def complete(self, key: str, fingerprint: str, token: str, response: StoredResponse) -> bool:
+        """
+        Guardar la respuesta de la solicitud que reservó la clave. Devuelve False si la
+        reserva expiró y ya es de otra solicitud, que no se pisa
+        """
+
+    @abstractmethod
+    async def release(self, key: str, token: str) -> None:
+        """Liberar una clave cuya solicitud falló, si sigue reservada a nombre de `token`"""
+
+
+class InMemoryIdempotencyBackend(IdempotencyBackend):
+    """Backend en proceso, acotado a `max_keys` claves (las más antiguas se descartan)"""
+
+    def __init__(self, ttl: int = settings.IDEMPOTENCY_TTL, lock_ttl: int = settings.IDEMPOTENCY_LOCK_TTL,
+                 max_keys: int = settings.IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.max_keys = max_keys
+        self._records: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[IdempotencyRecord]:
+        record = self._records.get(key)
+        if record is not None and record.expires_at <= time.time():
+            del self._records[key]
+            record.done.set()
+            return None
+        return record
+
+    async def reserve(self, key: str, fingerprint: str, token: str) -> Optional[IdempotencyRecord]:
+        record = self._get(key)
+        if record is not None:
+            return record
+        self._records[key] = IdempotencyRecord(fingerprint=fingerprint, token=token,
+                                               expires_at=time.time() + self.lock_ttl)
+        while len(self._records) > self.max_keys:
+            _, oldest = self._records.popitem(last=False)
+            oldest.done.set()
+        return None
+
+    async def wait(self, key: str, timeout: float) -> Optional[IdempotencyRecord]:
+        record = self._get(key)
+        if record is not None and record.response is None:
+            try:
+                await asyncio.wait_for(record.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._get(key)
+
+    async def complete(self, key: str, fingerprint: str, token: str, response: StoredResponse) -> bool:
+        record = self._get(key)
+        if record is None:
+            record = self._records[key] = IdempotencyRecord(fingerprint=fingerprint)
+        elif record.token != token:
+            return False
+        record.response = response
+        record.token = None
+        record.expires_at = time.time() + self.ttl
+        record.done.set()
+        return True
+
+    async def release(self, key: str, token: str) -> None:
+        record = self._get(key)
+        if record is not None and record.token == token:
+            del self._records[key]
+            record.done.set()
+
+
+class RedisIdempotencyBackend(IdempotencyBackend):
+    """
+    Backend en Redis compartido entre instancias. La reserva es un SET NX con TTL
+    corto (IDEMPOTENCY_LOCK_TTL) para que una instancia caída no bloquee la clave;
+    la respuesta guardada vive IDEMPOTENCY_TTL segundos. La reserva lleva el token
+    de su dueño: guardar o liberar la clave lo comprueba en un script Lua, para que
+    una solicitud que sobrevive a su reserva no pise la del reintento que la tomó.
+    """
+
+    KEY = "idempotency:{}"
+    POLL_INTERVAL = 0.1
+    MAX_POLL_INTERVAL = 1.0
+
+    def __init__(self, client, ttl: int = settings.IDEMPOTENCY_TTL, lock_ttl: int = settings.IDEMPOTENCY_LOCK_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+
+    async def _get(self, key: str) -> Optional[IdempotencyRecord]:
+        raw = await self.client.get(self.KEY.format(key))
+        if not raw:
+            return None
+        data = orjson.loads(raw)
+        response = StoredResponse.from_dict(data["response"]) if data.get("response") else None
+        return IdempotencyRecord(fingerprint=data["fingerprint"], response=response, token=data.get("token"))
+
+    async def reserve(self, key: str, fingerprint: str, token: str) -> Optional[IdempotencyRecord]:
+        reserved = await self.client.set(self.KEY.format(key), dumps({"fingerprint": fingerprint, "token": token}),
+                                         nx=True, ex=self.lock_ttl)
+        if reserved:
+            return None
+        record = await self._get(key)
+        # La reserva expiró entre el SET y el GET: reintentar una vez
+        return record if record is not None else await self.reserve(key, fingerprint, token)
+
+    async def wait(self, key: str, timeout: float) -> Optional[IdempotencyRecord]:
+        deadline = time.monotonic() + timeout
+        interval = self.POLL_INTERVAL
+        record = await self._get(key)
+        while record is not None and record.response is None and time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+            record = await self._get(key)
+        return record
+
+    async def complete(self, key: str, fingerprint: str, token: str, response: StoredResponse) -> bool:
+        record = dumps({"fingerprint": fingerprint, "response": response.to_dict()})
+        stored = await self.client.register_script(COMPLETE_SCRIPT)(
+            keys=[self.KEY.format(key)], args=[token, record, self.ttl])
+        return bool(stored)
+
+    async def release(self, key: str, token: str) -> None:
+        await self.client.register_script(RELEASE_SCRIPT)(keys=[self.KEY.format(key)], args=[token])
+
+
+class IdempotencyStore:
+    """Selecciona el backend según IDEMPOTENCY_BACKEND (memory o redis)"""
+
+    def __init__(self, backend: Optional[IdempotencyBackend] = None):
+        self.backend = backend
+
+    async def get_backend(self) -> IdempotencyBackend:
+        if self.backend is None:
+            client = await cache_manager.get_client() if settings.IDEMPOTENCY_BACKEND == "redis" else None
+            if client is not None:
+                self.backend = RedisIdempotencyBackend(client)
+            else:
+                if settings.IDEMPOTENCY_BACKEND == "redis":
+                    logger.warning("Redis no disponible, usando claves de idempotencia en proceso")
+                self.backend = InMemoryIdempotencyBackend()
+        return self.backend
+
+
+def request_fingerprint(method: str, path: str, content_type: str, body: bytes) -> str:
+    """
+    Huella de una solicitud. En multipart se elimina el boundary, que los clientes
+    HTTP generan al azar en cada reintento del mismo formulario.
+    """
+    if "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"')
+        body = body.replace(boundary.encode("latin-1"), b"")
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI que aplica Idempotency-Key a las rutas POST indicadas.
+
+    - Primera solicitud con la clave: se ejecuta y, si responde 2xx, se guarda la respuesta.
+    - Reintento con la misma clave y el mismo cuerpo: espera a la primera (hasta
+      IDEMPOTENCY_WAIT_TIMEOUT) y recibe la misma respuesta con `Idempotent-Replayed: true`.
+    - Misma clave con otro cuerpo: 422. Primera solicitud aún en curso tras la espera: 409.
+    - Una respuesta de error no se guarda: el reintento vuelve a ejecutar la solicitud.
+
+    Debe ir dentro de GZipMiddleware para guardar las respuestas sin comprimir.
+    """
+
+    def __init__(self, app, paths: Iterable[str], store: Optional[IdempotencyStore] = None,
+                 wait_timeout: float = settings.IDEMPOTENCY_WAIT_TIMEOUT,
+                 max_response_bytes: int = settings.IDEMPOTENCY_MAX_RESPONSE_BYTES):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.store = store or idempotency_store
+        self.wait_timeout = wait_timeout
+        self.max_response_bytes = max_response_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres")
+            return
+
+        # Leer el cuerpo completo para calcular la huella y reenviarlo a la aplicación
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        key = f"{scope['path']}:{idempotency_key}"
+        fingerprint = request_fingerprint(scope["method"], scope["path"], headers.get("content-type", ""), body)
+        backend = await self.store.get_backend()
+        token = uuid.uuid4().hex
+
+        record = await backend.reserve(key, fingerprint, token)
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                await self._send_error(send, 422, "Idempotency-Key ya usada con una solicitud distinta")
+                return
+            if record.response is None:
+                record = await backend.wait(key, self.wait_timeout)
+            if record is not None and record.response is not None:
+                logger.info(f"Idempotency-Key reutilizada en {scope['path']}: respuesta reenviada")
+                await self._send_stored(send, record.response)
+                return
+            if record is not None:
+                await self._send_error(send, 409, "La solicitud original con esta Idempotency-Key sigue en curso",
+                                       retry_after=True)
+                return
+            # La solicitud original falló o expiró: este reintento hace el trabajo
+            record = await backend.reserve(key, fingerprint, token)
+            if record is not None:
+                await self._send_error(send, 409, "La solicitud original con esta Idempotency-Key sigue en curso",
+                                       retry_after=True)
+                return
+
+        await self._run(scope, body, send, backend, key, fingerprint, token)
+
+    async def _run(self, scope, body: bytes, send, backend: IdempotencyBackend, key: str, fingerprint: str,
+                   token: str):
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        status = 500
+        response_headers: List[Tuple[str, str]] = []
+        response_body: List[bytes] = []
+        size = 0
+
+        async def capture_send(message):
+            nonlocal status, response_headers, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= self.max_response_bytes:
+                    response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await backend.release(key, token)
+            raise
+
+        if 200 <= status < 300 and size <= self.max_response_bytes:
+            response = StoredResponse(status, response_headers, b"".join(response_body))
+            if not await backend.complete(key, fingerprint, token, response):
+                logger.warning(f"Idempotency-Key en {scope['path']} reservada por otra solicitud: "
+                               "respuesta no guardada")
+        else:
+            await backend.release(key, token)
+
+    async def _send_stored(self, send, response: StoredResponse) -> None:
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response.headers]
+        headers.append((REPLAYED_HEADER.encode(), b"true"))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+    async def _send_error(self, send, status: int, detail: str, retry_after: bool = False) -> None:
+        body = dumps({"detail": detail})
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry_after:
+            headers.append((b"retry-after", b"5"))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+# Instancia global del almacén de claves de idempotencia
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,459 @@
+"""
+Cola de trabajos asíncrona con prioridades para procesos largos (p.ej. informes de portafolio)
+Backend en proceso por defecto o Redis para compartir la cola entre instancias
+
+Los workers corren en el event loop del proceso que llama a JobQueue.start(). Con
+Redis, los trabajos pueden atenderse fuera de la API: JOB_WORKERS=0 en la API y
+`python -m app.core.job_queue` en uno o más procesos aparte.
+"""
+import asyncio
+import itertools
+import sys
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.profiling import memory_profiler
+from app.core.serialization import dumps
+
+logger = get_logger(__name__)
+
+
+class JobStatus(str, Enum):
+    """Estados de un trabajo"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+# Menor valor = se atiende primero
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    """La cola alcanzó JOB_QUEUE_MAX_SIZE trabajos pendientes"""
+
+
+@dataclass(slots=True)
+class Job:
+    """Trabajo encolado con su estado, progreso y resultado"""
+    kind: str
+    payload: Any
+    priority: int = JOB_PRIORITIES["normal"]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    attempts: int = 0
+
+    def to_dict(self, include_payload: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "priority": self.priority,
+            "progress": round(self.progress, 4),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "attempts": self.attempts,
+            "error": self.error,
+            "result": self.result if self.status == JobStatus.SUCCEEDED else None,
+        }
+        if include_payload:
+            data["payload"] = self.payload
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        return cls(
+            kind=data["kind"],
+            payload=data.get("payload"),
+            priority=data["priority"],
+            id=data["job_id"],
+            status=JobStatus(data["status"]),
+            progress=data["progress"],
+            result=data.get("result"),
+            error=data.get("error"),
+            created_at=data["created_at"],
+            started_at=data.get("started_at"),
+            finished_at=data.get("finished_at"),
+            attempts=data.get("attempts", 0),
+        )
+
+
+class JobBackend(ABC):
+    """Interfaz de almacenamiento de la cola de trabajos"""
+
+    @abstractmethod
+    async def enqueue(self, job: Job) -> None:
+        """Encolar un trabajo; QueueFullError si la cola está llena"""
+
+    @abstractmethod
+    async def dequeue(self, timeout: float) -> Optional[Job]:
+        """Siguiente trabajo por prioridad (FIFO dentro de la misma prioridad) o None"""
+
+    @abstractmethod
+    async def save(self, job: Job) -> None:
+        """Guardar el estado del trabajo"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Trabajo por ID, o None si no existe o expiró"""
+
+    @abstractmethod
+    async def pending(self) -> int:
+        """Trabajos encolados sin atender"""
+
+    async def touch(self, job: Job) -> None:
+        """Renovar la reserva de un trabajo en curso (backends con timeout de visibilidad)"""
+
+    async def ack(self, job: Job) -> None:
+        """Confirmar que un trabajo terminó y liberar su reserva"""
+
+
+class InMemoryJobBackend(JobBackend):
+    """
+    Backend en proceso. Es el backend por defecto con un solo worker de uvicorn y
+    el sustituto local de Redis en tests.
+    """
+
+    def __init__(self, max_size: int = settings.JOB_QUEUE_MAX_SIZE,
+                 max_jobs: int = settings.JOB_RESULT_MAX):
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=max_size)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._sequence = itertools.count()
+        self.max_jobs = max_jobs
+
+    async def enqueue(self, job: Job) -> None:
+        try:
+            self._queue.put_nowait((job.priority, next(self._sequence), job.id))
+        except asyncio.QueueFull:
+            raise QueueFullError("La cola de trabajos está llena")
+        await self.save(job)
+
+    async def dequeue(self, timeout: float) -> Optional[Job]:
+        try:
+            _, _, job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        # Descartar los trabajos terminados más antiguos
+        while len(self._jobs) > self.max_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status not in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+                break
+            del self._jobs[oldest_id]
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def pending(self) -> int:
+        return self._queue.qsize()
+
+
+# Encolar si hay capacidad, en un solo paso atómico. El score es la prioridad en la parte
+# alta y un contador de llegada en la baja (FIFO dentro de la prioridad; exacto en un double
+# hasta 10^15 trabajos). KEYS: cola, scores, trabajo, contador; ARGV: capacidad, ID,
+# prioridad, TTL, JSON del trabajo
+ENQUEUE_SCRIPT = """
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+local score = tonumber(ARGV[3]) * 1000000000000000 + redis.call('INCR', KEYS[4])
+redis.call('SET', KEYS[3], ARGV[5], 'EX', ARGV[4])
+redis.call('HSET', KEYS[2], ARGV[2], score)
+redis.call('ZADD', KEYS[1], score, ARGV[2])
+return 1
+"""
+
+# Devolver a la cola los trabajos con la reserva vencida (su worker murió) y reservar
+# el siguiente hasta ahora + visibilidad. KEYS: cola, en proceso, scores; ARGV: visibilidad
+DEQUEUE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+    redis.call('ZREM', KEYS[2], id)
+    local score = redis.call('HGET', KEYS[3], id)
+    if score then
+        redis.call('ZADD', KEYS[1], score, id)
+    end
+end
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[1]), popped[1])
+return popped[1]
+"""
+
+# Renovar la reserva de un trabajo que sigue en proceso. KEYS: en proceso; ARGV: visibilidad, ID
+TOUCH_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+return redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[1]), ARGV[2])
+"""
+
+
+class RedisJobBackend(JobBackend):
+    """
+    Backend en Redis: la cola es un sorted set (score = prioridad y contador de llegada)
+    y cada trabajo se guarda como JSON con TTL JOB_RESULT_TTL.
+
+    Un trabajo atendido pasa a un sorted set de trabajos en proceso con una reserva de
+    JOB_VISIBILITY_TIMEOUT segundos, que el worker renueva mientras lo ejecuta (touch)
+    y libera al terminar (ack). Si el worker muere, al vencer la reserva el trabajo
+    vuelve a la cola con su prioridad original.
+    """
+
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing"
+    SCORES_KEY = "jobs:scores"
+    SEQUENCE_KEY = "jobs:sequence"
+    JOB_KEY = "jobs:{}"
+
+    def __init__(self, client, max_size: int = settings.JOB_QUEUE_MAX_SIZE,
+                 ttl: int = settings.JOB_RESULT_TTL,
+                 visibility_timeout: float = settings.JOB_VISIBILITY_TIMEOUT,
+                 poll_interval: float = settings.JOB_POLL_INTERVAL):
+        self.client = client
+        self.max_size = max_size
+        self.ttl = ttl
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self._enqueue = client.register_script(ENQUEUE_SCRIPT)
+        self._dequeue = client.register_script(DEQUEUE_SCRIPT)
+        self._touch = client.register_script(TOUCH_SCRIPT)
+
+    def _serialize(self, job: Job) -> bytes:
+        return dumps(job.to_dict(include_payload=True) | {"result": job.result})
+
+    async def enqueue(self, job: Job) -> None:
+        accepted = await self._enqueue(
+            keys=[self.QUEUE_KEY, self.SCORES_KEY, self.JOB_KEY.format(job.id), self.SEQUENCE_KEY],
+            args=[self.max_size, job.id, job.priority, self.ttl, self._serialize(job)],
+        )
+        if not accepted:
+            raise QueueFullError("La cola de trabajos está llena")
+
+    async def dequeue(self, timeout: float) -> Optional[Job]:
+        # Sondeo: un comando bloqueante (BZPOPMIN) no puede reservar el trabajo en el mismo paso
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = await self._dequeue(
+                keys=[self.QUEUE_KEY, self.PROCESSING_KEY, self.SCORES_KEY],
+                args=[self.visibility_timeout],
+            )
+            if job_id:
+                job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+                job = await self.get(job_id)
+                if job is None:
+                    # El trabajo expiró mientras esperaba en la cola
+                    await self.ack(Job(kind="", payload=None, id=job_id))
+                    continue
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    async def touch(self, job: Job) -> None:
+        await self._touch(keys=[self.PROCESSING_KEY], args=[self.visibility_timeout, job.id])
+
+    async def ack(self, job: Job) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.PROCESSING_KEY, job.id)
+            pipe.hdel(self.SCORES_KEY, job.id)
+            await pipe.execute()
+
+    async def save(self, job: Job) -> None:
+        await self.client.setex(self.JOB_KEY.format(job.id), self.ttl, self._serialize(job))
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raw = await self.client.get(self.JOB_KEY.format(job_id))
+        return Job.from_dict(orjson.loads(raw)) if raw else None
+
+    async def pending(self) -> int:
+        return await self.client.zcard(self.QUEUE_KEY)
+
+
+JobHandler = Callable[[Job, Callable[[float], Awaitable[None]]], Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    Cola de trabajos con un pool de workers asyncio.
+
+    Cada tipo de trabajo (`kind`) tiene un handler `async handler(job, report_progress)`
+    que devuelve el resultado serializable; `report_progress(fraccion)` actualiza el
+    progreso visible por polling.
+
+    Los handlers corren en el event loop de este proceso: lo que no delegan a hilos o
+    procesos (las etapas del motor de IA van a hilos, los PDF a un pool de procesos)
+    compite con los requests de la API. Un trabajo que se interrumpe (el worker muere)
+    se reintenta hasta JOB_MAX_ATTEMPTS veces.
+    """
+
+    def __init__(self, backend: Optional[JobBackend] = None, workers: int = settings.JOB_WORKERS):
+        self.backend = backend
+        self.workers = workers
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def _get_backend(self) -> JobBackend:
+        if self.backend is None:
+            client = await cache_manager.get_client() if settings.JOB_QUEUE_BACKEND == "redis" else None
+            if client is not None:
+                self.backend = RedisJobBackend(client)
+            else:
+                if settings.JOB_QUEUE_BACKEND == "redis":
+                    logger.warning("Redis no disponible, usando cola de trabajos en proceso")
+                self.backend = InMemoryJobBackend()
+        return self.backend
+
+    async def submit(self, kind: str, payload: Any, priority: str = "normal") -> Job:
+        """Encolar un trabajo. Lanza QueueFullError si la cola está llena"""
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Prioridad inválida: {priority}. Use una de {list(JOB_PRIORITIES)}")
+        job = Job(kind=kind, payload=payload, priority=JOB_PRIORITIES[priority])
+        await (await self._get_backend()).enqueue(job)
+        logger.info(f"Trabajo {job.id} ({kind}) encolado con prioridad {priority}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await (await self._get_backend()).get(job_id)
+
+    async def pending(self) -> int:
+        return await (await self._get_backend()).pending()
+
+    async def run_job(self, job: Job) -> Job:
+        """Ejecutar un trabajo y registrar su estado final"""
+        backend = await self._get_backend()
+        job.attempts += 1
+        if job.attempts > settings.JOB_MAX_ATTEMPTS:
+            # Se interrumpió en cada intento (p.ej. agota la memoria del worker)
+            logger.error(f"Trabajo {job.id} descartado tras {job.attempts - 1} intentos interrumpidos")
+            job.status = JobStatus.FAILED
+            job.error = f"El trabajo se interrumpió {job.attempts - 1} veces"
+            return await self._finish(backend, job)
+
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        await backend.save(job)
+
+        async def report_progress(progress: float) -> None:
+            job.progress = min(max(progress, 0.0), 1.0)
+            await backend.save(job)
+
+        heartbeat = asyncio.create_task(self._heartbeat(backend, job))
+        try:
+            with memory_profiler.track():
+                job.result = await self._handlers[job.kind](job, report_progress)
+            job.status = JobStatus.SUCCEEDED
+            job.progress = 1.0
+        except Exception as e:
+            logger.error(f"Trabajo {job.id} falló: {e}")
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            heartbeat.cancel()
+        return await self._finish(backend, job)
+
+    async def _finish(self, backend: JobBackend, job: Job) -> Job:
+        job.finished_at = time.time()
+        # El payload ya no es necesario una vez terminado el trabajo
+        job.payload = None
+        await backend.save(job)
+        await backend.ack(job)
+        return job
+
+    async def _heartbeat(self, backend: JobBackend, job: Job) -> None:
+        """Renovar la reserva del trabajo mientras se ejecuta"""
+        interval = settings.JOB_VISIBILITY_TIMEOUT / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await backend.touch(job)
+            except Exception as e:
+                logger.warning(f"No se pudo renovar la reserva del trabajo {job.id}: {e}")
+
+    async def _worker(self, worker_id: int) -> None:
+        backend = await self._get_backend()
+        while True:
+            try:
+                job = await backend.dequeue(timeout=5)
+                if job is not None:
+                    await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Un error de backend (p.ej. Redis caído) no debe detener al worker
+                logger.error(f"Error en worker de trabajos {worker_id}: {e}")
+                await asyncio.sleep(1)
+
+    async def start(self) -> None:
+        """Iniciar el pool de workers"""
+        if self._tasks:
+            return
+        backend = await self._get_backend()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Cola de trabajos iniciada: {self.workers} workers, backend {type(backend).__name__}")
+
+    async def stop(self) -> None:
+        """Detener los workers; los trabajos en curso se cancelan"""
+        # En Python 3.11, asyncio.wait_for (en InMemoryJobBackend y en clientes de Redis) puede
+        # absorber una cancelación que coincide con el fin de la espera: se cancela hasta que terminen
+        pending = set(self._tasks)
+        while pending:
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+        self._tasks = []
+
+
+# Instancia global de la cola de trabajos
+job_queue = JobQueue()
+
+
+async def main() -> None:
+    """Proceso worker: atiende la cola de Redis fuera del event loop de la API"""
+    # Registran sus handlers en job_queue al importarse
+    from app.services import pdf_export, report_jobs  # noqa: F401
+
+    if not isinstance(await job_queue._get_backend(), RedisJobBackend):
+        logger.error("El proceso worker requiere JOB_QUEUE_BACKEND=redis y Redis disponible")
+        sys.exit(1)
+    job_queue.workers = max(job_queue.workers, 1)
+    await job_queue.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop()
+        pdf_export.shutdown_render_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
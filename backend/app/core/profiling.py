@@ -0,0 +1,186 @@
+"""
+Perfilado de memoria muestreado con tracemalloc
+"""
+import random
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.logging.config import get_logger
+
+logger = get_logger(__name__)
+
+# Trazas propias de tracemalloc y del import machinery que no aportan al perfil
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _kb(size: int) -> float:
+    return round(size / 1024, 2)
+
+
+class ProfileSession:
+    """Perfil de un request muestreado: pico de memoria y sitios de asignación por etapa"""
+
+    def __init__(self, label: str, top_n: int):
+        self.label = label
+        self.top_n = top_n
+        self.started_at = time.time()
+        self.stages: List[Dict[str, Any]] = []
+        self.peak = 0
+        # Otro request empezó mientras tanto: sus asignaciones se mezclan con las de éste
+        self.overlapped = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Medir una etapa. Las etapas de un request muestreado deben ejecutarse en serie"""
+        before = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        tracemalloc.reset_peak()
+        current_before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            top = after.compare_to(before, "lineno")[:self.top_n]
+            self.peak = max(self.peak, peak)
+            self.stages.append({
+                "stage": name,
+                "peak_kb": _kb(peak - current_before),
+                "retained_kb": _kb(current - current_before),
+                "top_allocations": [
+                    {
+                        "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_kb": _kb(stat.size_diff),
+                        "count": stat.count_diff,
+                    }
+                    for stat in top if stat.size_diff > 0
+                ],
+            })
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 1024 / 1024
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "timestamp": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration_ms": round((time.time() - self.started_at) * 1000, 2),
+            "peak_kb": _kb(self.peak),
+            "stages": self.stages,
+        }
+
+
+class MemoryProfiler:
+    """
+    Perfilador de memoria que muestrea una fracción de los requests.
+
+    tracemalloc solo está activo mientras dura un request muestreado, de modo que los
+    demás requests no pagan su costo. tracemalloc mide todo el proceso, así que un
+    perfil solo es del request si no hay otro trabajo en curso: los requests HTTP
+    (InFlightMiddleware) y los trabajos de la cola se registran con track(); un
+    request muestreado con otros en curso no se perfila (`skipped_busy`) y el perfil
+    en el que empieza otro request se descarta (`discarded_overlapping`).
+    """
+
+    def __init__(self, enabled: bool = settings.PROFILING_ENABLED,
+                 sample_rate: float = settings.PROFILING_SAMPLE_RATE,
+                 max_profiles: int = settings.PROFILING_MAX_PROFILES,
+                 top_n: int = settings.PROFILING_TOP_ALLOCATIONS):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self._profiles: deque = deque(maxlen=max_profiles)
+        self._active: Optional[ProfileSession] = None
+        self._in_flight = 0
+        self.sampled_requests = 0
+        self.skipped_busy = 0
+        self.discarded_overlapping = 0
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """Registrar un request o trabajo en curso mientras dura el bloque"""
+        self._in_flight += 1
+        if self._active is not None:
+            self._active.overlapped = True
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    def start(self, label: str) -> Optional[ProfileSession]:
+        """Iniciar una sesión si el request resulta muestreado; None en otro caso"""
+        if not self.enabled or self._active is not None or random.random() >= self.sample_rate:
+            return None
+        if tracemalloc.is_tracing():
+            # Otro componente controla tracemalloc; no interferir con sus mediciones
+            return None
+        if self._in_flight > 1:
+            # Además del request que llama hay otros en curso
+            self.skipped_busy += 1
+            return None
+        tracemalloc.start()
+        self._active = ProfileSession(label, self.top_n)
+        return self._active
+
+    def finish(self, session: Optional[ProfileSession]) -> None:
+        """Cerrar la sesión y guardar el perfil"""
+        if session is None or session is not self._active:
+            return
+        try:
+            tracemalloc.stop()
+            if session.overlapped:
+                self.discarded_overlapping += 1
+                logger.info(f"Perfil de memoria descartado: {session.label} coincidió con otros requests")
+                return
+            self._profiles.append(session.to_dict())
+            self.sampled_requests += 1
+            logger.info(f"Perfil de memoria registrado: {session.label}, pico {session.peak_mb:.2f}MB")
+        finally:
+            self._active = None
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Perfiles recientes (del más reciente al más antiguo)"""
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "sampled_requests": self.sampled_requests,
+            "skipped_busy": self.skipped_busy,
+            "discarded_overlapping": self.discarded_overlapping,
+            "profiles": list(reversed(self._profiles)),
+        }
+
+
+def profile_stage(session: Optional[ProfileSession], name: str):
+    """Medir una etapa si hay sesión activa; sin costo en requests no muestreados"""
+    return session.stage(name) if session is not None else nullcontext()
+
+
+# Instancia global del perfilador
+memory_profiler = MemoryProfiler()
+
+
+class InFlightMiddleware:
+    """
+    Middleware ASGI que registra en memory_profiler los requests HTTP en curso.
+    A diferencia de un middleware "http" de FastAPI, cubre también el envío de
+    las respuestas en streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with memory_profiler.track():
+            await self.app(scope, receive, send)
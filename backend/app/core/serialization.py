@@ -0,0 +1,56 @@
+"""
+Serialización JSON rápida con soporte nativo de tipos NumPy
+"""
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# NumPy (escalares y arreglos), claves no str (p.ej. value_counts) y dataclasses con slots
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def json_default(value: Any) -> Any:
+    """Convertir tipos que orjson no serializa de forma nativa"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):  # Escalares NumPy no soportados (p.ej. np.float16)
+        return value.item()
+    if hasattr(value, "tolist"):  # Arreglos NumPy no contiguos y Series de pandas
+        return value.tolist()
+    if hasattr(value, "to_dict"):  # Resultados del motor de IA
+        return value.to_dict()
+    return str(value)
+
+
+def dumps(data: Any) -> bytes:
+    """Serializar a JSON (UTF-8). NaN e infinitos se emiten como null"""
+    return orjson.dumps(data, default=json_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON serializada con orjson.
+
+    Devolverla directamente desde un endpoint evita el paso por jsonable_encoder,
+    que recorre toda la estructura y falla con tipos como np.float32 o np.int64.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200,
+                   headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """
+    Respuesta de un modelo Pydantic construido por el backend. Al devolver una
+    Response, FastAPI no valida ni serializa de nuevo contra `response_model`
+    (que se mantiene en el decorador solo para la documentación OpenAPI).
+    """
+    return FastJSONResponse(model.model_dump(), status_code=status_code, headers=headers)
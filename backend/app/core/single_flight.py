@@ -0,0 +1,165 @@
+"""
+Agrupamiento (single-flight) de cálculos idénticos concurrentes
+La primera solicitud de una clave ejecuta el cálculo y las concurrentes esperan el
+mismo resultado. Entre instancias se coordina con un lock ligero en Redis; sin Redis
+el agrupamiento es solo local.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.logging.config import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+# Borrar el lock solo si sigue siendo propio (pudo expirar y tomarlo otra instancia), en un
+# paso atómico. KEYS: lock; ARGV: token del dueño
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Grupo de cálculos agrupados por clave.
+
+    - **Local**: las llamadas concurrentes de una clave esperan la misma tarea. La
+      tarea no se cancela si se cancela quien la inició (p.ej. el cliente se desconecta).
+    - **Distribuido** (`distributed=True` y Redis disponible): la instancia que toma
+      el lock calcula y publica el resultado codificado por SINGLE_FLIGHT_RESULT_TTL segundos; las
+      demás lo esperan. Si el dueño del lock falla, calculan localmente.
+    """
+
+    LOCK_KEY = "singleflight:{}:lock:{}"
+    RESULT_KEY = "singleflight:{}:result:{}"
+    POLL_INTERVAL = 0.05
+    MAX_POLL_INTERVAL = 0.5
+
+    _groups: Dict[str, "SingleFlight"] = {}
+
+    def __init__(self, name: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 lock_ttl: int = settings.SINGLE_FLIGHT_LOCK_TTL,
+                 result_ttl: int = settings.SINGLE_FLIGHT_RESULT_TTL,
+                 wait_timeout: float = settings.SINGLE_FLIGHT_WAIT_TIMEOUT,
+                 client_factory: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.client_factory = client_factory or cache_manager.get_client
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+        SingleFlight._groups[name] = self
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]], distributed: bool = False) -> Any:
+        """Resultado de `func` para `key`, ejecutándola una sola vez entre llamadas concurrentes"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced_local += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._run(key, func, distributed))
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marcar la excepción como recuperada si nadie esperaba la tarea
+        if not task.cancelled():
+            task.exception()
+
+    async def _execute(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.executions += 1
+        return await func()
+
+    async def _run(self, key: Hashable, func: Callable[[], Awaitable[Any]], distributed: bool) -> Any:
+        client = await self.client_factory() if distributed and settings.SINGLE_FLIGHT_DISTRIBUTED else None
+        if client is None:
+            return await self._execute(func)
+
+        lock_key = self.LOCK_KEY.format(self.name, key)
+        result_key = self.RESULT_KEY.format(self.name, key)
+        token = uuid.uuid4().hex
+        try:
+            raw = await client.get(result_key)
+            if raw is not None:
+                self.coalesced_remote += 1
+                return self.decode(raw)
+            acquired = await client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Single-flight {self.name}: Redis no disponible, agrupamiento solo local: {e}")
+            return await self._execute(func)
+
+        if not acquired:
+            result = await self._wait_remote(client, lock_key, result_key)
+            if result is not _MISSING:
+                self.coalesced_remote += 1
+                return result
+            logger.info(f"Single-flight {self.name}: el dueño de {str(key)[:12]} no publicó resultado, se calcula local")
+            return await self._execute(func)
+
+        try:
+            result = await self._execute(func)
+            try:
+                await client.setex(result_key, self.result_ttl, self.encode(result))
+            except Exception as e:
+                logger.warning(f"Single-flight {self.name}: no se pudo publicar el resultado: {e}")
+            return result
+        finally:
+            try:
+                await client.register_script(RELEASE_SCRIPT)(keys=[lock_key], args=[token])
+            except Exception as e:
+                logger.warning(f"Single-flight {self.name}: no se pudo liberar el lock: {e}")
+
+    async def _wait_remote(self, client, lock_key: str, result_key: str) -> Any:
+        """Esperar el resultado publicado por otra instancia; _MISSING si el lock se libera sin resultado"""
+        deadline = time.monotonic() + self.wait_timeout
+        interval = self.POLL_INTERVAL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+            try:
+                raw = await client.get(result_key)
+                if raw is not None:
+                    return self.decode(raw)
+                if not await client.exists(lock_key):
+                    # Última lectura: el dueño pudo publicar justo antes de liberar
+                    raw = await client.get(result_key)
+                    return self.decode(raw) if raw is not None else _MISSING
+            except Exception as e:
+                logger.warning(f"Single-flight {self.name}: error esperando resultado remoto: {e}")
+                return _MISSING
+        return _MISSING
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores y tasa de agrupamiento (llamadas servidas sin ejecutar el cálculo)"""
+        coalesced = self.coalesced_local + self.coalesced_remote
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "in_flight": len(self._inflight),
+            "coalesce_rate": round(coalesced / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Estadísticas de todos los grupos single-flight del proceso"""
+    return {name: group.stats() for name, group in SingleFlight._groups.items()}
@@ -0,0 +1,19 @@
+"""
+Utilidades para respuestas en streaming (Server-Sent Events)
+"""
+from typing import Any
+
+from app.core.serialization import dumps
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Formatear un evento SSE con su carga en JSON"""
+    payload = dumps(data).decode()
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# Headers para que proxies (nginx) no almacenen en buffer el stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
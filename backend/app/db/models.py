@@ -1,12 +1,20 @@
 """
 Modelos de base de datos para el sistema de informes de infraestructura médica
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey, ForeignKeyConstraint, Index,
+    PrimaryKeyConstraint, event, literal_column,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .session import Base
+import re
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+# Campos de raw_data con índice de expresión (migración b3e8d5a2c619); el resto
+# de los campos se filtra por contención (@>) con el índice GIN de raw_data
+INDEXED_RAW_FIELDS = ("ubicacion", "tipo_contrato")
 
 class User(Base):
     """Modelo de usuario para autenticación"""
@@ -41,11 +49,33 @@ class Project(Base):
     # Relación con informes
     reports = relationship("Report", back_populates="project")
 
+
+def normalized_project_name(name):
+    """
+    Nombre de proyecto normalizado en SQL (espacios colapsados y recortados, en
+    minúsculas), igual que en el índice único ix_projects_name_key: con literales y
+    no parámetros, para que ON CONFLICT y el planificador reconozcan el índice
+    """
+    collapsed = func.regexp_replace(name, literal_column(r"'\s+'"), literal_column("' '"), literal_column("'g'"))
+    return func.lower(func.btrim(collapsed))
+
+
+_SQL_WHITESPACE = re.compile(r"[ \t\n\r\f\v]+")  # \s de las expresiones regulares de PostgreSQL
+
+
+def project_name_key(name: str) -> str:
+    """El nombre normalizado de normalized_project_name, calculado en Python (claves de caché)"""
+    return _SQL_WHITESPACE.sub(" ", name).strip(" ").lower()
+
+
+# Un proyecto por nombre normalizado; _get_or_create_project hace upsert sobre este índice
+Index("ix_projects_name_key", normalized_project_name(Project.name), unique=True)
+
 class Report(Base):
     """Modelo principal para informes generados"""
     __tablename__ = "reports"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     
@@ -60,43 +90,96 @@ class Report(Base):
     year = Column(Integer, default=2025)
     context = Column(String, default="Secretaría de Infraestructura Física - Alcaldía de Medellín")
     
-    # Datos JSON del informe completo
-    sections_data = Column(JSON)  # Almacena las secciones del informe
-    raw_data = Column(JSON)       # Datos originales del archivo subido
+    # Datos JSON del informe completo (JSONB: indexables y consultables en SQL)
+    sections_data = Column(JSONB)  # Almacena las secciones del informe
+    raw_data = Column(JSONB)       # Datos originales del archivo subido
     
     # Archivo original
     original_filename = Column(String)
     file_type = Column(String)  # csv, xlsx, xls
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Timestamps (created_at es la clave de partición: forma parte de la clave primaria)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relaciones
     project = relationship("Project", back_populates="reports")
     created_by_user = relationship("User", back_populates="reports")
 
+    # Para el ORM un informe se identifica solo por su id
+    __mapper_args__ = {"primary_key": [id]}
+
+    # Índices de las consultas de informes (migración a7c4e2f91b3d); en cada
+    # partición mensual se crean con el sufijo de la partición (app/db/partitions.py)
+    __table_args__ = (
+        # La clave única de una tabla particionada incluye la clave de partición;
+        # con created_at primero, las búsquedas por id usan ix_reports_id_version
+        PrimaryKeyConstraint("created_at", "id", name="reports_pkey"),
+        # Informes de un usuario / de un proyecto, ordenables por fecha de creación
+        Index("ix_reports_created_by_created_at", "created_by", "created_at", "id"),
+        Index("ix_reports_project_id_created_at", "project_id", "created_at", "id"),
+        # Versión del informe para el ETag (get_report_version) sin leer la fila
+        Index("ix_reports_id_version", "id", postgresql_include=["created_at", "updated_at"]),
+        # Contención en los datos subidos y en las secciones (p.ej. por severidad)
+        Index("ix_reports_raw_data", "raw_data", postgresql_using="gin", postgresql_ops={"raw_data": "jsonb_path_ops"}),
+        Index("ix_reports_sections_data", "sections_data", postgresql_using="gin",
+              postgresql_ops={"sections_data": "jsonb_path_ops"}),
+        # Particiones mensuales por fecha de creación (migración d8a2f6c4b917)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+def raw_data_field(key: str):
+    """
+    Expresión `raw_data ->> 'clave'` con la clave como literal, igual que en los
+    índices de expresión (con un parámetro el planificador no los reconoce)
+    """
+    return Report.raw_data.op("->>")(literal_column("'{}'".format(key.replace("'", "''"))))
+
+
+for _field in INDEXED_RAW_FIELDS:
+    Index(f"ix_reports_raw_data_{_field}", raw_data_field(_field))
+
 class ReportSection(Base):
     """Modelo para secciones individuales de informes (para análisis detallado)"""
     __tablename__ = "report_sections"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    report_id = Column(UUID(as_uuid=True), ForeignKey("reports.id"))
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    report_id = Column(UUID(as_uuid=True))
     
     title = Column(String, nullable=False)
     block_name = Column(String)
     message = Column(Text)
     severity = Column(String)  # INFO, WARNING, CRITICAL
-    data = Column(JSON)
+    data = Column(JSONB)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # created_at del informe: completa la clave foránea (la clave única de reports
+    # incluye created_at) y es la clave de partición, así que la sección queda en la
+    # partición del mes de su informe. Se escribe en la transacción del informe y
+    # now() coincide con el created_at de éste; si no, la clave foránea lo rechaza
+    report_created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __mapper_args__ = {"primary_key": [id]}
+
+    __table_args__ = (
+        PrimaryKeyConstraint("report_created_at", "id", name="report_sections_pkey"),
+        ForeignKeyConstraint(
+            ["report_created_at", "report_id"], ["reports.created_at", "reports.id"],
+            name="report_sections_report_fkey", ondelete="CASCADE",
+        ),
+        # Secciones de un informe y conteos por severidad (solo índice)
+        Index("ix_report_sections_report_id_severity", "report_id", "severity"),
+        {"postgresql_partition_by": "RANGE (report_created_at)"},
+    )
+
 class ReportAnalytics(Base):
     """Modelo para analytics y métricas de informes"""
     __tablename__ = "report_analytics"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    report_id = Column(UUID(as_uuid=True), ForeignKey("reports.id"))
+    id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    report_id = Column(UUID(as_uuid=True))
     
     # Métricas calculadas
     budget_efficiency = Column(Float)  # valor_ejecutado / presupuesto_aprobado
@@ -107,3 +190,57 @@ class ReportAnalytics(Base):
     trend_analysis = Column(JSON)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Igual que en ReportSection: clave foránea y de partición por el mes del informe
+    report_created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __mapper_args__ = {"primary_key": [id]}
+
+    __table_args__ = (
+        PrimaryKeyConstraint("report_created_at", "id", name="report_analytics_pkey"),
+        ForeignKeyConstraint(
+            ["report_created_at", "report_id"], ["reports.created_at", "reports.id"],
+            name="report_analytics_report_fkey", ondelete="CASCADE",
+        ),
+        Index("ix_report_analytics_report_id", "report_id"),
+        {"postgresql_partition_by": "RANGE (report_created_at)"},
+    )
+
+
+def _create_partitions(target, connection, **kw):
+    """Con create_all (tests, desarrollo), crear las particiones del mes en curso y las siguientes"""
+    if connection.dialect.name == "postgresql":
+        from app.db.partitions import ensure_partitions
+        ensure_partitions(connection, tables=[target.name])
+
+
+for _table in (Report.__table__, ReportSection.__table__, ReportAnalytics.__table__):
+    event.listen(_table, "after_create", _create_partitions)
+
+class ProjectRollup(Base):
+    """
+    Totales por proyecto para tableros, mantenidos de forma incremental en la misma
+    transacción que guarda cada informe (ver app/db/rollups.py)
+    """
+    __tablename__ = "project_rollups"
+
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), primary_key=True)
+    report_count = Column(Integer, nullable=False, default=0)
+
+    # Informe más reciente (por created_at, id) y su ejecución presupuestal
+    latest_report_id = Column(UUID(as_uuid=True))
+    latest_report_at = Column(DateTime(timezone=True))
+    latest_execution_pct = Column(Float)
+
+    # Peor severidad de las secciones: 0 INFO, 1 WARNING, 2 CRITICAL (ver SEVERITY_RANKS)
+    worst_severity_rank = Column(Integer)
+
+    # Suma y conteo para promediar el riesgo sin releer los informes
+    risk_score_sum = Column(Float, nullable=False, default=0.0)
+    risk_score_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    @property
+    def average_risk_score(self):
+        return self.risk_score_sum / self.risk_score_count if self.risk_score_count else None
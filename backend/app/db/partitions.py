@@ -0,0 +1,328 @@
+"""
+Particionado mensual de reports por created_at, y de report_sections y
+report_analytics por el created_at de su informe (report_created_at)
+Las particiones se crean por adelantado (REPORT_PARTITION_MONTHS_AHEAD meses) y las
+de más de REPORT_RETENTION_MONTHS meses se archivan en Parquet (zstd) bajo
+REPORT_ARCHIVE_DIR y se separan de la tabla. Lo hace periódicamente
+partition_maintenance (iniciada con la aplicación) o, a mano, desde backend/:
+
+    python -m app.db.partitions
+"""
+import asyncio
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.serialization import dumps
+from app.db.models import Report, ReportAnalytics, ReportSection
+from app.db.rollups import rebuild_project_rollups
+
+logger = get_logger(__name__)
+
+PARTITIONED_TABLES = ("reports", "report_sections", "report_analytics")
+
+# Tablas que referencian a reports (report_created_at, report_id), particionadas por el mes del informe
+CHILD_TABLES = {"report_sections": ReportSection, "report_analytics": ReportAnalytics}
+
+# Clave del advisory lock que serializa el mantenimiento entre instancias
+PARTITION_LOCK_KEY = 7_140_049
+
+ARCHIVE_BATCH_SIZE = 5000
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+_INDEX_DEFINITION = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (USING .*)$")
+
+
+def month_start(value: Optional[datetime] = None) -> datetime:
+    """Inicio (UTC) del mes de `value`; por defecto, del mes en curso"""
+    value = (value or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def months_ago(months: int) -> datetime:
+    """Inicio del mes de hace `months - 1` meses: filtro de "últimos N meses" alineado con las particiones"""
+    return add_months(month_start(), 1 - months)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def list_partitions(connection: Connection, table: str) -> Dict[datetime, str]:
+    """Particiones mensuales de `table` por mes de inicio"""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table})
+    partitions = {}
+    for (name,) in rows:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)] = name
+    return partitions
+
+
+def index_definitions(connection: Connection, table: str) -> List[Tuple[str, str]]:
+    """(nombre, CREATE INDEX) de los índices de `table` salvo la clave primaria"""
+    rows = connection.execute(text(
+        "SELECT c.relname, pg_get_indexdef(i.indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary ORDER BY c.relname"
+    ), {"table": table})
+    return [(name, definition) for name, definition in rows]
+
+
+def copy_index(definition: str, name: str, table: str) -> str:
+    """La definición de un índice (pg_get_indexdef) aplicada a otra tabla con otro nombre"""
+    match = _INDEX_DEFINITION.match(definition)
+    if match is None:
+        raise ValueError(f"Definición de índice no reconocida: {definition}")
+    return f"CREATE {match.group(1) or ''}INDEX {name} ON {table} {match.group(2)}"
+
+
+def create_partition(connection: Connection, table: str, month: datetime) -> str:
+    """
+    Crear la partición de `table` para `month`. Se crea como tabla suelta con los
+    índices de la tabla padre (nombre del índice padre + sufijo del mes) y luego se
+    adjunta: ATTACH PARTITION no bloquea las lecturas ni escrituras de la tabla
+    padre, a diferencia de CREATE TABLE ... PARTITION OF.
+    """
+    name = partition_name(table, month)
+    suffix = name[len(table):]
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    for index, definition in index_definitions(connection, table):
+        connection.execute(text(copy_index(definition, f"{index}{suffix}", name)))
+    connection.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+    return name
+
+
+def ensure_partitions(
+    connection: Connection,
+    tables: Sequence[str] = PARTITIONED_TABLES,
+    first_month: Optional[datetime] = None,
+    months_ahead: Optional[int] = None,
+) -> List[str]:
+    """
+    Crear las particiones que falten desde `first_month` (por defecto, el mes en
+    curso) hasta `months_ahead` meses después del actual. Retorna las creadas.
+    """
+    months_ahead = settings.REPORT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    last = add_months(month_start(), months_ahead)
+    created = []
+    for table in tables:
+        existing = list_partitions(connection, table)
+        month = month_start(first_month)
+        while month <= last:
+            if month not in existing:
+                created.append(create_partition(connection, table, month))
+            month = add_months(month, 1)
+    if created:
+        logger.info(f"Particiones creadas: {len(created)} ({created[0]} ... {created[-1]})")
+    return created
+
+
+def _arrow_type(column) -> Any:
+    import pyarrow as pa
+
+    type_ = column.type
+    if isinstance(type_, DateTime):
+        return pa.timestamp("us", tz="UTC" if type_.timezone else None)
+    if isinstance(type_, Integer):
+        return pa.int64()
+    if isinstance(type_, Float):
+        return pa.float64()
+    if isinstance(type_, Boolean):
+        return pa.bool_()
+    # UUID, texto y documentos JSON (como texto JSON)
+    return pa.string()
+
+
+def _archive_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    if value is not None and not isinstance(value, (str, int, float, bool, datetime)):
+        return str(value)  # UUID
+    return value
+
+
+async def archive_rows(session: AsyncSession, table: Table, query: str, path: Path) -> int:
+    """
+    Escribir las filas de `query` (columnas de `table`) en un Parquet comprimido con
+    zstd, por lotes y sin cargar la partición completa en memoria. Se escribe a un
+    archivo temporal que se renombra al final. Retorna las filas escritas.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("pyarrow no está instalado: agregue pyarrow a requirements.txt")
+
+    schema = pa.schema([(column.name, _arrow_type(column)) for column in table.columns])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".tmp")
+    rows = 0
+    writer = pq.ParquetWriter(partial, schema, compression="zstd")
+    try:
+        result = await session.stream(text(query))
+        async for batch in result.partitions(ARCHIVE_BATCH_SIZE):
+            records = [{key: _archive_value(value) for key, value in row._mapping.items()} for row in batch]
+            await asyncio.to_thread(writer.write_table, pa.Table.from_pylist(records, schema=schema))
+            rows += len(records)
+    finally:
+        writer.close()
+    os.replace(partial, path)
+    return rows
+
+
+async def retire_month(session: AsyncSession, month: datetime, archive_dir: Path) -> Dict[str, int]:
+    """
+    Archivar y retirar un mes: informes y sus secciones y analytics, que están en
+    las particiones del mismo mes. Primero se escriben los archivos y se confirma
+    la transacción de lectura (los cursores del servidor mantienen las particiones
+    en uso hasta entonces); luego se separan y eliminan las particiones en una
+    segunda transacción, cuyo commit queda a cargo de quien llama: primero las de
+    las tablas hijas, porque reports no puede separar una partición con filas que
+    la referencian. Un mes vencido no recibe informes nuevos entre ambas: se crean
+    con created_at = now().
+    """
+    retired = []
+    for table in CHILD_TABLES:
+        if month in await session.run_sync(lambda s, table=table: list_partitions(s.connection(), table)):
+            retired.append(table)
+    retired.append("reports")
+
+    models = {"reports": Report, **CHILD_TABLES}
+    archived = {}
+    for table in retired:
+        name = partition_name(table, month)
+        archived[table] = await archive_rows(
+            session, models[table].__table__, f"SELECT * FROM {name}", archive_dir / table / f"{name}.parquet"
+        )
+    await session.commit()
+
+    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    for table in retired:
+        name = partition_name(table, month)
+        await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+    return archived
+
+
+async def apply_retention(
+    session: AsyncSession,
+    retention_months: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+) -> List[str]:
+    """
+    Archivar y retirar las particiones anteriores a los últimos `retention_months`
+    meses (0 desactiva la retención), mes a mes, y reconstruir los
+    rollups de proyecto con los informes que quedan. Retorna las particiones de
+    reports retiradas.
+    """
+    retention_months = settings.REPORT_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0:
+        return []
+    archive_path = Path(archive_dir or settings.REPORT_ARCHIVE_DIR)
+    cutoff = months_ago(retention_months)
+    partitions = await session.run_sync(lambda s: list_partitions(s.connection(), "reports"))
+
+    retired = []
+    for month in sorted(month for month in partitions if month < cutoff):
+        try:
+            archived = await retire_month(session, month, archive_path)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        retired.append(partitions[month])
+        logger.info(f"Partición {partitions[month]} archivada en {archive_path} y retirada: {archived}")
+
+    if retired:
+        await rebuild_project_rollups(session)
+        await session.commit()
+    return retired
+
+
+async def maintain_partitions(session: AsyncSession) -> Dict[str, List[str]]:
+    """Crear las particiones próximas y aplicar la retención"""
+    created = await session.run_sync(lambda s: ensure_partitions(s.connection()))
+    await session.commit()
+    return {"created": created, "retired": await apply_retention(session)}
+
+
+class PartitionMaintenance:
+    """Mantenimiento periódico de particiones en segundo plano (cada PARTITION_MAINTENANCE_INTERVAL segundos)"""
+
+    RETRY_INTERVAL = 300.0  # Tras un fallo (p.ej. BD aún no disponible al iniciar), reintentar antes
+
+    def __init__(self, interval: float = settings.PARTITION_MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self.last_run: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, List[str]]:
+        from app.db.session import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as session:
+            result = await maintain_partitions(session)
+        self.last_run = datetime.now(timezone.utc).timestamp()
+        self.last_error = None
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            delay = self.interval
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Mantenimiento de particiones fallido: {self.last_error}")
+                delay = min(self.interval, self.RETRY_INTERVAL)
+            await asyncio.sleep(delay)
+
+    async def start(self) -> None:
+        """Iniciar la tarea periódica (no hace nada si el intervalo es 0)"""
+        if self._task or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Instancia global del mantenimiento de particiones
+partition_maintenance = PartitionMaintenance()
+
+
+async def main() -> None:
+    from app.db.session import engine
+
+    try:
+        result = await partition_maintenance.run_once()
+        logger.info(f"Particiones creadas: {len(result['created'])}, retiradas: {len(result['retired'])}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+Pool de conexiones instrumentado
+Mide la espera de cada checkout y la saturación del pool, y lleva el estado de
+disponibilidad de la base de datos a partir de los propios checkouts, sin
+consultas de prueba por request.
+"""
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.core.logging.config import get_logger
+
+logger = get_logger(__name__)
+
+
+class PoolMonitor:
+    """
+    Estadísticas de checkout del pool y disponibilidad de la base de datos.
+
+    Tras un fallo al obtener una conexión (que no sea por pool agotado), la base de
+    datos se considera no disponible durante DB_RETRY_INTERVAL segundos; el
+    siguiente checkout exitoso la marca disponible de nuevo.
+    """
+
+    WINDOW = 1000  # Checkouts recientes para los percentiles de espera
+
+    def __init__(self, retry_interval: float = settings.DB_RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self.checkouts = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.peak_checked_out = 0
+        self.last_error: Optional[str] = None
+        self._waits = deque(maxlen=self.WINDOW)
+        self._unavailable_until = 0.0
+
+    def record_checkout(self, wait: float, checked_out: int) -> None:
+        self.checkouts += 1
+        self._waits.append(wait)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+        self._unavailable_until = 0.0
+
+    def record_timeout(self) -> None:
+        self.timeouts += 1
+
+    def record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self._unavailable_until = time.monotonic() + self.retry_interval
+        logger.warning(f"No se pudo obtener una conexión a la base de datos: {self.last_error}")
+
+    def available(self) -> bool:
+        """False si el último intento de conexión falló hace menos de retry_interval segundos"""
+        return time.monotonic() >= self._unavailable_until
+
+    def stats(self, pool: Optional[Any] = None) -> Dict[str, Any]:
+        """Contadores, espera de checkout (ms) y, si se pasa el pool, su ocupación actual"""
+        waits = sorted(self._waits)
+        summary = {
+            "available": self.available(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "peak_checked_out": self.peak_checked_out,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 3) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 3) if waits else 0.0,
+            },
+        }
+        if isinstance(pool, InstrumentedPool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            summary.update({
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "saturation": round(pool.checkedout() / capacity, 4) if capacity else 0.0,
+            })
+        return summary
+
+
+pool_monitor = PoolMonitor()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Pool async de SQLAlchemy que registra el tiempo de cada checkout (espera por
+    una conexión libre, apertura de conexiones nuevas y pre-ping si está activo)
+    y los fallos de conexión. Registra en pool_monitor (BD principal) salvo que la
+    subclase indique otro monitor (ver monitored_pool).
+    """
+
+    monitor: Optional[PoolMonitor] = None
+
+    def connect(self):
+        monitor = self.monitor or pool_monitor
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            monitor.record_timeout()
+            raise
+        except Exception as e:
+            monitor.record_failure(e)
+            raise
+        monitor.record_checkout(time.perf_counter() - start, self.checkedout())
+        return connection
+
+
+def monitored_pool(monitor: PoolMonitor) -> type:
+    """
+    Clase de pool instrumentado con su propio monitor (p.ej. una réplica). Es una
+    clase y no un atributo del pool para que se conserve cuando SQLAlchemy recrea
+    el pool (engine.dispose, invalidación).
+    """
+    return type("InstrumentedPool", (InstrumentedPool,), {"monitor": monitor})
@@ -0,0 +1,179 @@
+"""
+Rollups por proyecto (tabla project_rollups)
+Se actualizan de forma incremental en la transacción que guarda los informes y se
+reconstruyen desde reports, report_sections y report_analytics para backfill o
+corrección:
+
+    python -m app.db.rollups                       # todos los proyectos
+    python -m app.db.rollups --project-id <uuid>   # un proyecto
+"""
+import argparse
+import asyncio
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func, or_, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging.config import get_logger
+from app.db.models import ProjectRollup
+
+logger = get_logger(__name__)
+
+SEVERITY_RANKS = {"INFO": 0, "WARNING": 1, "CRITICAL": 2}
+SEVERITY_BY_RANK = {rank: severity for severity, rank in SEVERITY_RANKS.items()}
+
+# Reconstrucción: mismo resultado que aplicar add_reports_to_rollup a cada informe
+REBUILD_SQL = text("""
+WITH report_rows AS (
+    SELECT r.project_id, r.id, r.created_at, s.worst_rank,
+           a.budget_efficiency * 100 AS execution_pct, a.risk_score
+    FROM reports r
+    LEFT JOIN LATERAL (
+        SELECT max(CASE severity WHEN 'CRITICAL' THEN 2 WHEN 'WARNING' THEN 1 WHEN 'INFO' THEN 0 END) AS worst_rank
+        FROM report_sections WHERE report_created_at = r.created_at AND report_id = r.id
+    ) s ON true
+    LEFT JOIN report_analytics a ON a.report_created_at = r.created_at AND a.report_id = r.id
+    WHERE r.project_id IS NOT NULL AND (CAST(:project_id AS uuid) IS NULL OR r.project_id = :project_id)
+)
+INSERT INTO project_rollups (
+    project_id, report_count, latest_report_id, latest_report_at, latest_execution_pct,
+    worst_severity_rank, risk_score_sum, risk_score_count, updated_at
+)
+SELECT project_id, count(*),
+       (array_agg(id ORDER BY created_at DESC, id DESC))[1],
+       max(created_at),
+       (array_agg(execution_pct ORDER BY created_at DESC, id DESC))[1],
+       max(worst_rank), coalesce(sum(risk_score), 0), count(risk_score), now()
+FROM report_rows
+GROUP BY project_id
+ON CONFLICT (project_id) DO UPDATE SET
+    report_count = excluded.report_count,
+    latest_report_id = excluded.latest_report_id,
+    latest_report_at = excluded.latest_report_at,
+    latest_execution_pct = excluded.latest_execution_pct,
+    worst_severity_rank = excluded.worst_severity_rank,
+    risk_score_sum = excluded.risk_score_sum,
+    risk_score_count = excluded.risk_score_count,
+    updated_at = excluded.updated_at
+""")
+
+DELETE_STALE_SQL = text("""
+DELETE FROM project_rollups p
+WHERE (CAST(:project_id AS uuid) IS NULL OR p.project_id = :project_id)
+  AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.project_id = p.project_id)
+""")
+
+
+def report_rollup_values(report_id: uuid.UUID, severities: Iterable[str],
+                         budget_efficiency: Optional[float], risk_score: Optional[float]) -> Dict[str, Any]:
+    """Aporte de un informe al rollup de su proyecto"""
+    ranks = [SEVERITY_RANKS[severity] for severity in severities if severity in SEVERITY_RANKS]
+    return {
+        "id": report_id,
+        "severity_rank": max(ranks) if ranks else None,
+        "execution_pct": budget_efficiency * 100 if budget_efficiency is not None else None,
+        "risk_score": risk_score,
+    }
+
+
+async def add_reports_to_rollup(session: AsyncSession, project_id: uuid.UUID, reports: List[Dict[str, Any]]) -> None:
+    """
+    Sumar al rollup del proyecto informes insertados en la transacción en curso
+    (valores de report_rollup_values), con un único INSERT ... ON CONFLICT.
+
+    Los informes de una transacción tienen created_at = now(); entre ellos el más
+    reciente es el de mayor id, igual que en la reconstrucción. El upsert bloquea la
+    fila del proyecto hasta el commit, así que los guardados concurrentes de un
+    mismo proyecto se aplican uno tras otro sin perder conteos.
+    """
+    if not reports:
+        return
+    latest = max(reports, key=lambda report: report["id"])
+    ranks = [report["severity_rank"] for report in reports if report["severity_rank"] is not None]
+    risks = [report["risk_score"] for report in reports if report["risk_score"] is not None]
+
+    table = ProjectRollup.__table__
+    stmt = insert(table).values(
+        project_id=project_id,
+        report_count=len(reports),
+        latest_report_id=latest["id"],
+        latest_report_at=func.now(),
+        latest_execution_pct=latest["execution_pct"],
+        worst_severity_rank=max(ranks) if ranks else None,
+        risk_score_sum=float(sum(risks)),
+        risk_score_count=len(risks),
+        updated_at=func.now(),
+    )
+    excluded = stmt.excluded
+    newer = or_(
+        table.c.latest_report_at.is_(None),
+        tuple_(excluded.latest_report_at, excluded.latest_report_id)
+        > tuple_(table.c.latest_report_at, table.c.latest_report_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.project_id],
+        set_={
+            "report_count": table.c.report_count + excluded.report_count,
+            "latest_report_id": case((newer, excluded.latest_report_id), else_=table.c.latest_report_id),
+            "latest_report_at": case((newer, excluded.latest_report_at), else_=table.c.latest_report_at),
+            "latest_execution_pct": case((newer, excluded.latest_execution_pct), else_=table.c.latest_execution_pct),
+            # GREATEST ignora los NULL (proyectos o informes sin secciones)
+            "worst_severity_rank": func.greatest(table.c.worst_severity_rank, excluded.worst_severity_rank),
+            "risk_score_sum": table.c.risk_score_sum + excluded.risk_score_sum,
+            "risk_score_count": table.c.risk_score_count + excluded.risk_score_count,
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def rebuild_project_rollups(session: AsyncSession, project_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Recalcular los rollups (de un proyecto o de todos) desde las tablas de informes
+    y eliminar los de proyectos sin informes. Retorna los rollups escritos; el
+    commit queda a cargo de quien llama.
+
+    Bloquea project_rollups frente a escrituras hasta el commit: los guardados de
+    informes en curso terminan antes de leer y los nuevos esperan, así ninguno se
+    pierde ni se cuenta dos veces.
+    """
+    await session.execute(text("LOCK TABLE project_rollups IN SHARE ROW EXCLUSIVE MODE"))
+    params = {"project_id": project_id}
+    result = await session.execute(REBUILD_SQL, params)
+    await session.execute(DELETE_STALE_SQL, params)
+    return result.rowcount
+
+
+def rollup_summary(rollup: ProjectRollup) -> Dict[str, Any]:
+    """Totales del proyecto para tableros"""
+    return {
+        "project_id": rollup.project_id,
+        "report_count": rollup.report_count,
+        "latest_report_id": rollup.latest_report_id,
+        "latest_report_at": rollup.latest_report_at,
+        "latest_execution_pct": rollup.latest_execution_pct,
+        "worst_severity": SEVERITY_BY_RANK.get(rollup.worst_severity_rank),
+        "average_risk_score": rollup.average_risk_score,
+        "updated_at": rollup.updated_at,
+    }
+
+
+async def main(project_id: Optional[uuid.UUID] = None) -> None:
+    from app.db.session import AsyncSessionLocal, engine
+
+    try:
+        async with AsyncSessionLocal() as session:
+            written = await rebuild_project_rollups(session, project_id)
+            await session.commit()
+        logger.info(f"Rollups reconstruidos: {written}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--project-id", type=uuid.UUID, default=None, help="Reconstruir solo este proyecto")
+    args = parser.parse_args()
+    asyncio.run(main(args.project_id))
@@ -9,6 +9,12 @@ import structlog
 from app.core.config import settings
 from app.api.api import api_router
 from app.core.logging.config import configure_logging
+from app.core.job_queue import job_queue
+from app.db.partitions import partition_maintenance
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.profiling import InFlightMiddleware
+from app.services.pdf_export import shutdown_render_pool
+from app.services.ai_intelligence_engine import stage_executor
 
 # Configurar logging al inicio de la aplicación
 configure_logging()
@@ -26,6 +32,16 @@ app = FastAPI(
     default_response_class=JSONResponse,
 )
 
+# Idempotency-Key para los endpoints que generan informes. Se registra antes que GZIP
+# para quedar por dentro: las respuestas se guardan sin comprimir
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        f"{settings.API_V1_STR}/reports/{path}"
+        for path in ("generate", "generate-simple", "jobs", "export/pdf")
+    ],
+)
+
 # Middleware de compresión GZIP para mejorar el rendimiento
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
@@ -36,9 +52,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["X-Total-Count", "X-Processing-Time"],
+    expose_headers=["X-Total-Count", "X-Processing-Time", "ETag", "Idempotent-Replayed"],
 )
 
+# Requests en curso: el perfilado de memoria solo muestrea con el proceso libre
+app.add_middleware(InFlightMiddleware)
+
 # Middleware personalizado para logging de rendimiento
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -139,10 +158,16 @@ async def startup_event():
         environment=settings.ENVIRONMENT,
         cors_origins=settings.get_cors_origins(),
     )
+    await job_queue.start()
+    await partition_maintenance.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Evento ejecutado al cerrar la aplicación."""
     logger.info("Application shutting down")
+    await job_queue.stop()
+    await partition_maintenance.stop()
+    shutdown_render_pool()
+    stage_executor.shutdown()
 
 # Health checks moved to dedicated endpoint module
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 
 class ReportRequest(BaseModel):
     # Metadata opcional para el informe
@@ -20,4 +20,46 @@ class GeneratedReport(BaseModel):
     contract_type: str = "Urgencia Manifiesta"
     year: int = 2025
     context: str = "Secretaría de Infraestructura Física - Alcaldía de Medellín"
-    sections: List[ReportSection]
\ No newline at end of file
+    sections: List[ReportSection]
+
+
+# Construcción confiable (sin validación) para modelos que genera el propio backend. Los
+# servicios de informes ya garantizan los tipos, así que no hace falta validar cada sección
+# al crearla ni copiar su diccionario `data`. Se asignan directamente los atributos internos
+# de una instancia de pydantic 2 (__dict__, campos asignados, extra y privados), lo mismo que
+# deja model_construct sin recorrer los campos en Python: en pydantic 2.5 model_construct es
+# más lento que validar, y esto, más rápido (benchmarks/bench_report_models.py). No usar con
+# datos del usuario; tests/unit/test_report_models.py verifica la equivalencia.
+_object_setattr = object.__setattr__
+
+_REPORT_DEFAULTS = {
+    name: field.default for name, field in GeneratedReport.model_fields.items() if not field.is_required()
+}
+
+
+def _construct(model, fields_set: set, values: dict):
+    instance = model.__new__(model)
+    _object_setattr(instance, "__dict__", values)
+    _object_setattr(instance, "__pydantic_fields_set__", fields_set)
+    _object_setattr(instance, "__pydantic_extra__", None)
+    _object_setattr(instance, "__pydantic_private__", None)
+    return instance
+
+
+def trusted_message(block_name: str, message: str, severity: str) -> TechnicalMessage:
+    """TechnicalMessage sin validación"""
+    return _construct(
+        TechnicalMessage, {"block_name", "message", "severity"},
+        {"block_name": block_name, "message": message, "severity": severity},
+    )
+
+
+def trusted_section(title: str, data: dict, message: TechnicalMessage) -> ReportSection:
+    """ReportSection sin validación"""
+    return _construct(ReportSection, {"title", "data", "message"}, {"title": title, "data": data, "message": message})
+
+
+def trusted_report(sections: List[ReportSection], **metadata: Any) -> GeneratedReport:
+    """GeneratedReport sin validación; la metadata omitida toma los valores por defecto"""
+    # Con todos los campos en el orden de la clase, igual que al validar (y las claves del JSON)
+    return _construct(GeneratedReport, {"sections", *metadata}, {**_REPORT_DEFAULTS, **metadata, "sections": sections})
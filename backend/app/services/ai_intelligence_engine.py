@@ -6,21 +6,23 @@ Versión optimizada para máximo rendimiento
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from datetime import datetime, timedelta
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from collections import OrderedDict
 from enum import Enum
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-import gc
-import psutil
+import threading
 import time
 
 # Machine Learning optimizado
 from sklearn.ensemble import RandomForestRegressor, IsolationForest
 from sklearn.preprocessing import StandardScaler, RobustScaler
+from sklearn.base import clone
 from sklearn.cluster import KMeans
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import joblib
@@ -48,6 +50,12 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
+from app.core.config import settings
+from app.core.fingerprint import dataframe_fingerprint
+from app.core.profiling import memory_profiler, profile_stage
+from app.core.serialization import dumps
+from app.core.single_flight import SingleFlight
+
 # Configuración de logging optimizada
 import structlog
 logger = structlog.get_logger()
@@ -59,7 +67,7 @@ class SeverityLevel(Enum):
     CRITICAL = "CRITICAL"
     EMERGENCY = "EMERGENCY"
 
-@dataclass
+@dataclass(slots=True)
 class AIAnalysisResult:
     """Resultado del análisis de IA optimizado"""
     risk_score: float
@@ -70,7 +78,83 @@ class AIAnalysisResult:
     severity: SeverityLevel
     insights: Dict[str, Any]
     processing_time: float
-    memory_usage: float
+    memory_usage: float  # Pico de memoria (MB) si el análisis fue perfilado; 0.0 en otro caso
+    skipped_stages: List[str] = field(default_factory=list)
+    cached_stages: List[str] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Representación para respuestas JSON. Los valores NumPy anidados se dejan
+        tal cual: los serializa app.core.serialization sin conversión previa.
+        """
+        return {
+            "risk_score": self.risk_score,
+            "confidence": self.confidence,
+            "severity": self.severity.value,
+            "processing_time": self.processing_time,
+            "memory_usage": self.memory_usage,
+            "predictions": self.predictions,
+            "anomalies": self.anomalies,
+            "recommendations": self.recommendations,
+            "insights": self.insights,
+            "skipped_stages": self.skipped_stages,
+            "cached_stages": self.cached_stages
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AIAnalysisResult":
+        """Reconstruir un resultado desde to_dict (p.ej. publicado por otra instancia)"""
+        return cls(**{**data, "severity": SeverityLevel(data["severity"])})
+
+# Agrupamiento de análisis idénticos concurrentes (ver analyze_contract_data)
+analysis_flight = SingleFlight(
+    "analysis",
+    encode=lambda result: dumps(result.to_dict()),
+    decode=lambda raw: AIAnalysisResult.from_dict(json.loads(raw)),
+)
+
+class StageExecutor:
+    """
+    Pool acotado de hilos (ANALYSIS_STAGE_WORKERS) para las etapas del análisis.
+    
+    Una etapa que agota su timeout no se puede interrumpir y sigue ocupando su hilo;
+    con un pool propio esas etapas no retienen el executor por defecto del event loop.
+    `pending` cuenta las etapas enviadas que aún no terminaron (incluidas las
+    abandonadas): con el pool saturado las etapas opcionales se omiten sin enviarse.
+    """
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.pending = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.workers
+    
+    def submit(self, fn, *args) -> asyncio.Future:
+        """Ejecutar `fn` en el pool; cancelar el resultado descarta la etapa si aún no empezó"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis-stage")
+        with self._lock:
+            self.pending += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._finished)
+        return asyncio.wrap_future(future)
+    
+    def _finished(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+    
+    def shutdown(self) -> None:
+        """Cerrar el pool sin esperar a las etapas abandonadas"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# Hilos de las etapas del análisis, compartidos por todas las instancias del motor
+stage_executor = StageExecutor(settings.ANALYSIS_STAGE_WORKERS)
 
 class ContractIntelligenceEngine:
     """
@@ -86,6 +170,7 @@ class ContractIntelligenceEngine:
         self.scaler = StandardScaler()
         self._model_cache = {}
         self._analysis_cache = {}
+        self._stage_cache: "OrderedDict[Tuple[int, str], Any]" = OrderedDict()
         self._load_models()
         
     def _load_models(self):
@@ -129,10 +214,6 @@ class ContractIntelligenceEngine:
         load_time = time.time() - start_time
         logger.info(f"✅ Modelos cargados en {load_time:.2f} segundos")
         
-        # Limpiar memoria después de cargar modelos
-        gc.collect()
-        
-    @lru_cache(maxsize=128)
     def _get_cached_analysis(self, data_hash: str) -> Optional[AIAnalysisResult]:
         """Obtener análisis desde cache si existe"""
         return self._analysis_cache.get(data_hash)
@@ -148,6 +229,18 @@ class ContractIntelligenceEngine:
         
         self._analysis_cache[data_hash] = result
     
+    def _data_hash(self, data: pd.DataFrame, *params) -> int:
+        """
+        Hash de los datos para cache.
+        Usa el hash vectorizado de pandas; to_string() es prohibitivo en portafolios grandes.
+        """
+        try:
+            row_hashes = pd.util.hash_pandas_object(data, index=True).to_numpy()
+            return hash((tuple(map(str, data.columns)), row_hashes.tobytes(), params))
+        except TypeError:
+            # Columnas con valores no hashables (listas, diccionarios)
+            return hash((data.to_string(), params))
+    
     def _optimize_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Optimizar DataFrame para mejor rendimiento"""
         # Reducir uso de memoria
@@ -161,98 +254,257 @@ class ContractIntelligenceEngine:
         
         return df
     
-    def _get_memory_usage(self) -> float:
-        """Obtener uso de memoria actual"""
-        process = psutil.Process()
-        return process.memory_info().rss / 1024 / 1024  # MB
+    # Etapas costosas que en modo aproximado se ejecutan sobre una muestra estratificada;
+    # las demás son reglas vectorizadas baratas y siempre cubren todas las filas
+    SAMPLED_STAGES = frozenset({"anomalies", "sentiment"})
+    STRATA_COLUMNS = ("ubicacion", "tipo_contrato")
+    
+    # Etapas del análisis: (nombre, método, valor por defecto si la etapa falla, opcional)
+    # Las etapas opcionales se omiten o se sirven desde cache cuando el presupuesto
+    # de latencia está por agotarse
+    ANALYSIS_STAGES = (
+        ("risk_factors", "_analyze_risk_factors", dict, False),
+        ("anomalies", "_detect_anomalies", list, True),
+        ("temporal_analysis", "_analyze_temporal_patterns", dict, False),
+        ("predictions", "_generate_predictions", dict, False),
+        ("sentiment", "_analyze_text_sentiment", dict, True),
+    )
+    
+    # Estado de cada etapa tras ejecutarla con presupuesto de latencia
+    STAGE_OK = "ok"
+    STAGE_CACHED = "cached"
+    STAGE_SKIPPED = "skipped"
+    
+    # Reducción de confianza por cada etapa omitida
+    SKIPPED_STAGE_CONFIDENCE_PENALTY = 0.1
+    
+    def _prepare_data(self, data) -> pd.DataFrame:
+        """Convertir la entrada a DataFrame validando su tipo"""
+        if isinstance(data, dict):
+            return pd.DataFrame([data])
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError("Los datos deben ser un diccionario o un DataFrame")
+        return data
+    
+    async def _run_stage(self, stage: str, data: pd.DataFrame,
+                         deadline: Optional[float] = None, reserve: float = 0.0,
+                         data_hash: Optional[int] = None) -> Tuple[Any, str]:
+        """
+        Ejecutar una etapa del análisis en el pool de etapas (stage_executor).
+        
+        Retorna (resultado, estado). Con `deadline` el timeout de la etapa es el
+        tiempo restante (como máximo ANALYSIS_STAGE_TIMEOUT, si está definido); sin
+        presupuesto solo se aplica ANALYSIS_STAGE_TIMEOUT y, si es None, la etapa
+        corre hasta terminar. Las etapas opcionales no usan los últimos `reserve`
+        segundos antes de `deadline`: se omiten sin ejecutarse si ya no queda más
+        tiempo y su timeout termina donde empieza la reserva (en _analyze todas
+        arrancan a la vez, así que es el timeout el que la respeta). Una etapa
+        opcional con timeout también se omite sin ejecutarse si el pool está
+        saturado, en lugar de encolarla para abandonarla después.
+        Si una etapa agota su timeout o falla, se usa el último resultado en cache
+        para los mismos datos o, en su defecto, el valor por defecto. El hilo de una
+        etapa que agota su timeout no se interrumpe, pero su resultado se descarta.
+        """
+        for name, method_name, default, optional in self.ANALYSIS_STAGES:
+            if name == stage:
+                break
+        else:
+            raise ValueError(f"Etapa de análisis desconocida: {stage}")
+        
+        if stage == "sentiment" and 'descripcion' not in data.columns:
+            return self._empty_analysis(), self.STAGE_OK
+        
+        cache_key = (data_hash, stage) if data_hash is not None else None
+        timeout = settings.ANALYSIS_STAGE_TIMEOUT
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if optional:
+                remaining -= reserve
+                if remaining <= 0:
+                    logger.warning(f"Etapa {stage} omitida: presupuesto de latencia casi agotado")
+                    return self._stage_fallback(cache_key, default)
+            timeout = max(remaining, 0.0) if timeout is None else min(timeout, max(remaining, 0.0))
+        if optional and timeout is not None and stage_executor.saturated:
+            logger.warning(f"Etapa {stage} omitida: pool de etapas saturado")
+            return self._stage_fallback(cache_key, default)
+        
+        try:
+            value = await asyncio.wait_for(stage_executor.submit(getattr(self, method_name), data), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Etapa {stage} excedió su timeout de {timeout:.2f}s")
+            return self._stage_fallback(cache_key, default)
+        except Exception as e:
+            logger.error(f"Error en etapa {stage}: {e}")
+            return self._stage_fallback(cache_key, default)
+        
+        if cache_key is not None:
+            self._stage_cache[cache_key] = value
+            self._stage_cache.move_to_end(cache_key)
+            while len(self._stage_cache) > settings.STAGE_CACHE_SIZE:
+                self._stage_cache.popitem(last=False)
+        
+        return value, self.STAGE_OK
+    
+    def _stage_fallback(self, cache_key: Optional[Tuple[int, str]], default) -> Tuple[Any, str]:
+        """Resultado de una etapa no ejecutada: desde cache si existe, si no el valor por defecto"""
+        if cache_key is not None and cache_key in self._stage_cache:
+            return self._stage_cache[cache_key], self.STAGE_CACHED
+        return default(), self.STAGE_SKIPPED
+    
+    def _budget_window(self, start_time: float,
+                       latency_budget: Optional[float]) -> Tuple[Optional[float], float]:
+        """Calcular (deadline, reserva en segundos) para un presupuesto de latencia"""
+        if latency_budget is None:
+            latency_budget = settings.DEFAULT_LATENCY_BUDGET
+        if not latency_budget:
+            return None, 0.0
+        return start_time + latency_budget, latency_budget * settings.LATENCY_BUDGET_RESERVE
+    
+    def _build_result(self, stage_results: Dict[str, Any], start_time: float,
+                      approximation: Optional[Dict[str, Any]] = None,
+                      stage_status: Optional[Dict[str, str]] = None,
+                      memory_usage: float = 0.0) -> AIAnalysisResult:
+        """Combinar los resultados de las etapas en el resultado final"""
+        stage_status = stage_status or {}
+        skipped_stages = [name for name, status in stage_status.items() if status == self.STAGE_SKIPPED]
+        cached_stages = [name for name, status in stage_status.items() if status == self.STAGE_CACHED]
+        risk_analysis = stage_results["risk_factors"]
+        anomalies = stage_results["anomalies"]
+        temporal_analysis = stage_results["temporal_analysis"]
+        predictions = stage_results["predictions"]
+        sentiment_analysis = stage_results["sentiment"]
+        
+        # Calcular score de riesgo final
+        risk_score = self._calculate_final_risk_score(
+            risk_analysis, anomalies, temporal_analysis, predictions
+        )
+        
+        # Determinar severidad
+        severity = self._determine_severity(risk_score)
+        
+        # Generar recomendaciones
+        recommendations = self._generate_recommendations(
+            risk_analysis, anomalies, temporal_analysis, predictions, severity
+        )
+        
+        # Calcular confianza
+        confidence = self._calculate_confidence(
+            risk_analysis, anomalies, temporal_analysis, predictions
+        )
+        if skipped_stages:
+            confidence = max(
+                0.1, confidence - self.SKIPPED_STAGE_CONFIDENCE_PENALTY * len(skipped_stages)
+            )
+        
+        # Crear insights
+        insights = self._create_insights(
+            risk_analysis, anomalies, temporal_analysis, predictions, sentiment_analysis
+        )
+        if approximation is not None:
+            insights['approximation'] = approximation
+        
+        processing_time = time.time() - start_time
+        logger.info(f"✅ Análisis completado en {processing_time:.2f}s")
+        
+        return AIAnalysisResult(
+            risk_score=risk_score,
+            confidence=confidence,
+            predictions=predictions,
+            anomalies=anomalies,
+            recommendations=recommendations,
+            severity=severity,
+            insights=insights,
+            processing_time=processing_time,
+            memory_usage=memory_usage,
+            skipped_stages=skipped_stages,
+            cached_stages=cached_stages
+        )
     
-    async def analyze_contract_data(self, data) -> AIAnalysisResult:
+    async def analyze_contract_data(self, data, approximate: bool = False,
+                                    latency_budget: Optional[float] = None) -> AIAnalysisResult:
         """
         Análisis principal de datos de contrato con optimizaciones
+        
+        Con `approximate=True` las etapas costosas (anomalías, sentimiento) se ejecutan
+        sobre una muestra estratificada por ubicación y tipo de contrato, y los
+        insights incluyen intervalos de confianza para las métricas muestreadas.
+        
+        Con `latency_budget` (segundos) cada etapa recibe como timeout el tiempo
+        restante del presupuesto y las etapas opcionales se omiten o se sirven desde
+        cache cuando está por agotarse; el resultado lista las etapas omitidas en
+        `skipped_stages` y reduce `confidence` en consecuencia.
+        
+        Una fracción de los análisis (PROFILING_SAMPLE_RATE) se perfila con tracemalloc;
+        en esos las etapas se ejecutan en serie y `memory_usage` reporta el pico en MB.
+        
+        Las llamadas concurrentes con el mismo contenido y parámetros comparten un único
+        cálculo (single-flight); con SINGLE_FLIGHT_MIN_ROWS filas o más el agrupamiento
+        se coordina también entre instancias a través de Redis.
         """
         start_time = time.time()
-        initial_memory = self._get_memory_usage()
+        deadline, reserve = self._budget_window(start_time, latency_budget)
         
         # Convertir diccionario a DataFrame si es necesario
-        if isinstance(data, dict):
-            data = pd.DataFrame([data])
-        elif not isinstance(data, pd.DataFrame):
-            raise ValueError("Los datos deben ser un diccionario o un DataFrame")
+        data = self._prepare_data(data)
         
         # Crear hash de datos para cache
-        data_hash = hash(data.to_string())
+        data_hash = self._data_hash(data, approximate)
         cached_result = self._get_cached_analysis(data_hash)
         if cached_result:
             logger.info("✅ Resultado obtenido desde cache")
             return cached_result
         
-        # Optimizar DataFrame
-        data = self._optimize_dataframe(data.copy())
-        
+        # Análisis idénticos concurrentes se ejecutan una sola vez; los grandes se
+        # coordinan también entre instancias con una huella estable del contenido
+        distributed = len(data) >= settings.SINGLE_FLIGHT_MIN_ROWS
+        key = (
+            dataframe_fingerprint(data, approximate, latency_budget) if distributed
+            else f"{data_hash}:{latency_budget}"
+        )
+        return await analysis_flight.do(
+            key,
+            lambda: self._analyze(data, data_hash, approximate, start_time, deadline, reserve),
+            distributed=distributed,
+        )
+    
+    async def _analyze(self, data: pd.DataFrame, data_hash: int, approximate: bool,
+                       start_time: float, deadline: Optional[float], reserve: float) -> AIAnalysisResult:
+        """Ejecutar las etapas del análisis (sin cache ni agrupamiento)"""
+        profile = memory_profiler.start("analyze_contract_data")
         try:
-            # Análisis paralelo de diferentes aspectos
-            tasks = [
-                self._analyze_risk_factors(data),
-                self._detect_anomalies(data),
-                self._analyze_temporal_patterns(data),
-                self._generate_predictions(data),
-                self._analyze_text_sentiment(data) if 'descripcion' in data.columns else asyncio.create_task(self._empty_analysis())
-            ]
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Procesar resultados
-            risk_analysis = results[0] if not isinstance(results[0], Exception) else {}
-            anomalies = results[1] if not isinstance(results[1], Exception) else []
-            temporal_analysis = results[2] if not isinstance(results[2], Exception) else {}
-            predictions = results[3] if not isinstance(results[3], Exception) else {}
-            sentiment_analysis = results[4] if not isinstance(results[4], Exception) else {}
-            
-            # Calcular score de riesgo final
-            risk_score = self._calculate_final_risk_score(
-                risk_analysis, anomalies, temporal_analysis, predictions
-            )
-            
-            # Determinar severidad
-            severity = self._determine_severity(risk_score)
-            
-            # Generar recomendaciones
-            recommendations = self._generate_recommendations(
-                risk_analysis, anomalies, temporal_analysis, predictions, severity
-            )
-            
-            # Calcular confianza
-            confidence = self._calculate_confidence(
-                risk_analysis, anomalies, temporal_analysis, predictions
-            )
-            
-            # Crear insights
-            insights = self._create_insights(
-                risk_analysis, anomalies, temporal_analysis, predictions, sentiment_analysis
-            )
-            
-            processing_time = time.time() - start_time
-            final_memory = self._get_memory_usage()
-            
-            result = AIAnalysisResult(
-                risk_score=risk_score,
-                confidence=confidence,
-                predictions=predictions,
-                anomalies=anomalies,
-                recommendations=recommendations,
-                severity=severity,
-                insights=insights,
-                processing_time=processing_time,
-                memory_usage=final_memory - initial_memory
+            # Optimizar DataFrame
+            with profile_stage(profile, "preparacion"):
+                data = self._optimize_dataframe(data.copy())
+                sample = self._stratified_sample(data) if approximate else None
+            
+            stage_names = [name for name, _, _, _ in self.ANALYSIS_STAGES]
+            if profile is None:
+                # Análisis paralelo de diferentes aspectos
+                outcomes = await asyncio.gather(*(
+                    self._run_stage(name, self._stage_input(name, data, sample), deadline, reserve, data_hash)
+                    for name in stage_names
+                ))
+            else:
+                # Análisis perfilado: etapas en serie para atribuir la memoria a cada una
+                outcomes = []
+                for name in stage_names:
+                    with profile.stage(name):
+                        outcomes.append(await self._run_stage(
+                            name, self._stage_input(name, data, sample), deadline, reserve, data_hash
+                        ))
+            stage_results = {name: value for name, (value, _) in zip(stage_names, outcomes)}
+            stage_status = {name: status for name, (_, status) in zip(stage_names, outcomes)}
+            
+            approximation = (
+                self._approximation_summary(data, sample, stage_results)
+                if sample is not None else None
             )
+            result = self._build_result(stage_results, start_time, approximation, stage_status,
+                                        memory_usage=profile.peak_mb if profile else 0.0)
             
-            # Guardar en cache
-            self._cache_analysis(data_hash, result)
-            
-            logger.info(
-                f"✅ Análisis completado en {processing_time:.2f}s, "
-                f"memoria: {final_memory - initial_memory:.2f}MB"
-            )
+            # Guardar en cache solo resultados completos
+            if not result.skipped_stages:
+                self._cache_analysis(data_hash, result)
             
             return result
             
@@ -260,14 +512,201 @@ class ContractIntelligenceEngine:
             logger.error(f"❌ Error en análisis: {str(e)}")
             raise
         finally:
-            # Limpiar memoria
-            gc.collect()
+            memory_profiler.finish(profile)
     
-    async def _empty_analysis(self):
+    async def analyze_contract_data_stream(self, data, approximate: bool = False,
+                                           latency_budget: Optional[float] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Variante progresiva de analyze_contract_data.
+        Las etapas corren en paralelo, como en _analyze; produce (etapa, resultado)
+        en el orden en que terminan y al final ("result", AIAnalysisResult) con el
+        score de riesgo final. Si el consumidor abandona el stream, las etapas
+        pendientes se cancelan.
+        """
+        start_time = time.time()
+        deadline, reserve = self._budget_window(start_time, latency_budget)
+        
+        data = self._prepare_data(data)
+        
+        data_hash = self._data_hash(data, approximate)
+        cached_result = self._get_cached_analysis(data_hash)
+        if cached_result:
+            logger.info("✅ Resultado obtenido desde cache")
+            yield "result", cached_result
+            return
+        
+        data = self._optimize_dataframe(data.copy())
+        sample = self._stratified_sample(data) if approximate else None
+        
+        async def run(name: str) -> Tuple[str, Tuple[Any, str]]:
+            return name, await self._run_stage(
+                name, self._stage_input(name, data, sample), deadline, reserve, data_hash
+            )
+        
+        tasks = [asyncio.create_task(run(name)) for name, _, _, _ in self.ANALYSIS_STAGES]
+        stage_results = {}
+        stage_status = {}
+        try:
+            for finished in asyncio.as_completed(tasks):
+                name, (stage_results[name], stage_status[name]) = await finished
+                yield name, stage_results[name]
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        approximation = (
+            self._approximation_summary(data, sample, stage_results)
+            if sample is not None else None
+        )
+        result = self._build_result(stage_results, start_time, approximation, stage_status)
+        if not result.skipped_stages:
+            self._cache_analysis(data_hash, result)
+        yield "result", result
+    
+    async def analyze_portfolio_stream(self, data: pd.DataFrame,
+                                       chunk_size: int) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analizar un portafolio por bloques de `chunk_size` contratos.
+        Produce ("progress", resumen_del_bloque) por cada bloque y al final
+        ("summary", resumen_del_portafolio).
+        """
+        data = self._prepare_data(data)
+        total_rows = len(data)
+        total_chunks = max(1, -(-total_rows // chunk_size))
+        
+        weighted_risk = 0.0
+        total_anomalies = 0
+        worst_severity = SeverityLevel.INFO
+        severity_order = list(SeverityLevel)
+        
+        for chunk_index in range(total_chunks):
+            chunk = data.iloc[chunk_index * chunk_size:(chunk_index + 1) * chunk_size]
+            result = await self.analyze_contract_data(chunk)
+            
+            weighted_risk += result.risk_score * len(chunk)
+            total_anomalies += len(result.anomalies)
+            if severity_order.index(result.severity) > severity_order.index(worst_severity):
+                worst_severity = result.severity
+            
+            yield "progress", {
+                "chunk": chunk_index + 1,
+                "total_chunks": total_chunks,
+                "rows_processed": min((chunk_index + 1) * chunk_size, total_rows),
+                "total_rows": total_rows,
+                "risk_score": result.risk_score,
+                "severity": result.severity.value,
+                "anomalies": len(result.anomalies),
+                "recommendations": result.recommendations
+            }
+        
+        yield "summary", {
+            "total_rows": total_rows,
+            "total_chunks": total_chunks,
+            "risk_score": weighted_risk / total_rows if total_rows else 0.0,
+            "severity": worst_severity.value,
+            "anomalies": total_anomalies
+        }
+    
+    def _stage_input(self, stage: str, data: pd.DataFrame,
+                     sample: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Datos que recibe una etapa: la muestra para etapas costosas en modo aproximado"""
+        if sample is not None and stage in self.SAMPLED_STAGES:
+            return sample
+        return data
+    
+    def _stratified_sample(self, data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        Muestra estratificada por ubicación y tipo de contrato con asignación
+        proporcional (al menos una fila por estrato).
+        Retorna None si el portafolio es menor que el tamaño de muestra.
+        """
+        sample_size = settings.APPROXIMATE_SAMPLE_SIZE
+        if len(data) <= sample_size:
+            return None
+        
+        fraction = sample_size / len(data)
+        shuffled = data.sample(frac=1.0, random_state=42)
+        strata_columns = [c for c in self.STRATA_COLUMNS if c in data.columns]
+        
+        if not strata_columns:
+            return shuffled.iloc[:sample_size]
+        
+        # Cuota por estrato sobre el orden aleatorio, sin iterar por grupo
+        groups = shuffled.groupby(strata_columns, observed=True, dropna=False, sort=False)
+        rank = groups.cumcount()
+        stratum_size = groups[strata_columns[0]].transform('size')
+        quota = np.maximum(1, np.round(stratum_size * fraction))
+        return shuffled[rank < quota]
+    
+    def _approximation_summary(self, data: pd.DataFrame, sample: pd.DataFrame,
+                               stage_results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estimaciones con intervalo de confianza del 95% para las métricas muestreadas.
+        La tasa de anomalías usa el estimador estratificado con corrección por
+        población finita; el sentimiento usa la aproximación de muestreo aleatorio simple.
+        """
+        population = len(data)
+        strata_columns = [c for c in self.STRATA_COLUMNS if c in data.columns]
+        
+        anomalous_rows = {anomaly['index'] for anomaly in stage_results.get('anomalies', [])}
+        flags = pd.Series(sample.index.isin(list(anomalous_rows)).astype('float64'), index=sample.index)
+        
+        if strata_columns:
+            stats = flags.groupby(
+                [sample[c] for c in strata_columns], observed=True, dropna=False
+            ).agg(['mean', 'var', 'count'])
+            stats['population'] = data.groupby(
+                strata_columns, observed=True, dropna=False
+            ).size().reindex(stats.index).to_numpy()
+        else:
+            stats = pd.DataFrame({
+                'mean': [flags.mean()], 'var': [flags.var()],
+                'count': [len(flags)], 'population': [population]
+            })
+        
+        weights = stats['population'] / population
+        finite_correction = 1 - stats['count'] / stats['population']
+        rate = float((weights * stats['mean']).sum())
+        variance = float((weights ** 2 * finite_correction * stats['var'].fillna(0) / stats['count']).sum())
+        margin = 1.96 * np.sqrt(variance)
+        
+        estimates = {
+            'tasa_anomalias': {
+                'valor': rate,
+                'ic95': [max(0.0, rate - margin), min(1.0, rate + margin)]
+            },
+            'anomalias_estimadas': {
+                'valor': rate * population,
+                'ic95': [max(0.0, rate - margin) * population, min(1.0, rate + margin) * population]
+            }
+        }
+        
+        sentiment = stage_results.get('sentiment', {})
+        if 'sentiment_promedio' in sentiment:
+            sentiment_margin = 1.96 * float(sentiment.get('sentiment_std', 0.0)) / np.sqrt(len(sample))
+            estimates['sentiment_promedio'] = {
+                'valor': float(sentiment['sentiment_promedio']),
+                'ic95': [
+                    float(sentiment['sentiment_promedio']) - sentiment_margin,
+                    float(sentiment['sentiment_promedio']) + sentiment_margin
+                ]
+            }
+        
+        return {
+            'modo': 'aproximado',
+            'tamano_muestra': len(sample),
+            'tamano_poblacion': population,
+            'estratos': len(stats),
+            'columnas_estrato': strata_columns,
+            'etapas_muestreadas': sorted(self.SAMPLED_STAGES),
+            'estimaciones': estimates
+        }
+    
+    def _empty_analysis(self):
         """Análisis vacío para casos donde no hay datos de texto"""
         return {}
     
-    async def _analyze_risk_factors(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_risk_factors(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Análisis de factores de riesgo optimizado"""
         try:
             risk_factors = {}
@@ -294,7 +733,7 @@ class ContractIntelligenceEngine:
             logger.error(f"Error en análisis de factores de riesgo: {e}")
             return {}
     
-    async def _detect_anomalies(self, data: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _detect_anomalies(self, data: pd.DataFrame) -> List[Dict[str, Any]]:
         """Detección de anomalías optimizada"""
         try:
             anomalies = []
@@ -307,14 +746,20 @@ class ContractIntelligenceEngine:
             X = data[numeric_columns].fillna(0)
             
             # Detectar anomalías
-            anomaly_scores = self.anomaly_detector.fit_predict(X)
+            # Clonar el detector: la instancia del motor se comparte entre requests concurrentes
+            detector = clone(self.anomaly_detector)
+            anomaly_scores = detector.fit_predict(X)
             anomaly_indices = np.where(anomaly_scores == 1)[0]
             
             for idx in anomaly_indices:
+                # Usar la etiqueta de la fila para que el índice apunte al archivo original
+                # aun cuando se analiza un bloque o una muestra del portafolio
+                label = X.index[idx]
+                row = int(label) if isinstance(label, (int, np.integer)) else int(idx)
                 anomaly = {
-                    'index': int(idx),
+                    'index': row,
                     'severity': 'CRITICAL',
-                    'description': f'Anomalía detectada en fila {idx + 1}',
+                    'description': f'Anomalía detectada en fila {row + 1}',
                     'columns_affected': list(numeric_columns),
                     'values': X.iloc[idx].to_dict()
                 }
@@ -326,20 +771,21 @@ class ContractIntelligenceEngine:
             logger.error(f"Error en detección de anomalías: {e}")
             return []
     
-    async def _analyze_temporal_patterns(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_temporal_patterns(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Análisis de patrones temporales optimizado"""
         try:
             temporal_analysis = {}
             
             # Análisis de tendencias si hay datos temporales
             if 'fecha_fin_planificada' in data.columns:
-                # Convertir fechas y calcular días restantes
-                data['fecha_fin'] = pd.to_datetime(data['fecha_fin_planificada'])
-                data['dias_restantes'] = (data['fecha_fin'] - pd.Timestamp.now()).dt.days
+                # Convertir fechas y calcular días restantes sin modificar el DataFrame,
+                # que otras etapas leen de forma concurrente
+                fecha_fin = pd.to_datetime(data['fecha_fin_planificada'])
+                dias_restantes = (fecha_fin - pd.Timestamp.now()).dt.days
                 
-                temporal_analysis['dias_restantes_promedio'] = data['dias_restantes'].mean()
-                temporal_analysis['proyectos_vencidos'] = (data['dias_restantes'] < 0).sum()
-                temporal_analysis['proyectos_criticos'] = ((data['dias_restantes'] >= 0) & (data['dias_restantes'] <= 30)).sum()
+                temporal_analysis['dias_restantes_promedio'] = dias_restantes.mean()
+                temporal_analysis['proyectos_vencidos'] = (dias_restantes < 0).sum()
+                temporal_analysis['proyectos_criticos'] = ((dias_restantes >= 0) & (dias_restantes <= 30)).sum()
             
             return temporal_analysis
             
@@ -347,7 +793,7 @@ class ContractIntelligenceEngine:
             logger.error(f"Error en análisis temporal: {e}")
             return {}
     
-    async def _generate_predictions(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _generate_predictions(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Generación de predicciones optimizada"""
         try:
             predictions = {}
@@ -363,7 +809,7 @@ class ContractIntelligenceEngine:
             
             if len(features) >= 2:
                 X = np.array(features).reshape(1, -1)
-                X_scaled = self.scaler.fit_transform(X)
+                X_scaled = StandardScaler().fit_transform(X)
                 
                 # Predicciones básicas
                 predictions['probabilidad_sobrecosto'] = min(0.8, max(0.1, np.random.random()))
@@ -376,7 +822,7 @@ class ContractIntelligenceEngine:
             logger.error(f"Error en generación de predicciones: {e}")
             return {}
     
-    async def _analyze_text_sentiment(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_text_sentiment(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Análisis de sentimientos de texto optimizado"""
         try:
             sentiment_analysis = {}
@@ -538,3 +984,12 @@ class ContractIntelligenceEngine:
                 'performance_metrics': {'eficiencia_global': 0.5},
                 'risk_indicators': {'nivel_riesgo_financiero': 0.5}
             }
+
+
+@lru_cache(maxsize=1)
+def get_intelligence_engine() -> ContractIntelligenceEngine:
+    """
+    Obtener la instancia compartida del motor de IA.
+    Los modelos se cargan una sola vez por proceso en lugar de en cada request.
+    """
+    return ContractIntelligenceEngine()
@@ -1,23 +1,120 @@
 """
 Servicio mejorado de generación de reportes con persistencia en base de datos
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.db.models import Report, Project, ReportSection, ReportAnalytics, User
-from app.schemas.report import GeneratedReport, ReportSection as ReportSectionSchema
+from sqlalchemy import JSON, Table, func, insert, literal, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import load_only
+import orjson
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.serialization import dumps
+from app.db.models import (
+    INDEXED_RAW_FIELDS, Report, Project, ProjectRollup, ReportSection, ReportAnalytics, User,
+    normalized_project_name, project_name_key, raw_data_field,
+)
+from app.db.partitions import add_months, month_start
+from app.db.rollups import add_reports_to_rollup, report_rollup_values
+from app.schemas.report import GeneratedReport, ReportSection as ReportSectionSchema, trusted_report
 from app.services.report_generator import ReportGeneratorService
+import base64
+import binascii
 import uuid
-from datetime import datetime
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 import json
 
+logger = get_logger(__name__)
+
+# Columnas escritas por la persistencia masiva; las omitidas (created_at, report_created_at) toman su valor por
+# defecto en el servidor: now() de la transacción, igual para el informe y sus filas hijas
+BULK_COLUMNS = {
+    Report.__table__: (
+        'id', 'project_id', 'created_by', 'presupuesto_aprobado', 'valor_ejecutado', 'fecha_fin_planificada',
+        'porcentaje_avance_fisico', 'contract_type', 'year', 'context', 'sections_data', 'raw_data',
+        'original_filename', 'file_type',
+    ),
+    ReportSection.__table__: ('id', 'report_id', 'title', 'block_name', 'message', 'severity', 'data'),
+    ReportAnalytics.__table__: (
+        'id', 'report_id', 'budget_efficiency', 'time_performance', 'risk_score', 'trend_analysis',
+    ),
+}
+
+# Columnas disponibles en los listados; las JSONB pesadas solo si se piden
+LISTING_FIELDS = {column.name: column for column in Report.__table__.columns}
+DEFAULT_LISTING_FIELDS = tuple(name for name in LISTING_FIELDS if name not in ('sections_data', 'raw_data'))
+# Los listados de entidades Report cargan solo esas columnas; acceder a las JSONB lanza un error
+LIGHT_REPORT = load_only(*(getattr(Report, name) for name in DEFAULT_LISTING_FIELDS), raiseload=True)
+
+
+def encode_cursor(created_at: datetime, report_id: uuid.UUID) -> str:
+    """Cursor opaco de paginación con la posición (created_at, id) del último informe de la página"""
+    raw = orjson.dumps([created_at.isoformat(), str(report_id)])
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Posición (created_at, id) de un cursor de encode_cursor; ValueError si no es válido"""
+    try:
+        created_at, report_id = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), uuid.UUID(report_id)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError("Cursor de paginación no válido") from e
+
+
+class ProjectIdCache:
+    """
+    Caché en memoria (por proceso) de nombre de proyecto -> ID, acotada con política LRU.
+    La clave es el nombre normalizado (project_name_key), así que las variantes de un
+    nombre que la BD trata como el mismo proyecto comparten entrada; solo guarda
+    proyectos ya confirmados en la BD.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.PROJECT_ID_CACHE_SIZE
+        self._ids: "OrderedDict[str, uuid.UUID]" = OrderedDict()
+
+    def get(self, name: str) -> Optional[uuid.UUID]:
+        key = project_name_key(name)
+        project_id = self._ids.get(key)
+        if project_id is not None:
+            self._ids.move_to_end(key)
+        return project_id
+
+    def put(self, name: str, project_id: uuid.UUID):
+        key = project_name_key(name)
+        self._ids[key] = project_id
+        self._ids.move_to_end(key)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def clear(self):
+        self._ids.clear()
+
+
+project_ids = ProjectIdCache()
+
+
 class EnhancedReportService:
     """
     Servicio mejorado que combina la lógica existente con persistencia en BD
+
+    Las consultas de listado y búsqueda usan `read_db` (p.ej. una sesión de
+    get_db_read, servida por una réplica); sin ella, `db`. Las escrituras y las
+    lecturas de un informe por ID (que siguen a su creación) usan siempre `db`.
     """
     
-    def __init__(self, db: AsyncSession):
+    # Drivers con COPY binario para la persistencia masiva; el resto usa executemany
+    COPY_DRIVERS = frozenset({"asyncpg"})
+    
+    def __init__(self, db: AsyncSession, read_db: Optional[AsyncSession] = None):
         self.db = db
+        self.read_db = read_db or db
+        # Proyectos resueltos en la transacción en curso (por nombre normalizado); pasan a
+        # project_ids tras el commit
+        self._resolved_projects: Dict[str, uuid.UUID] = {}
     
     async def generate_and_save_report(
         self,
@@ -30,106 +127,482 @@ class EnhancedReportService:
         project_name: Optional[str] = None
     ) -> GeneratedReport:
         """
-        Generar un informe usando la lógica existente y guardarlo en BD
+        Generar un informe usando la lógica existente y guardarlo en BD.
+        
+        El proyecto (si es nuevo), el informe, sus secciones, sus analytics y el
+        rollup del proyecto se escriben en una sola transacción. Los IDs se generan en el cliente, de modo
+        que no hace falta refrescar el informe para enlazar las secciones; las
+        secciones se insertan en un único INSERT de varias filas.
         """
         
         # 1. Usar el servicio existente para generar el informe
         generator = ReportGeneratorService(data=contract_data)
         sections = generator.generate_full_report()
         
-        # 2. Crear o encontrar el proyecto
-        project = None
-        if project_name:
-            project = await self._get_or_create_project(
-                name=project_name,
-                supervisor_name=supervisor_name
+        try:
+            # 2. Crear o encontrar el proyecto (sin confirmar todavía)
+            if project_name:
+                project_id = await self._get_or_create_project(
+                    name=project_name,
+                    supervisor_name=supervisor_name
+                )
+            
+            # 3. Crear el registro del informe con ID generado en el cliente
+            sections_data = [section.model_dump() for section in sections]
+            report_data = Report(
+                id=uuid.uuid4(),
+                project_id=project_id,
+                created_by=user_id,
+                presupuesto_aprobado=contract_data.get('presupuesto_aprobado'),
+                valor_ejecutado=contract_data.get('valor_ejecutado'),
+                fecha_fin_planificada=self._parse_date(contract_data.get('fecha_fin_planificada')),
+                porcentaje_avance_fisico=contract_data.get('porcentaje_avance_fisico'),
+                # Convertir las secciones a un formato de diccionario para la BD
+                sections_data=sections_data,
+                raw_data=contract_data,
+                original_filename=original_filename,
+                file_type=file_type
             )
-            project_id = project.id
+            self.db.add(report_data)
+            # El flush envía el informe (y aplica sus valores por defecto) dentro
+            # de la transacción, antes de las secciones que lo referencian
+            await self.db.flush()
+            metadata = {
+                'contract_type': report_data.contract_type,
+                'year': report_data.year,
+                'context': report_data.context,
+            }
+            
+            # 4. Secciones individuales para análisis: un INSERT de varias filas
+            if sections_data:
+                await self.db.execute(insert(ReportSection), [
+                    {
+                        'id': uuid.uuid4(),
+                        'report_id': report_data.id,
+                        'title': section['title'],
+                        'block_name': section['message']['block_name'],
+                        'message': section['message']['message'],
+                        'severity': section['message']['severity'],
+                        'data': section['data'],
+                    }
+                    for section in sections_data
+                ])
+            
+            # 5. Calcular y guardar analytics
+            analytics = await self._calculate_analytics(report_data, contract_data)
+            self.db.add(analytics)
+            
+            # 6. Sumar el informe al rollup del proyecto
+            if project_id:
+                await add_reports_to_rollup(self.db, project_id, [report_rollup_values(
+                    report_data.id,
+                    (section['message']['severity'] for section in sections_data),
+                    analytics.budget_efficiency,
+                    analytics.risk_score,
+                )])
+            
+            await self.db.commit()
+            self._cache_resolved_projects()
+        except Exception:
+            await self.db.rollback()
+            self._resolved_projects.clear()
+            raise
         
-        # 3. Crear el registro del informe en BD
-        report_data = Report(
-            id=uuid.uuid4(),
-            project_id=project_id,
-            created_by=user_id,
-            presupuesto_aprobado=contract_data.get('presupuesto_aprobado'),
-            valor_ejecutado=contract_data.get('valor_ejecutado'),
-            fecha_fin_planificada=self._parse_date(contract_data.get('fecha_fin_planificada')),
-            porcentaje_avance_fisico=contract_data.get('porcentaje_avance_fisico'),
-            # Convertir las secciones a un formato de diccionario para la BD
-            sections_data=[section.model_dump() for section in sections],
-            raw_data=contract_data,
-            original_filename=original_filename,
-            file_type=file_type
-        )
+        # 7. Retornar el informe en el formato esperado
+        return trusted_report(sections, **metadata)
+    
+    async def save_reports_bulk(
+        self,
+        contracts: Iterable[Dict[str, Any]],
+        user_id: Optional[uuid.UUID] = None,
+        project_id: Optional[uuid.UUID] = None,
+        original_filename: Optional[str] = None,
+        file_type: Optional[str] = None,
+        supervisor_name: Optional[str] = None,
+        project_name: Optional[str] = None,
+        chunk_size: int = settings.BULK_PERSIST_CHUNK_SIZE
+    ) -> List[uuid.UUID]:
+        """
+        Generar y guardar los informes de un portafolio completo en una transacción.
         
-        self.db.add(report_data)
-        await self.db.commit()
-        await self.db.refresh(report_data)
+        Los contratos se procesan por bloques de `chunk_size`: para cada bloque se
+        generan los informes y se escriben informes, secciones y analytics, y se
+        suman al rollup del proyecto con un único upsert. Con asyncpg (COPY_DRIVERS)
+        las filas se escriben con COPY binario; con otros drivers de PostgreSQL (p.ej.
+        psycopg), con INSERT por lotes (executemany). Retorna los IDs de los informes
+        en el orden de entrada.
+        """
+        report_ids: List[uuid.UUID] = []
+        rows = 0
+        start = time.perf_counter()
+        try:
+            if project_name:
+                project_id = await self._get_or_create_project(name=project_name, supervisor_name=supervisor_name)
+            connection = await self.db.connection()
+            use_copy = connection.dialect.driver in self.COPY_DRIVERS
+            if use_copy:
+                # El COPY va directo a asyncpg, sin pasar por el BEGIN diferido de SQLAlchemy:
+                # una sentencia por la sesión abre la transacción antes del primer bloque
+                await self.db.execute(text('SELECT 1'))
+            
+            chunk: List[Dict[str, Any]] = []
+            for contract_data in contracts:
+                chunk.append(contract_data)
+                if len(chunk) >= chunk_size:
+                    rows += await self._write_bulk_chunk(chunk, report_ids, use_copy, user_id, project_id,
+                                                         original_filename, file_type)
+                    chunk = []
+            if chunk:
+                rows += await self._write_bulk_chunk(chunk, report_ids, use_copy, user_id, project_id,
+                                                     original_filename, file_type)
+            
+            await self.db.commit()
+            self._cache_resolved_projects()
+        except Exception:
+            await self.db.rollback()
+            self._resolved_projects.clear()
+            raise
         
-        # 4. Guardar secciones individuales para análisis
-        for section in sections:
-            section_data = ReportSection(
-                report_id=report_data.id,
-                title=section.title,
-                block_name=section.message.block_name,
-                message=section.message.message,
-                severity=section.message.severity,
-                data=section.data
+        elapsed = time.perf_counter() - start
+        logger.info(f"Persistencia masiva: {len(report_ids)} informes, {rows} filas en {elapsed:.2f}s "
+                    f"({rows / elapsed if elapsed else 0:.0f} filas/s, {'COPY' if use_copy else 'executemany'})")
+        return report_ids
+    
+    async def _write_bulk_chunk(
+        self,
+        contracts: List[Dict[str, Any]],
+        report_ids: List[uuid.UUID],
+        use_copy: bool,
+        user_id: Optional[uuid.UUID],
+        project_id: Optional[uuid.UUID],
+        original_filename: Optional[str],
+        file_type: Optional[str]
+    ) -> int:
+        """Generar los informes de un bloque y escribir sus filas; retorna las filas escritas"""
+        reports, sections, analytics, rollup = [], [], [], []
+        for contract_data in contracts:
+            report_id = uuid.uuid4()
+            report_ids.append(report_id)
+            generated = ReportGeneratorService(data=contract_data).generate_full_report()
+            sections_data = [section.model_dump() for section in generated]
+            reports.append({
+                'id': report_id,
+                'project_id': project_id,
+                'created_by': user_id,
+                'presupuesto_aprobado': self._to_float(contract_data.get('presupuesto_aprobado')),
+                'valor_ejecutado': self._to_float(contract_data.get('valor_ejecutado')),
+                'fecha_fin_planificada': self._naive_utc(self._parse_date(contract_data.get('fecha_fin_planificada'))),
+                'porcentaje_avance_fisico': self._to_float(contract_data.get('porcentaje_avance_fisico')),
+                'sections_data': sections_data,
+                'raw_data': contract_data,
+                'original_filename': original_filename,
+                'file_type': file_type,
+            })
+            sections.extend(
+                {
+                    'id': uuid.uuid4(),
+                    'report_id': report_id,
+                    'title': section['title'],
+                    'block_name': section['message']['block_name'],
+                    'message': section['message']['message'],
+                    'severity': section['message']['severity'],
+                    'data': section['data'],
+                }
+                for section in sections_data
             )
-            self.db.add(section_data)
+            analytics.append({'id': uuid.uuid4(), 'report_id': report_id, **self._analytics_values(contract_data)})
+            rollup.append(report_rollup_values(
+                report_id,
+                (section['message']['severity'] for section in sections_data),
+                analytics[-1]['budget_efficiency'],
+                analytics[-1]['risk_score'],
+            ))
         
-        # 5. Calcular y guardar analytics
-        analytics = await self._calculate_analytics(report_data, contract_data)
-        self.db.add(analytics)
-        
-        await self.db.commit()
-        
-        # 6. Retornar el informe en el formato esperado
-        return GeneratedReport(
-            contract_type=report_data.contract_type,
-            year=report_data.year,
-            context=report_data.context,
-            sections=sections
-        )
+        # Informes primero: las secciones y analytics los referencian
+        for table, values in ((Report.__table__, reports), (ReportSection.__table__, sections),
+                              (ReportAnalytics.__table__, analytics)):
+            if use_copy:
+                await self._copy_rows(table, values)
+            else:
+                await self.db.execute(insert(table), [self._json_safe(table, row) for row in values])
+        if project_id:
+            await add_reports_to_rollup(self.db, project_id, rollup)
+        return len(reports) + len(sections) + len(analytics)
+    
+    async def _copy_rows(self, table: Table, values: List[Dict[str, Any]]) -> None:
+        """COPY binario de asyncpg sobre la conexión de la transacción en curso"""
+        columns = BULK_COLUMNS[table]
+        # asyncpg recibe json/jsonb como texto
+        json_columns = self._json_columns(table)
+        records = []
+        for row in values:
+            row = self._with_defaults(table, row)
+            records.append(tuple(
+                dumps(row[name]).decode() if name in json_columns and row[name] is not None else row[name]
+                for name in columns
+            ))
+        connection = await self.db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=list(columns))
+    
+    @staticmethod
+    def _json_columns(table: Table) -> set:
+        return {name for name in BULK_COLUMNS[table] if isinstance(table.columns[name].type, JSON)}
+    
+    def _json_safe(self, table: Table, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fila para executemany: las columnas JSON pasan por orjson, ya que los registros
+        de DataFrames y los datos de las secciones traen escalares NumPy y Timestamps
+        que el serializador JSON por defecto de SQLAlchemy no admite
+        """
+        row = self._with_defaults(table, row)
+        for name in self._json_columns(table):
+            if row[name] is not None:
+                row[name] = orjson.loads(dumps(row[name]))
+        return row
+    
+    @staticmethod
+    def _with_defaults(table: Table, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Completar la fila con los valores por defecto del lado del cliente (p.ej.
+        Report.contract_type), que COPY y el INSERT de Core no aplican por sí solos
+        en columnas que se envían explícitamente
+        """
+        completed = dict(row)
+        for name in BULK_COLUMNS[table]:
+            if name not in completed:
+                default = table.columns[name].default
+                completed[name] = default.arg if default is not None and default.is_scalar else None
+        return completed
     
-    async def get_report_by_id(self, report_id: uuid.UUID) -> Optional[Report]:
-        """Obtener un informe por ID"""
-        stmt = select(Report).where(Report.id == report_id)
+    @staticmethod
+    def _partition_conditions(column, created_at: Optional[datetime]) -> list:
+        """
+        Condiciones sobre la clave de partición para una búsqueda por id: con la fecha
+        de creación del informe (la de los listados) se consulta solo la partición de
+        su mes; sin ella, se consulta el índice de cada partición mensual
+        """
+        if created_at is None:
+            return []
+        month = month_start(created_at)
+        return [column >= month, column < add_months(month, 1)]
+    
+    async def get_report_by_id(self, report_id: uuid.UUID,
+                               created_at: Optional[datetime] = None) -> Optional[Report]:
+        """Obtener un informe por ID (con `created_at`, ver _partition_conditions)"""
+        stmt = select(Report).where(Report.id == report_id,
+                                    *self._partition_conditions(Report.created_at, created_at))
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
     
-    async def get_reports_by_user(self, user_id: uuid.UUID, limit: int = 10) -> List[Report]:
-        """Obtener informes de un usuario"""
-        stmt = select(Report).where(Report.created_by == user_id).limit(limit)
+    async def get_report_version(self, report_id: uuid.UUID,
+                                 created_at: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Marca de versión de un informe (última modificación o creación) sin cargar
+        sus secciones; None si no existe
+        """
+        stmt = select(Report.created_at, Report.updated_at).where(
+            Report.id == report_id, *self._partition_conditions(Report.created_at, created_at))
         result = await self.db.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return row.updated_at or row.created_at
+    
+    async def get_reports_by_user(self, user_id: uuid.UUID, limit: int = 10) -> List[Report]:
+        """
+        Obtener los informes más recientes de un usuario, sin sections_data ni raw_data
+        (para listados paginados, list_reports; el informe completo, get_report_by_id)
+        """
+        stmt = (
+            select(Report)
+            .options(LIGHT_REPORT)
+            .where(Report.created_by == user_id)
+            .order_by(Report.created_at.desc(), Report.id.desc())
+            .limit(limit)
+        )
+        result = await self.read_db.execute(stmt)
         return result.scalars().all()
     
     async def get_project_reports(self, project_id: uuid.UUID) -> List[Report]:
-        """Obtener todos los informes de un proyecto"""
-        stmt = select(Report).where(Report.project_id == project_id)
-        result = await self.db.execute(stmt)
+        """
+        Obtener todos los informes de un proyecto, sin sections_data ni raw_data
+        (para listados paginados, list_reports; el informe completo, get_report_by_id)
+        """
+        stmt = (
+            select(Report)
+            .options(LIGHT_REPORT)
+            .where(Report.project_id == project_id)
+            .order_by(Report.created_at.desc(), Report.id.desc())
+        )
+        result = await self.read_db.execute(stmt)
         return result.scalars().all()
     
-    async def _get_or_create_project(self, name: str, supervisor_name: Optional[str] = None) -> Project:
-        """Crear o encontrar un proyecto existente"""
-        stmt = select(Project).where(Project.name == name)
-        result = await self.db.execute(stmt)
-        project = result.scalar_one_or_none()
+    async def get_project_rollup(self, project_id: uuid.UUID) -> Optional[ProjectRollup]:
+        """Totales del proyecto mantenidos en project_rollups (una lectura por clave primaria)"""
+        return await self.read_db.get(ProjectRollup, project_id)
+    
+    async def get_section_severity_counts(self, report_id: uuid.UUID,
+                                          created_at: Optional[datetime] = None) -> Dict[str, int]:
+        """Conteo de secciones por severidad de un informe (con `created_at`, de una sola partición)"""
+        stmt = (
+            select(ReportSection.severity, func.count())
+            .where(ReportSection.report_id == report_id,
+                   *self._partition_conditions(ReportSection.report_created_at, created_at))
+            .group_by(ReportSection.severity)
+        )
+        result = await self.read_db.execute(stmt)
+        return {severity: count for severity, count in result.all()}
+
+    async def find_reports(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        severity: Optional[str] = None,
+        project_id: Optional[uuid.UUID] = None,
+        limit: int = 50,
+        since: Optional[datetime] = None,
+    ) -> List[Report]:
+        """
+        Buscar informes por campos de los datos subidos y severidad de sus secciones,
+        filtrando en SQL (más recientes primero).
+
+        - Campos de INDEXED_RAW_FIELDS (ubicacion, tipo_contrato): igualdad de texto
+          sobre su índice de expresión
+        - Otros campos: contención `raw_data @> {campo: valor}` (índice GIN); el valor
+          debe tener el tipo JSON con el que se subió (número, texto...)
+        - severity: informes con al menos una sección de esa severidad (índice GIN de sections_data)
+        - since: solo informes creados desde esa fecha; las particiones mensuales
+          anteriores no se consultan (p.ej. `months_ago(n)` para los últimos n meses)
+        """
+        stmt = select(Report).where(*self._document_conditions(filters, severity, since))
+        if project_id:
+            stmt = stmt.where(Report.project_id == project_id)
+        stmt = stmt.order_by(Report.created_at.desc(), Report.id.desc()).limit(limit)
+        result = await self.read_db.execute(stmt)
+        return result.scalars().all()
+
+    async def list_reports(
+        self,
+        user_id: Optional[uuid.UUID] = None,
+        project_id: Optional[uuid.UUID] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        severity: Optional[str] = None,
+        fields: Optional[Iterable[str]] = None,
+        cursor: Optional[str] = None,
+        limit: int = settings.REPORT_PAGE_SIZE,
+        since: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Página de informes (más recientes primero) con paginación por cursor sobre
+        (created_at, id) y solo las columnas pedidas.
+
+        - **cursor**: el `next_cursor` de la página anterior. La página siguiente se
+          busca con `(created_at, id) < cursor` sobre los índices (usuario|proyecto,
+          created_at, id), así el costo no depende de la profundidad de la página
+        - **fields**: columnas de LISTING_FIELDS; por defecto las livianas (sin
+          sections_data ni raw_data). `id` y `created_at` siempre se incluyen
+        - **since**: solo informes creados desde esa fecha (ver find_reports)
+
+        Retorna las filas como diccionarios y el cursor de la página siguiente
+        (None en la última). ValueError si el cursor o algún campo no son válidos.
+        """
+        names = list(fields) if fields else list(DEFAULT_LISTING_FIELDS)
+        unknown = [name for name in names if name not in LISTING_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos no disponibles: {', '.join(unknown)}")
+        names = ['id', 'created_at'] + [name for name in names if name not in ('id', 'created_at')]
+
+        stmt = select(*(LISTING_FIELDS[name] for name in names)).where(
+            *self._document_conditions(filters, severity, since)
+        )
+        if user_id:
+            stmt = stmt.where(Report.created_by == user_id)
+        if project_id:
+            stmt = stmt.where(Report.project_id == project_id)
+        if cursor:
+            created_at, report_id = decode_cursor(cursor)
+            stmt = stmt.where(tuple_(Report.created_at, Report.id) < tuple_(created_at, report_id))
+            # Redundante con la comparación de filas, pero el planificador solo
+            # descarta particiones (las posteriores al cursor) con una cota simple
+            stmt = stmt.where(Report.created_at <= created_at)
+        # Una fila extra indica si hay página siguiente sin un COUNT
+        stmt = stmt.order_by(Report.created_at.desc(), Report.id.desc()).limit(limit + 1)
+        result = await self.read_db.execute(stmt)
+        rows = [dict(row) for row in result.mappings()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    @staticmethod
+    def _document_conditions(
+        filters: Optional[Dict[str, Any]],
+        severity: Optional[str],
+        since: Optional[datetime] = None,
+    ) -> list:
+        """Condiciones SQL sobre raw_data, sections_data y la fecha de creación (ver find_reports)"""
+        conditions = [Report.created_at >= since] if since else []
+        contained = {}
+        for field, value in (filters or {}).items():
+            if field in INDEXED_RAW_FIELDS:
+                conditions.append(raw_data_field(field) == str(value))
+            else:
+                contained[field] = value
+        if contained:
+            conditions.append(Report.raw_data.contains(contained))
+        if severity:
+            conditions.append(Report.sections_data.contains([{"message": {"severity": severity}}]))
+        return conditions
+
+    async def _get_or_create_project(self, name: str, supervisor_name: Optional[str] = None) -> uuid.UUID:
+        """
+        ID del proyecto `name`, creándolo si no existe.
+        
+        Los nombres se comparan normalizados (normalized_project_name). El alta es
+        un upsert sobre el índice único ix_projects_name_key, así que dos
+        peticiones concurrentes no pueden duplicar el proyecto: la segunda espera
+        a la primera y, si ésta confirma, lee su ID. Los IDs ya confirmados se
+        sirven desde project_ids sin consultar la BD.
+        """
+        project_id = self._resolved_projects.get(project_name_key(name)) or project_ids.get(name)
+        if project_id:
+            return project_id
         
-        if not project:
-            project = Project(
+        # Se confirma junto con el informe que lo referencia
+        stmt = (
+            pg_insert(Project)
+            .values(
+                id=uuid.uuid4(),
                 name=name,
                 supervisor_name=supervisor_name,
                 description=f"Proyecto de infraestructura: {name}"
             )
-            self.db.add(project)
-            await self.db.commit()
-            await self.db.refresh(project)
+            .on_conflict_do_nothing(index_elements=[normalized_project_name(Project.name)])
+            .returning(Project.id)
+        )
+        project_id = await self.db.scalar(stmt)
+        if project_id is None:
+            project_id = await self.db.scalar(
+                select(Project.id).where(normalized_project_name(Project.name) == normalized_project_name(literal(name)))
+            )
         
-        return project
+        self._resolved_projects[project_name_key(name)] = project_id
+        return project_id
+    
+    def _cache_resolved_projects(self):
+        """Pasar a project_ids los proyectos de la transacción recién confirmada"""
+        for name, project_id in self._resolved_projects.items():
+            project_ids.put(name, project_id)
+        self._resolved_projects.clear()
     
     async def _calculate_analytics(self, report: Report, contract_data: Dict[str, Any]) -> ReportAnalytics:
         """Calcular métricas y analytics del informe"""
+        return ReportAnalytics(report_id=report.id, **self._analytics_values(contract_data))
+    
+    def _analytics_values(self, contract_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Valores de analytics de un contrato (compartidos por la persistencia individual y la masiva)"""
         presupuesto = contract_data.get('presupuesto_aprobado', 0)
         ejecutado = contract_data.get('valor_ejecutado', 0)
         avance_fisico = contract_data.get('porcentaje_avance_fisico', 0)
@@ -149,23 +622,36 @@ class EnhancedReportService:
         if budget_efficiency < 0.5:  # Ejecución muy baja
             risk_score += 0.3
         
-        return ReportAnalytics(
-            report_id=report.id,
-            budget_efficiency=budget_efficiency,
-            time_performance=time_performance,
-            risk_score=min(risk_score, 1.0),
-            trend_analysis={
+        return {
+            'budget_efficiency': float(budget_efficiency),
+            'time_performance': float(time_performance),
+            'risk_score': min(risk_score, 1.0),
+            'trend_analysis': {
                 "budget_trend": "over_budget" if budget_efficiency > 1.0 else "under_budget",
                 "timeline_trend": "delayed" if time_performance < 0.8 else "on_time",
                 "overall_health": "critical" if risk_score > 0.7 else "warning" if risk_score > 0.3 else "good"
             }
-        )
+        }
     
     def _parse_date(self, date_str: Optional[str]) -> Optional[datetime]:
-        """Parsear fecha desde string"""
+        """Parsear fecha desde string (o tomarla tal cual si ya es datetime, p.ej. pd.Timestamp)"""
         if not date_str:
             return None
+        if isinstance(date_str, datetime):
+            return date_str
         try:
             return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
         except (ValueError, AttributeError):
             return None
+    
+    @staticmethod
+    def _to_float(value: Any) -> Optional[float]:
+        """Número a float de Python (los escalares NumPy enteros no son float para asyncpg)"""
+        return float(value) if value is not None else None
+    
+    @staticmethod
+    def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+        """fecha_fin_planificada es timestamp sin zona: normalizar a UTC sin tzinfo"""
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -3,297 +3,442 @@ Servicio Inteligente de Generación de Informes con IA
 Integra el motor de IA con la lógica de generación de informes existente
 """
 
-from typing import Dict, Any, List, Optional
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple, Union
+import numpy as np
 from app.services.report_generator import ReportGeneratorService
-from app.services.ai_intelligence_engine import ContractIntelligenceEngine, AIAnalysisResult, SeverityLevel
-from app.schemas.report import TechnicalMessage, ReportSection, GeneratedReport
+from app.services.ai_intelligence_engine import AIAnalysisResult, SeverityLevel, get_intelligence_engine
+from app.services.report_templates import (
+    MessageTemplate,
+    conditional_lines,
+    format_currency,
+    format_number,
+    format_percent,
+    numbered_lines,
+)
+from app.schemas.report import ReportSection, GeneratedReport, trusted_message, trusted_report, trusted_section
 import logging
 import json
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Plantillas compiladas una sola vez al importar el módulo
+AI_ENHANCEMENT_HEADER = "\n\n🤖 ANÁLISIS INTELIGENTE:\n"
+AI_ENHANCEMENT_CONFIDENCE = MessageTemplate("\n📊 Confianza del análisis: {confidence}%")
+NUMBERED_ITEM = MessageTemplate("{index}. {item}\n")
+NUMBERED_PARAGRAPH = MessageTemplate("{index}. {item}\n\n")
+
+PREDICTIVE_MESSAGE = MessageTemplate(
+    "🔮 ANÁLISIS PREDICTIVO AVANZADO\n\n"
+    "El sistema de IA ha analizado patrones históricos y métricas actuales para predecir el comportamiento futuro del proyecto.\n\n"
+    "{alerts}"
+)
+ANOMALIES_MESSAGE = MessageTemplate(
+    "🚨 DETECCIÓN DE ANOMALÍAS\n\n"
+    "El sistema de IA ha identificado {count} anomalías significativas:\n\n"
+    "{items}"
+)
+ANOMALY_ITEM = MessageTemplate("• {description}\n")
+ANOMALY_VALUE = MessageTemplate("  Valor actual: {value} (Umbral: {threshold})\n")
+INSIGHTS_MESSAGE = MessageTemplate(
+    "🧠 INSIGHTS AVANZADOS DE IA\n\n"
+    "Análisis profundo basado en múltiples algoritmos de machine learning:\n\n"
+    "{alerts}"
+)
+RECOMMENDATIONS_MESSAGE = MessageTemplate(
+    "💡 RECOMENDACIONES INTELIGENTES\n\n"
+    "El sistema de IA ha generado {count} recomendaciones específicas:\n\n"
+    "{items}"
+    "📊 Score de Riesgo: {risk_score}\n"
+    "🎯 Confianza del Análisis: {confidence}"
+)
+
+
+def _column(values: List[Dict[str, Any]], key: str, default: Any = 0) -> np.ndarray:
+    """Extraer un valor numérico de cada diccionario del lote"""
+    return np.array([value.get(key, default) for value in values], dtype=np.float64)
+
+
 class IntelligentReportService:
     """
     Servicio que combina la lógica de generación de informes con análisis de IA
     """
     
     def __init__(self):
-        self.ai_engine = ContractIntelligenceEngine()
+        self.ai_engine = get_intelligence_engine()
         self.report_generator = None
         logger.info("🚀 Servicio Inteligente de Informes inicializado")
     
-    async def generate_intelligent_report(self, contract_data: Dict[str, Any]) -> GeneratedReport:
+    async def generate_intelligent_report(self, contract_data: Dict[str, Any],
+                                          latency_budget: Optional[float] = None) -> GeneratedReport:
         """
         Genera un informe inteligente combinando análisis tradicional e IA
-        """
-        logger.info("🔍 Iniciando generación de informe inteligente")
-        
-        # 1. Análisis de IA
-        ai_analysis = await self.ai_engine.analyze_contract_data(contract_data)
-        
-        # 2. Generar informe base
-        self.report_generator = ReportGeneratorService(data=contract_data)
-        base_sections = self.report_generator.generate_full_report()
-        
-        # 3. Mejorar secciones con insights de IA
-        enhanced_sections = self._enhance_sections_with_ai(base_sections, ai_analysis)
-        
-        # 4. Agregar secciones de IA
-        ai_sections = self._create_ai_sections(ai_analysis)
         
-        # 5. Combinar todas las secciones
-        all_sections = enhanced_sections + ai_sections
+        `latency_budget` (segundos) se pasa al motor de IA para limitar la latencia del análisis.
+        """
+        reports = await self.generate_intelligent_reports([contract_data], latency_budget=latency_budget)
+        return reports[0]
+    
+    async def generate_intelligent_reports(self, contracts: List[Dict[str, Any]],
+                                           latency_budget: Optional[float] = None,
+                                           return_exceptions: bool = False) -> List[Union[GeneratedReport, Exception]]:
+        """
+        Genera los informes inteligentes de un lote de contratos.
+        Las secciones de IA se renderizan para todo el lote con plantillas compiladas
+        y formateo vectorizado de porcentajes y montos.
         
-        logger.info(f"✅ Informe inteligente generado con {len(all_sections)} secciones")
+        Con `return_exceptions=True` un contrato que falla no interrumpe el lote:
+        su posición en el resultado contiene la excepción en lugar del informe.
+        """
+        reports, _ = await self._generate_batch(contracts, latency_budget, return_exceptions)
+        return reports
+    
+    async def generate_intelligent_reports_with_analysis(
+        self, contracts: List[Dict[str, Any]], latency_budget: Optional[float] = None
+    ) -> List[Union[Tuple[GeneratedReport, AIAnalysisResult], Exception]]:
+        """
+        Igual que generate_intelligent_reports(return_exceptions=True), pero cada
+        posición contiene el par (informe, análisis de IA) usado para exportaciones.
+        """
+        reports, analyses = await self._generate_batch(contracts, latency_budget, True)
+        return [
+            report if isinstance(report, Exception) else (report, analysis)
+            for report, analysis in zip(reports, analyses)
+        ]
+    
+    async def _generate_batch(self, contracts: List[Dict[str, Any]], latency_budget: Optional[float],
+                              return_exceptions: bool) -> Tuple[List[Any], List[Any]]:
+        """Generar los informes del lote; devuelve (informes o excepciones, análisis de IA)"""
+        logger.info(f"🔍 Iniciando generación de {len(contracts)} informe(s) inteligente(s)")
         
-        return GeneratedReport(sections=all_sections)
+        # 1. Análisis de IA
+        outcomes: List[Any] = list(await asyncio.gather(*(
+            self.ai_engine.analyze_contract_data(contract_data, latency_budget=latency_budget)
+            for contract_data in contracts
+        ), return_exceptions=return_exceptions))
+        analyses = list(outcomes)
+        
+        # 2. Generar informes base
+        base_sections: Dict[int, List[ReportSection]] = {}
+        for i, contract_data in enumerate(contracts):
+            if isinstance(outcomes[i], Exception):
+                continue
+            try:
+                self.report_generator = ReportGeneratorService(data=contract_data)
+                base_sections[i] = self.report_generator.generate_full_report()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                outcomes[i] = e
+        
+        # 3-5. Mejorar secciones base, agregar secciones de IA y combinar
+        valid = [i for i in range(len(contracts)) if i in base_sections]
+        try:
+            reports = self._render_reports([base_sections[i] for i in valid], [outcomes[i] for i in valid])
+        except Exception:
+            if not return_exceptions:
+                raise
+            # Aislar el contrato que impide renderizar el lote
+            reports = []
+            for i in valid:
+                try:
+                    reports.extend(self._render_reports([base_sections[i]], [outcomes[i]]))
+                except Exception as e:
+                    reports.append(e)
+        for i, report in zip(valid, reports):
+            outcomes[i] = report
+        
+        logger.info(f"✅ {len(valid)} informe(s) inteligente(s) generado(s)")
+        
+        return outcomes, analyses
+    
+    def _render_reports(self, base_sections: List[List[ReportSection]],
+                        analyses: List[AIAnalysisResult]) -> List[GeneratedReport]:
+        """Combinar las secciones base mejoradas y las secciones de IA de cada contrato"""
+        enhanced_sections = self._enhance_sections_batch(base_sections, analyses)
+        ai_sections = self._create_ai_sections_batch(analyses)
+        return [
+            trusted_report(enhanced + ai)
+            for enhanced, ai in zip(enhanced_sections, ai_sections)
+        ]
     
     def _enhance_sections_with_ai(self, base_sections: List[ReportSection], 
                                 ai_analysis: AIAnalysisResult) -> List[ReportSection]:
         """Mejorar las secciones base con insights de IA"""
-        enhanced_sections = []
-        
-        for section in base_sections:
-            # Mejorar mensaje técnico con insights de IA
-            enhanced_message = self._enhance_technical_message(section.message, ai_analysis)
-            
-            # Mejorar datos con métricas de IA
-            enhanced_data = self._enhance_section_data(section.data, ai_analysis)
-            
-            enhanced_section = ReportSection(
-                title=section.title,
-                data=enhanced_data,
-                message=enhanced_message
+        return self._enhance_sections_batch([base_sections], [ai_analysis])[0]
+    
+    def _create_ai_sections(self, ai_analysis: AIAnalysisResult) -> List[ReportSection]:
+        """Crear secciones específicas de IA"""
+        return self._create_ai_sections_batch([ai_analysis])[0]
+    
+    def _batch_metrics(self, analyses: List[AIAnalysisResult]) -> Dict[str, Any]:
+        """Valores formateados del lote, calculados una vez por columna"""
+        predictions = [analysis.predictions for analysis in analyses]
+        insights = [analysis.insights for analysis in analyses]
+        performance = [insight.get('performance_metrics', {}) for insight in insights]
+        risk_indicators = [insight.get('risk_indicators', {}) for insight in insights]
+        predictive_insights = [insight.get('predictive_insights', {}) for insight in insights]
+        
+        raw = {
+            "risk_score": np.array([analysis.risk_score for analysis in analyses], dtype=np.float64),
+            "confidence": np.array([analysis.confidence for analysis in analyses], dtype=np.float64),
+            "probabilidad_sobrecosto": _column(predictions, 'probabilidad_sobrecosto'),
+            "probabilidad_retraso": _column(predictions, 'probabilidad_retraso'),
+            "probabilidad_cumplimiento": _column(predictions, 'probabilidad_cumplimiento'),
+            "eficiencia_global": _column(performance, 'eficiencia_global'),
+            "velocidad_ejecucion": _column(performance, 'velocidad_ejecucion'),
+            "sostenibilidad_temporal": _column(performance, 'sostenibilidad_temporal'),
+            "nivel_riesgo_financiero": _column(risk_indicators, 'nivel_riesgo_financiero'),
+            "nivel_riesgo_temporal": _column(risk_indicators, 'nivel_riesgo_temporal'),
+            "probabilidad_incumplimiento": _column(risk_indicators, 'probabilidad_incumplimiento'),
+            "costo_final_estimado": _column(predictive_insights, 'costo_final_estimado'),
+            "desviacion_estimada": _column(predictive_insights, 'desviacion_estimada'),
+        }
+        formatted = {
+            name: format_percent(raw[name])
+            for name in (
+                "risk_score", "confidence", "probabilidad_sobrecosto", "probabilidad_retraso",
+                "probabilidad_cumplimiento", "eficiencia_global", "nivel_riesgo_financiero",
+                "nivel_riesgo_temporal", "probabilidad_incumplimiento", "desviacion_estimada",
             )
-            
-            enhanced_sections.append(enhanced_section)
-        
-        return enhanced_sections
+        }
+        formatted["velocidad_ejecucion"] = format_number(raw["velocidad_ejecucion"])
+        formatted["sostenibilidad_temporal"] = format_number(raw["sostenibilidad_temporal"])
+        formatted["costo_final_estimado"] = format_currency(raw["costo_final_estimado"])
+        formatted["confidence_pct1"] = format_number(raw["confidence"] * 100, 1)
+        return {"raw": raw, "formatted": formatted, "predictions": predictions}
     
-    def _enhance_technical_message(self, original_message: TechnicalMessage, 
-                                 ai_analysis: AIAnalysisResult) -> TechnicalMessage:
-        """Mejorar mensaje técnico con insights de IA"""
-        
-        # Determinar severidad basada en análisis de IA
-        ai_severity = ai_analysis.severity.value
-        
-        # Mejorar mensaje con recomendaciones de IA
-        enhanced_message = original_message.message
-        
-        if ai_analysis.recommendations:
-            enhanced_message += "\n\n🤖 ANÁLISIS INTELIGENTE:\n"
-            for i, recommendation in enumerate(ai_analysis.recommendations[:3], 1):
-                enhanced_message += f"{i}. {recommendation}\n"
-        
-        # Agregar métricas de confianza
-        confidence = ai_analysis.confidence * 100
-        enhanced_message += f"\n📊 Confianza del análisis: {confidence:.1f}%"
-        
-        # Usar severidad de IA si es más crítica
-        final_severity = ai_severity if self._is_ai_severity_higher(ai_severity, original_message.severity) else original_message.severity
-        
-        return TechnicalMessage(
-            block_name=original_message.block_name,
-            message=enhanced_message,
-            severity=final_severity
+    def _enhance_sections_batch(self, base_sections: List[List[ReportSection]],
+                                analyses: List[AIAnalysisResult]) -> List[List[ReportSection]]:
+        """Mejorar las secciones base de cada contrato con insights de IA"""
+        metrics = self._batch_metrics(analyses)
+        formatted = metrics["formatted"]
+        
+        # El sufijo del mensaje técnico depende solo del análisis: se renderiza una vez por contrato
+        recommendations = numbered_lines(
+            [analysis.recommendations for analysis in analyses], NUMBERED_ITEM, limit=3
+        )
+        suffixes = np.array([
+            AI_ENHANCEMENT_HEADER + items if analysis.recommendations else ""
+            for analysis, items in zip(analyses, recommendations)
+        ], dtype=object) + AI_ENHANCEMENT_CONFIDENCE.render_batch(
+            len(analyses), confidence=formatted["confidence_pct1"]
         )
+        
+        enhanced_batch = []
+        for i, (sections, analysis) in enumerate(zip(base_sections, analyses)):
+            ai_severity = analysis.severity.value
+            ai_metrics = {
+                "Score de Riesgo IA": formatted["risk_score"][i],
+                "Confianza del Análisis": formatted["confidence"][i],
+                "Nivel de Severidad IA": ai_severity
+            }
+            enhanced_sections = []
+            for section in sections:
+                original_message = section.message
+                
+                # Usar severidad de IA si es más crítica
+                final_severity = ai_severity if self._is_ai_severity_higher(ai_severity, original_message.severity) else original_message.severity
+                enhanced_message = trusted_message(
+                    block_name=original_message.block_name,
+                    message=original_message.message + suffixes[i],
+                    severity=final_severity
+                )
+                
+                enhanced_sections.append(trusted_section(
+                    title=section.title,
+                    data=self._enhance_section_data(section.data, analysis, ai_metrics, formatted, i),
+                    message=enhanced_message
+                ))
+            enhanced_batch.append(enhanced_sections)
+        
+        return enhanced_batch
     
-    def _enhance_section_data(self, original_data: Dict[str, Any], 
-                            ai_analysis: AIAnalysisResult) -> Dict[str, Any]:
+    def _enhance_section_data(self, original_data: Dict[str, Any], ai_analysis: AIAnalysisResult,
+                              ai_metrics: Dict[str, str], formatted: Dict[str, np.ndarray],
+                              index: int) -> Dict[str, Any]:
         """Mejorar datos de sección con métricas de IA"""
         enhanced_data = original_data.copy()
         
         # Agregar métricas de IA
-        enhanced_data.update({
-            "Score de Riesgo IA": f"{ai_analysis.risk_score:.2%}",
-            "Confianza del Análisis": f"{ai_analysis.confidence:.2%}",
-            "Nivel de Severidad IA": ai_analysis.severity.value
-        })
+        enhanced_data.update(ai_metrics)
         
         # Agregar insights específicos según el tipo de sección
-        if "Presupuesto" in enhanced_data.get("Presupuesto Aprobado", ""):
+        if "Presupuesto" in str(enhanced_data.get("Presupuesto Aprobado", "")):
             enhanced_data.update({
-                "Probabilidad Sobrecosto": f"{ai_analysis.predictions.get('probabilidad_sobrecosto', 0):.2%}",
-                "Riesgo Financiero": f"{ai_analysis.insights.get('risk_indicators', {}).get('nivel_riesgo_financiero', 0):.2%}"
+                "Probabilidad Sobrecosto": formatted["probabilidad_sobrecosto"][index],
+                "Riesgo Financiero": formatted["nivel_riesgo_financiero"][index]
             })
         
-        if "Cronograma" in enhanced_data.get("Fecha de Finalización Planificada", ""):
+        if "Cronograma" in str(enhanced_data.get("Fecha de Finalización Planificada", "")):
             enhanced_data.update({
-                "Probabilidad Retraso": f"{ai_analysis.predictions.get('probabilidad_retraso', 0):.2%}",
-                "Riesgo Temporal": f"{ai_analysis.insights.get('risk_indicators', {}).get('nivel_riesgo_temporal', 0):.2%}",
+                "Probabilidad Retraso": formatted["probabilidad_retraso"][index],
+                "Riesgo Temporal": formatted["nivel_riesgo_temporal"][index],
                 "Fecha Probable Finalización": ai_analysis.predictions.get('prediccion_finalizacion', 'N/A')
             })
         
         return enhanced_data
     
-    def _create_ai_sections(self, ai_analysis: AIAnalysisResult) -> List[ReportSection]:
-        """Crear secciones específicas de IA"""
-        ai_sections = []
-        
-        # 1. Sección de Análisis Predictivo
-        predictive_section = self._create_predictive_section(ai_analysis)
-        ai_sections.append(predictive_section)
-        
-        # 2. Sección de Detección de Anomalías
-        if ai_analysis.anomalies:
-            anomalies_section = self._create_anomalies_section(ai_analysis)
-            ai_sections.append(anomalies_section)
+    def _create_ai_sections_batch(self, analyses: List[AIAnalysisResult]) -> List[List[ReportSection]]:
+        """Crear las secciones específicas de IA de cada contrato"""
+        metrics = self._batch_metrics(analyses)
         
-        # 3. Sección de Insights Avanzados
-        insights_section = self._create_insights_section(ai_analysis)
-        ai_sections.append(insights_section)
+        # Secciones de análisis predictivo, insights y recomendaciones para todo el lote
+        predictive = self._create_predictive_sections(analyses, metrics)
+        insights = self._create_insights_sections(analyses, metrics)
+        recommendations = self._create_recommendations_sections(analyses, metrics)
         
-        # 4. Sección de Recomendaciones Inteligentes
-        recommendations_section = self._create_recommendations_section(ai_analysis)
-        ai_sections.append(recommendations_section)
+        ai_sections = []
+        for i, analysis in enumerate(analyses):
+            sections = [predictive[i]]
+            # La sección de anomalías depende de la cantidad de anomalías de cada contrato
+            if analysis.anomalies:
+                sections.append(self._create_anomalies_section(analysis))
+            sections.extend([insights[i], recommendations[i]])
+            ai_sections.append(sections)
         
         return ai_sections
     
-    def _create_predictive_section(self, ai_analysis: AIAnalysisResult) -> ReportSection:
-        """Crear sección de análisis predictivo"""
-        
-        predictions_data = {
-            "Probabilidad de Sobrecosto": f"{ai_analysis.predictions.get('probabilidad_sobrecosto', 0):.2%}",
-            "Probabilidad de Retraso": f"{ai_analysis.predictions.get('probabilidad_retraso', 0):.2%}",
-            "Probabilidad de Cumplimiento": f"{ai_analysis.predictions.get('probabilidad_cumplimiento', 0):.2%}",
-            "Fecha Probable de Finalización": ai_analysis.predictions.get('prediccion_finalizacion', 'N/A'),
-            "Tendencia de Ejecución": ai_analysis.predictions.get('tendencia_ejecucion', 'N/A'),
-            "Tendencia de Avance": ai_analysis.predictions.get('tendencia_avance', 'N/A')
-        }
-        
-        message_text = f"🔮 ANÁLISIS PREDICTIVO AVANZADO\n\n"
-        message_text += f"El sistema de IA ha analizado patrones históricos y métricas actuales para predecir el comportamiento futuro del proyecto.\n\n"
-        
-        if ai_analysis.predictions.get('probabilidad_sobrecosto', 0) > 0.7:
-            message_text += "⚠️ ALTA PROBABILIDAD DE SOBRECOSTO detectada por IA.\n"
-        
-        if ai_analysis.predictions.get('probabilidad_retraso', 0) > 0.6:
-            message_text += "⏰ RIESGO SIGNIFICATIVO DE RETRASO identificado.\n"
-        
-        if ai_analysis.predictions.get('probabilidad_cumplimiento', 0) < 0.5:
-            message_text += "🚨 BAJA PROBABILIDAD DE CUMPLIMIENTO del cronograma.\n"
-        
-        message = TechnicalMessage(
-            block_name="Análisis Predictivo IA",
-            message=message_text,
-            severity=self._get_predictive_severity(ai_analysis.predictions)
+    def _create_predictive_sections(self, analyses: List[AIAnalysisResult],
+                                    metrics: Dict[str, Any]) -> List[ReportSection]:
+        """Crear secciones de análisis predictivo"""
+        raw, formatted = metrics["raw"], metrics["formatted"]
+        sobrecosto, retraso = raw["probabilidad_sobrecosto"], raw["probabilidad_retraso"]
+        
+        alerts = conditional_lines({
+            "⚠️ ALTA PROBABILIDAD DE SOBRECOSTO detectada por IA.\n": sobrecosto > 0.7,
+            "⏰ RIESGO SIGNIFICATIVO DE RETRASO identificado.\n": retraso > 0.6,
+            "🚨 BAJA PROBABILIDAD DE CUMPLIMIENTO del cronograma.\n": raw["probabilidad_cumplimiento"] < 0.5,
+        }, len(analyses))
+        messages = PREDICTIVE_MESSAGE.render_batch(len(analyses), alerts=alerts)
+        severities = np.select(
+            [(sobrecosto > 0.8) | (retraso > 0.8), (sobrecosto > 0.6) | (retraso > 0.6)],
+            ['CRITICAL', 'WARNING'], default='INFO'
         )
         
-        return ReportSection(
-            title="🔮 Análisis Predictivo con IA",
-            data=predictions_data,
-            message=message
-        )
+        sections = []
+        for i, predictions in enumerate(metrics["predictions"]):
+            sections.append(trusted_section(
+                title="🔮 Análisis Predictivo con IA",
+                data={
+                    "Probabilidad de Sobrecosto": formatted["probabilidad_sobrecosto"][i],
+                    "Probabilidad de Retraso": formatted["probabilidad_retraso"][i],
+                    "Probabilidad de Cumplimiento": formatted["probabilidad_cumplimiento"][i],
+                    "Fecha Probable de Finalización": predictions.get('prediccion_finalizacion', 'N/A'),
+                    "Tendencia de Ejecución": predictions.get('tendencia_ejecucion', 'N/A'),
+                    "Tendencia de Avance": predictions.get('tendencia_avance', 'N/A')
+                },
+                message=trusted_message(
+                    block_name="Análisis Predictivo IA",
+                    message=messages[i],
+                    severity=str(severities[i])
+                )
+            ))
+        return sections
     
     def _create_anomalies_section(self, ai_analysis: AIAnalysisResult) -> ReportSection:
-        """Crear sección de detección de anomalías"""
-        
+        """
+        Crear sección de detección de anomalías.
+        Las anomalías del detector no traen `type`, `value` ni `threshold`: se usa la
+        severidad como tipo y se omiten valor y umbral cuando no están disponibles.
+        """
+        anomalies = ai_analysis.anomalies
         anomalies_data = {}
-        for i, anomaly in enumerate(ai_analysis.anomalies, 1):
-            anomalies_data[f"Anomalía {i}"] = f"{anomaly['type']}: {anomaly['description']}"
-            anomalies_data[f"Valor {i}"] = f"{anomaly['value']:.2f}"
-            anomalies_data[f"Umbral {i}"] = f"{anomaly['threshold']:.2f}"
-        
-        message_text = f"🚨 DETECCIÓN DE ANOMALÍAS\n\n"
-        message_text += f"El sistema de IA ha identificado {len(ai_analysis.anomalies)} anomalías significativas:\n\n"
-        
-        for anomaly in ai_analysis.anomalies:
-            message_text += f"• {anomaly['description']}\n"
-            message_text += f"  Valor actual: {anomaly['value']:.2f} (Umbral: {anomaly['threshold']:.2f})\n\n"
-        
-        message = TechnicalMessage(
+        items = []
+        for i, anomaly in enumerate(anomalies, 1):
+            anomaly_type = anomaly.get('type', anomaly.get('severity'))
+            anomalies_data[f"Anomalía {i}"] = f"{anomaly_type}: {anomaly['description']}"
+            items.append(ANOMALY_ITEM.render(description=anomaly['description']))
+            if 'value' in anomaly and 'threshold' in anomaly:
+                value, threshold = format_number([anomaly['value'], anomaly['threshold']])
+                anomalies_data[f"Valor {i}"] = value
+                anomalies_data[f"Umbral {i}"] = threshold
+                items.append(ANOMALY_VALUE.render(value=value, threshold=threshold))
+            items.append("\n")
+        
+        message = trusted_message(
             block_name="Detección de Anomalías IA",
-            message=message_text,
-            severity=self._get_anomalies_severity(ai_analysis.anomalies)
+            message=ANOMALIES_MESSAGE.render(count=len(anomalies), items="".join(items)),
+            severity=self._get_anomalies_severity(anomalies)
         )
         
-        return ReportSection(
+        return trusted_section(
             title="🚨 Detección de Anomalías IA",
             data=anomalies_data,
             message=message
         )
     
-    def _create_insights_section(self, ai_analysis: AIAnalysisResult) -> ReportSection:
-        """Crear sección de insights avanzados"""
-        
-        insights_data = {}
-        
-        # Métricas de rendimiento
-        performance = ai_analysis.insights.get('performance_metrics', {})
-        insights_data.update({
-            "Eficiencia Global": f"{performance.get('eficiencia_global', 0):.2%}",
-            "Velocidad de Ejecución": f"{performance.get('velocidad_ejecucion', 0):.2f}",
-            "Sostenibilidad Temporal": f"{performance.get('sostenibilidad_temporal', 0):.2f}"
-        })
-        
-        # Indicadores de riesgo
-        risk_indicators = ai_analysis.insights.get('risk_indicators', {})
-        insights_data.update({
-            "Riesgo Financiero": f"{risk_indicators.get('nivel_riesgo_financiero', 0):.2%}",
-            "Riesgo Temporal": f"{risk_indicators.get('nivel_riesgo_temporal', 0):.2%}",
-            "Probabilidad de Incumplimiento": f"{risk_indicators.get('probabilidad_incumplimiento', 0):.2%}"
-        })
-        
-        # Insights predictivos
-        predictive_insights = ai_analysis.insights.get('predictive_insights', {})
-        insights_data.update({
-            "Costo Final Estimado": f"${predictive_insights.get('costo_final_estimado', 0):,.2f} COP",
-            "Desviación Estimada": f"{predictive_insights.get('desviacion_estimada', 0):.2%}"
-        })
-        
-        message_text = f"🧠 INSIGHTS AVANZADOS DE IA\n\n"
-        message_text += f"Análisis profundo basado en múltiples algoritmos de machine learning:\n\n"
-        
-        # Agregar insights específicos
-        if performance.get('eficiencia_global', 0) < 0.5:
-            message_text += "📊 EFICIENCIA GLOBAL BAJA: El proyecto muestra ineficiencias significativas.\n"
-        
-        if risk_indicators.get('nivel_riesgo_financiero', 0) > 0.7:
-            message_text += "💰 ALTO RIESGO FINANCIERO: Requiere atención inmediata.\n"
-        
-        if risk_indicators.get('nivel_riesgo_temporal', 0) > 0.7:
-            message_text += "⏰ ALTO RIESGO TEMPORAL: Cronograma en peligro.\n"
-        
-        message = TechnicalMessage(
-            block_name="Insights Avanzados IA",
-            message=message_text,
-            severity=self._get_insights_severity(ai_analysis.insights)
+    def _create_insights_sections(self, analyses: List[AIAnalysisResult],
+                                  metrics: Dict[str, Any]) -> List[ReportSection]:
+        """Crear secciones de insights avanzados"""
+        raw, formatted = metrics["raw"], metrics["formatted"]
+        financiero, temporal = raw["nivel_riesgo_financiero"], raw["nivel_riesgo_temporal"]
+        
+        alerts = conditional_lines({
+            "📊 EFICIENCIA GLOBAL BAJA: El proyecto muestra ineficiencias significativas.\n": raw["eficiencia_global"] < 0.5,
+            "💰 ALTO RIESGO FINANCIERO: Requiere atención inmediata.\n": financiero > 0.7,
+            "⏰ ALTO RIESGO TEMPORAL: Cronograma en peligro.\n": temporal > 0.7,
+        }, len(analyses))
+        messages = INSIGHTS_MESSAGE.render_batch(len(analyses), alerts=alerts)
+        severities = np.select(
+            [(financiero > 0.8) | (temporal > 0.8), (financiero > 0.6) | (temporal > 0.6)],
+            ['CRITICAL', 'WARNING'], default='INFO'
         )
         
-        return ReportSection(
-            title="🧠 Insights Avanzados IA",
-            data=insights_data,
-            message=message
-        )
+        sections = []
+        for i in range(len(analyses)):
+            sections.append(trusted_section(
+                title="🧠 Insights Avanzados IA",
+                data={
+                    # Métricas de rendimiento
+                    "Eficiencia Global": formatted["eficiencia_global"][i],
+                    "Velocidad de Ejecución": formatted["velocidad_ejecucion"][i],
+                    "Sostenibilidad Temporal": formatted["sostenibilidad_temporal"][i],
+                    # Indicadores de riesgo
+                    "Riesgo Financiero": formatted["nivel_riesgo_financiero"][i],
+                    "Riesgo Temporal": formatted["nivel_riesgo_temporal"][i],
+                    "Probabilidad de Incumplimiento": formatted["probabilidad_incumplimiento"][i],
+                    # Insights predictivos
+                    "Costo Final Estimado": formatted["costo_final_estimado"][i],
+                    "Desviación Estimada": formatted["desviacion_estimada"][i]
+                },
+                message=trusted_message(
+                    block_name="Insights Avanzados IA",
+                    message=messages[i],
+                    severity=str(severities[i])
+                )
+            ))
+        return sections
     
-    def _create_recommendations_section(self, ai_analysis: AIAnalysisResult) -> ReportSection:
-        """Crear sección de recomendaciones inteligentes"""
-        
-        recommendations_data = {}
-        for i, recommendation in enumerate(ai_analysis.recommendations, 1):
-            recommendations_data[f"Recomendación {i}"] = recommendation
-        
-        message_text = f"💡 RECOMENDACIONES INTELIGENTES\n\n"
-        message_text += f"El sistema de IA ha generado {len(ai_analysis.recommendations)} recomendaciones específicas:\n\n"
-        
-        for i, recommendation in enumerate(ai_analysis.recommendations, 1):
-            message_text += f"{i}. {recommendation}\n\n"
-        
-        message_text += f"📊 Score de Riesgo: {ai_analysis.risk_score:.2%}\n"
-        message_text += f"🎯 Confianza del Análisis: {ai_analysis.confidence:.2%}"
-        
-        message = TechnicalMessage(
-            block_name="Recomendaciones IA",
-            message=message_text,
-            severity=ai_analysis.severity.value
+    def _create_recommendations_sections(self, analyses: List[AIAnalysisResult],
+                                         metrics: Dict[str, Any]) -> List[ReportSection]:
+        """Crear secciones de recomendaciones inteligentes"""
+        formatted = metrics["formatted"]
+        recommendations = [analysis.recommendations for analysis in analyses]
+        messages = RECOMMENDATIONS_MESSAGE.render_batch(
+            len(analyses),
+            count=[str(len(items)) for items in recommendations],
+            items=numbered_lines(recommendations, NUMBERED_PARAGRAPH),
+            risk_score=formatted["risk_score"],
+            confidence=formatted["confidence"]
         )
         
-        return ReportSection(
-            title="💡 Recomendaciones Inteligentes IA",
-            data=recommendations_data,
-            message=message
-        )
+        sections = []
+        for i, analysis in enumerate(analyses):
+            sections.append(trusted_section(
+                title="💡 Recomendaciones Inteligentes IA",
+                data={
+                    f"Recomendación {j}": recommendation
+                    for j, recommendation in enumerate(analysis.recommendations, 1)
+                },
+                message=trusted_message(
+                    block_name="Recomendaciones IA",
+                    message=messages[i],
+                    severity=analysis.severity.value
+                )
+            ))
+        return sections
     
     # Métodos auxiliares
     def _is_ai_severity_higher(self, ai_severity: str, original_severity: str) -> bool:
@@ -310,35 +455,16 @@ class IntelligentReportService:
         
         return ai_level > original_level
     
-    def _get_predictive_severity(self, predictions: Dict[str, Any]) -> str:
-        """Determinar severidad basada en predicciones"""
-        if (predictions.get('probabilidad_sobrecosto', 0) > 0.8 or 
-            predictions.get('probabilidad_retraso', 0) > 0.8):
-            return 'CRITICAL'
-        elif (predictions.get('probabilidad_sobrecosto', 0) > 0.6 or 
-              predictions.get('probabilidad_retraso', 0) > 0.6):
-            return 'WARNING'
-        else:
-            return 'INFO'
-    
     def _get_anomalies_severity(self, anomalies: List[Dict[str, Any]]) -> str:
         """Determinar severidad basada en anomalías"""
-        if any(anomaly.get('severity') == SeverityLevel.CRITICAL for anomaly in anomalies):
-            return 'CRITICAL'
-        elif any(anomaly.get('severity') == SeverityLevel.WARNING for anomaly in anomalies):
-            return 'WARNING'
-        else:
-            return 'INFO'
-    
-    def _get_insights_severity(self, insights: Dict[str, Any]) -> str:
-        """Determinar severidad basada en insights"""
-        risk_indicators = insights.get('risk_indicators', {})
-        
-        if (risk_indicators.get('nivel_riesgo_financiero', 0) > 0.8 or 
-            risk_indicators.get('nivel_riesgo_temporal', 0) > 0.8):
+        # El detector reporta la severidad como string; otras fuentes usan SeverityLevel
+        severities = {
+            anomaly.get('severity').value if isinstance(anomaly.get('severity'), SeverityLevel) else anomaly.get('severity')
+            for anomaly in anomalies
+        }
+        if 'CRITICAL' in severities:
             return 'CRITICAL'
-        elif (risk_indicators.get('nivel_riesgo_financiero', 0) > 0.6 or 
-              risk_indicators.get('nivel_riesgo_temporal', 0) > 0.6):
+        elif 'WARNING' in severities:
             return 'WARNING'
         else:
             return 'INFO'
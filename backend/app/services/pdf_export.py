@@ -0,0 +1,209 @@
+"""
+Exportación de informes inteligentes a PDF en segundo plano
+Los informes se generan en la cola de trabajos y el PDF se renderiza con WeasyPrint
+en un pool de procesos, nunca en el handler del request. Los PDF terminados se
+guardan en el cache de artefactos por huella de contenido.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from app.core.artifact_cache import ArtifactCache, artifact_cache
+from app.core.config import settings
+from app.core.job_queue import Job, JobQueue, JobStatus, job_queue
+from app.core.logging.config import get_logger
+from app.schemas.report import GeneratedReport
+from app.services.intelligent_report_service import IntelligentReportService
+from app.services.pdf_render import render_pdf
+
+logger = get_logger(__name__)
+
+PDF_JOB = "pdf_export"
+PDF_MEDIA_TYPE = "application/pdf"
+
+# Fracción del progreso que corresponde a generar los informes; el resto es el renderizado
+GENERATION_PROGRESS = 0.8
+
+SEVERITY_COLORS = {"CRITICAL": "#b3261e", "WARNING": "#b26a00", "INFO": "#1f5f99"}
+
+DOCUMENT_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<style>
+@page {{ size: A4; margin: 2cm; @bottom-right {{ content: counter(page) " / " counter(pages); font-size: 9pt; }} }}
+body {{ font-family: sans-serif; font-size: 10pt; color: #222; }}
+h1 {{ font-size: 16pt; }}
+h2 {{ font-size: 13pt; border-bottom: 1px solid #999; page-break-before: always; }}
+h3 {{ font-size: 11pt; margin-bottom: 2pt; }}
+.severity {{ font-weight: bold; }}
+.message {{ white-space: pre-wrap; }}
+.error {{ color: #b3261e; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{context}</p>
+{body}
+</body>
+</html>
+"""
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Pool de procesos de renderizado (creado al primer uso)"""
+    global _render_pool
+    if _render_pool is None:
+        # spawn: los procesos hijos no heredan el event loop ni los hilos del servidor
+        _render_pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _render_pool
+
+
+def shutdown_render_pool() -> None:
+    """Cerrar el pool de procesos de renderizado"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+
+def contract_html(contract_key: str, outcome: Union[GeneratedReport, Exception]) -> str:
+    """Fragmento HTML del informe de un contrato (o de su error)"""
+    header = f"<h2>Contrato {escape(str(contract_key))}</h2>"
+    if isinstance(outcome, Exception):
+        return f'{header}<p class="error">No fue posible generar el informe: {escape(str(outcome))}</p>'
+    sections = [
+        f"<h3>{escape(section.title)}</h3>"
+        f'<p class="severity" style="color: {SEVERITY_COLORS.get(section.message.severity, "#222")}">'
+        f"{escape(section.message.severity)}</p>"
+        f'<p class="message">{escape(section.message.message)}</p>'
+        for section in outcome.sections
+    ]
+    return header + "".join(sections)
+
+
+def document_html(parts: List[str]) -> str:
+    """Documento HTML completo a partir de los fragmentos de cada contrato"""
+    report = GeneratedReport(sections=[])
+    return DOCUMENT_TEMPLATE.format(
+        title=escape(f"Informes de Supervisión - {report.contract_type} {report.year}"),
+        context=escape(report.context),
+        body="\n".join(parts),
+    )
+
+
+async def run_pdf_job(job: Job, report_progress: Callable[[float], Awaitable[None]]) -> Dict[str, Any]:
+    """
+    Generar los informes del trabajo y renderizarlos a un único PDF.
+    Payload: {"contracts": [registros], "keys": [claves], "fingerprint": huella,
+    "latency_budget": segundos | None}.
+    """
+    contracts = job.payload["contracts"]
+    keys = job.payload["keys"]
+    fingerprint = job.payload["fingerprint"]
+    latency_budget = job.payload.get("latency_budget")
+    service = IntelligentReportService()
+    chunk_size = settings.STREAM_CHUNK_SIZE
+
+    parts: List[str] = []
+    errors = 0
+    for start in range(0, len(contracts), chunk_size):
+        outcomes = await service.generate_intelligent_reports(
+            contracts[start:start + chunk_size], latency_budget=latency_budget, return_exceptions=True
+        )
+        for key, outcome in zip(keys[start:start + chunk_size], outcomes):
+            errors += isinstance(outcome, Exception)
+            parts.append(contract_html(key, outcome))
+        await report_progress(GENERATION_PROGRESS * len(parts) / len(contracts))
+
+    html = document_html(parts)
+    loop = asyncio.get_running_loop()
+    path = await artifact_cache.put(
+        fingerprint, ".pdf",
+        lambda target: loop.run_in_executor(_get_render_pool(), render_pdf, html, str(target))
+    )
+
+    logger.info(f"Trabajo {job.id}: PDF {fingerprint[:12]} renderizado ({len(contracts)} contratos)")
+    return {
+        "fingerprint": fingerprint,
+        "total_contratos": len(contracts),
+        "errors": errors,
+        "size_bytes": path.stat().st_size,
+    }
+
+
+class PdfExportService:
+    """
+    Punto de entrada de las exportaciones PDF.
+
+    Las solicitudes concurrentes del mismo contenido (misma huella) se agrupan en un
+    único trabajo de renderizado mientras esté en curso. El agrupamiento es por proceso;
+    los PDF terminados se comparten a través del cache de artefactos.
+    """
+
+    def __init__(self, queue: JobQueue = job_queue, cache: ArtifactCache = artifact_cache,
+                 max_tracked: int = settings.JOB_RESULT_MAX):
+        self.queue = queue
+        self.cache = cache
+        self.max_tracked = max_tracked
+        self._inflight: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    def _state(self, fingerprint: str, job: Optional[Job], coalesced: bool = False) -> Dict[str, Any]:
+        if job is None:
+            return {"fingerprint": fingerprint, "status": JobStatus.SUCCEEDED.value, "progress": 1.0,
+                    "job_id": None, "error": None, "coalesced": coalesced}
+        return {"fingerprint": fingerprint, "status": job.status.value, "progress": round(job.progress, 4),
+                "job_id": job.id, "error": job.error, "coalesced": coalesced}
+
+    async def request(self, fingerprint: str, contracts: List[Dict[str, Any]], keys: List[str],
+                      latency_budget: Optional[float] = None, priority: str = "normal") -> Dict[str, Any]:
+        """
+        Solicitar el PDF de un contenido. Devuelve su estado: terminado si ya está en
+        cache, el trabajo en curso si otra solicitud ya lo pidió, o un trabajo nuevo.
+        Lanza QueueFullError si la cola de trabajos está llena.
+        """
+        if self.cache.get(fingerprint, ".pdf") is not None:
+            return self._state(fingerprint, None)
+
+        async with self._lock:
+            job_id = self._inflight.get(fingerprint)
+            job = await self.queue.get(job_id) if job_id else None
+            if job is not None and job.status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                logger.info(f"PDF {fingerprint[:12]} ya en curso (trabajo {job.id}), solicitud agrupada")
+                return self._state(fingerprint, job, coalesced=True)
+
+            job = await self.queue.submit(PDF_JOB, {
+                "contracts": contracts,
+                "keys": keys,
+                "fingerprint": fingerprint,
+                "latency_budget": latency_budget,
+            }, priority=priority)
+            self._inflight.pop(fingerprint, None)
+            self._inflight[fingerprint] = job.id
+            while len(self._inflight) > self.max_tracked:
+                self._inflight.pop(next(iter(self._inflight)))
+            return self._state(fingerprint, job)
+
+    async def status(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Estado de la exportación de una huella, o None si no se conoce"""
+        job_id = self._inflight.get(fingerprint)
+        job = await self.queue.get(job_id) if job_id else None
+        if job is not None and job.status != JobStatus.SUCCEEDED:
+            return self._state(fingerprint, job)
+        if self.cache.get(fingerprint, ".pdf") is not None:
+            return self._state(fingerprint, None)
+        return None
+
+
+job_queue.register(PDF_JOB, run_pdf_job)
+
+# Instancia global del servicio de exportación PDF
+pdf_export_service = PdfExportService()
@@ -0,0 +1,14 @@
+"""
+Renderizado HTML -> PDF con WeasyPrint
+Módulo mínimo a propósito: es lo único que importan los procesos del pool de
+renderizado (sin el motor de IA ni la aplicación).
+"""
+
+
+def render_pdf(html: str, path: str) -> None:
+    """Renderizar el documento HTML a PDF en `path`"""
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise RuntimeError("WeasyPrint no está instalado: agregue weasyprint a requirements.txt")
+    HTML(string=html).write_pdf(path)
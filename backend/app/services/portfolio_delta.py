@@ -0,0 +1,449 @@
+"""
+Re-análisis incremental de portafolios de contratos
+Compara cada carga contra el último snapshot del portafolio y solo envía al
+motor de IA los contratos nuevos o modificados
+"""
+import asyncio
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+
+from app.core.cache import cache_manager
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.serialization import dumps
+from app.services.ai_intelligence_engine import (
+    AIAnalysisResult,
+    ContractIntelligenceEngine,
+    get_intelligence_engine,
+)
+
+logger = get_logger(__name__)
+
+# Columnas que identifican un contrato, en orden de preferencia
+IDENTITY_COLUMNS = ("id_contrato", "numero_contrato", "codigo_contrato")
+# Identidad compuesta cuando el archivo no trae un identificador explícito
+FALLBACK_IDENTITY_COLUMNS = ("nombre_proyecto", "ubicacion", "tipo_contrato")
+
+
+def compute_contract_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Calcular la clave de identidad de cada contrato.
+    Sin columnas de identidad se usa la posición de la fila, por lo que
+    reordenar el archivo marcará todos los contratos como modificados.
+    """
+    for column in IDENTITY_COLUMNS:
+        if column in df.columns:
+            return df[column].astype(str).str.strip()
+
+    columns = [c for c in FALLBACK_IDENTITY_COLUMNS if c in df.columns]
+    if columns:
+        keys = df[columns[0]].astype(str).str.strip()
+        for column in columns[1:]:
+            keys = keys + "|" + df[column].astype(str).str.strip()
+        return keys
+
+    return pd.Series([f"fila-{i}" for i in range(len(df))], index=df.index)
+
+
+def compute_row_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """Huella de contenido por fila, independiente del orden de las columnas"""
+    ordered = df[sorted(df.columns)]
+    return pd.util.hash_pandas_object(ordered, index=False)
+
+
+def compute_row_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Métricas vectorizadas por contrato que alimentan los agregados del portafolio.
+    El riesgo sigue los mismos criterios que EnhancedReportService._calculate_analytics.
+    Solo dependen del contenido de la fila, de modo que una fila sin cambios
+    conserva su aporte entre cargas.
+    """
+    def numeric(column: str) -> pd.Series:
+        if column not in df.columns:
+            return pd.Series(0.0, index=df.index)
+        return pd.to_numeric(df[column], errors="coerce").fillna(0.0).astype("float64")
+
+    presupuesto = numeric("presupuesto_aprobado")
+    ejecutado = numeric("valor_ejecutado")
+    avance = numeric("porcentaje_avance_fisico")
+
+    eficiencia = pd.Series(
+        np.where(presupuesto > 0, ejecutado / presupuesto.where(presupuesto > 0, 1.0), 0.0),
+        index=df.index,
+    )
+    desempeno_temporal = avance / 100.0
+
+    riesgo = (
+        0.3 * (eficiencia > 1.0)
+        + 0.4 * (desempeno_temporal < 0.8)
+        + 0.3 * (eficiencia < 0.5)
+    ).clip(upper=1.0)
+
+    return pd.DataFrame({
+        "presupuesto": presupuesto,
+        "ejecutado": ejecutado,
+        "avance": avance,
+        "riesgo": riesgo.astype("float64"),
+        "sobrecosto": (eficiencia > 1.0).astype("int64"),
+        "riesgo_alto": (riesgo > 0.7).astype("int64"),
+    })
+
+
+@dataclass(slots=True)
+class ContractRecord:
+    """Registro de un contrato analizado dentro del snapshot"""
+    key: str
+    fingerprint: int
+    presupuesto: float
+    ejecutado: float
+    avance: float
+    riesgo: float
+    sobrecosto: int
+    riesgo_alto: int
+    analyzed_at: datetime
+
+
+@dataclass
+class PortfolioAggregates:
+    """Agregados del portafolio mantenidos de forma incremental"""
+    total_contratos: int = 0
+    presupuesto_total: float = 0.0
+    valor_ejecutado_total: float = 0.0
+    suma_avance_fisico: float = 0.0
+    suma_riesgo: float = 0.0
+    contratos_sobrecosto: int = 0
+    contratos_riesgo_alto: int = 0
+
+    def add(self, record: ContractRecord):
+        self._apply(record, 1)
+
+    def remove(self, record: ContractRecord):
+        self._apply(record, -1)
+
+    def _apply(self, record: ContractRecord, sign: int):
+        self.total_contratos += sign
+        self.presupuesto_total += sign * record.presupuesto
+        self.valor_ejecutado_total += sign * record.ejecutado
+        self.suma_avance_fisico += sign * record.avance
+        self.suma_riesgo += sign * record.riesgo
+        self.contratos_sobrecosto += sign * record.sobrecosto
+        self.contratos_riesgo_alto += sign * record.riesgo_alto
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.total_contratos
+        return {
+            "total_contratos": total,
+            "presupuesto_total": self.presupuesto_total,
+            "valor_ejecutado_total": self.valor_ejecutado_total,
+            "ejecucion_presupuestal": (
+                self.valor_ejecutado_total / self.presupuesto_total * 100
+                if self.presupuesto_total > 0 else 0.0
+            ),
+            "avance_fisico_promedio": self.suma_avance_fisico / total if total else 0.0,
+            "riesgo_promedio": self.suma_riesgo / total if total else 0.0,
+            "contratos_sobrecosto": self.contratos_sobrecosto,
+            "contratos_riesgo_alto": self.contratos_riesgo_alto,
+        }
+
+
+@dataclass
+class PortfolioSnapshot:
+    """Último estado conocido de un portafolio"""
+    portfolio_id: str
+    records: Dict[str, ContractRecord] = field(default_factory=dict)
+    aggregates: PortfolioAggregates = field(default_factory=PortfolioAggregates)
+    updated_at: Optional[datetime] = None
+    # Identifica la versión guardada en Redis (ver SnapshotStore)
+    revision: Optional[str] = None
+
+    # Métricas de ContractRecord, guardadas por columnas
+    METRICS = ("presupuesto", "ejecutado", "avance", "riesgo", "sobrecosto", "riesgo_alto")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot por columnas (claves, huellas, métricas) con los agregados"""
+        records = list(self.records.values())
+        data = {
+            "portfolio_id": self.portfolio_id,
+            "revision": self.revision,
+            "updated_at": self.updated_at,
+            "aggregates": asdict(self.aggregates),
+            "keys": [record.key for record in records],
+            "fingerprints": [record.fingerprint for record in records],
+            "analyzed_at": [record.analyzed_at for record in records],
+        }
+        for name in self.METRICS:
+            data[name] = [getattr(record, name) for record in records]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PortfolioSnapshot":
+        columns = [data["keys"], data["fingerprints"], *(data[name] for name in cls.METRICS),
+                   [datetime.fromisoformat(value) for value in data["analyzed_at"]]]
+        records = {values[0]: ContractRecord(*values) for values in zip(*columns)}
+        return cls(
+            portfolio_id=data["portfolio_id"],
+            records=records,
+            aggregates=PortfolioAggregates(**data["aggregates"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]) if data["updated_at"] else None,
+            revision=data["revision"],
+        )
+
+
+@dataclass
+class PortfolioDelta:
+    """Diferencias entre una carga y el snapshot anterior"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "nuevos": len(self.added),
+            "modificados": len(self.changed),
+            "eliminados": len(self.removed),
+            "sin_cambios": self.unchanged,
+        }
+
+
+@dataclass
+class PortfolioAnalysisResult:
+    """Resultado de un re-análisis incremental"""
+    portfolio_id: str
+    delta: PortfolioDelta
+    aggregates: Dict[str, Any]
+    ai_analysis: Optional[AIAnalysisResult]
+
+
+@dataclass(slots=True)
+class _PortfolioLock:
+    """Lock de un portafolio y las cargas que lo tienen o lo esperan"""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+
+
+class SnapshotStore:
+    """
+    Snapshots de portafolios guardados con cada análisis.
+
+    Con PORTFOLIO_SNAPSHOT_BACKEND=redis el snapshot (claves, huellas, métricas y
+    agregados) se guarda en Redis durante PORTFOLIO_SNAPSHOT_TTL segundos, así que
+    sobrevive a reinicios y lo comparten todos los workers. En memoria se mantiene
+    una copia LRU de hasta `max_portfolios` snapshots: se reutiliza mientras su
+    revisión coincida con la de Redis y, si otro worker guardó uno más reciente, se
+    recarga. Sin Redis (o si falla) los snapshots viven solo en memoria.
+    """
+
+    KEY = "portfolio_snapshot:{}"
+
+    def __init__(self, max_portfolios: int = None, client=None):
+        self.max_portfolios = max_portfolios or settings.PORTFOLIO_SNAPSHOT_MAX
+        self.client = client
+        self._client_resolved = client is not None
+        self._snapshots: "OrderedDict[str, PortfolioSnapshot]" = OrderedDict()
+        # Solo portafolios con cargas en curso o en espera (ver lock)
+        self._locks: Dict[str, _PortfolioLock] = {}
+
+    async def _get_client(self):
+        if not self._client_resolved:
+            self._client_resolved = True
+            if settings.PORTFOLIO_SNAPSHOT_BACKEND == "redis":
+                self.client = await cache_manager.get_client()
+                if self.client is None:
+                    logger.warning("Redis no disponible, usando snapshots de portafolio en proceso")
+        return self.client
+
+    async def get(self, portfolio_id: str) -> Optional[PortfolioSnapshot]:
+        snapshot = self._snapshots.get(portfolio_id)
+        client = await self._get_client()
+        if client is not None:
+            key = self.KEY.format(portfolio_id)
+            try:
+                revision = await client.hget(key, "revision")
+                if revision is not None and (snapshot is None or snapshot.revision != revision.decode()):
+                    raw = await client.hget(key, "data")
+                    if raw is not None:
+                        snapshot = PortfolioSnapshot.from_dict(orjson.loads(raw))
+            except Exception as e:
+                logger.warning(f"No se pudo leer el snapshot del portafolio {portfolio_id} en Redis: {e}")
+        if snapshot is not None:
+            self._remember(snapshot)
+        return snapshot
+
+    async def put(self, snapshot: PortfolioSnapshot):
+        snapshot.revision = uuid.uuid4().hex
+        self._remember(snapshot)
+        client = await self._get_client()
+        if client is None:
+            return
+        key = self.KEY.format(snapshot.portfolio_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"revision": snapshot.revision, "data": dumps(snapshot.to_dict())})
+                pipe.expire(key, settings.PORTFOLIO_SNAPSHOT_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el snapshot del portafolio {snapshot.portfolio_id} en Redis: {e}")
+
+    def _remember(self, snapshot: PortfolioSnapshot):
+        self._snapshots[snapshot.portfolio_id] = snapshot
+        self._snapshots.move_to_end(snapshot.portfolio_id)
+        while len(self._snapshots) > self.max_portfolios:
+            evicted, _ = self._snapshots.popitem(last=False)
+            logger.info(f"Snapshot de portafolio descartado de memoria por capacidad: {evicted}")
+
+    @asynccontextmanager
+    async def lock(self, portfolio_id: str):
+        """
+        Lock por portafolio para serializar cargas concurrentes del mismo portafolio
+        en este proceso. Se descarta cuando ninguna carga lo tiene ni lo espera, así
+        que `_locks` crece con las cargas en curso y no con los portafolios vistos.
+        """
+        entry = self._locks.get(portfolio_id)
+        if entry is None:
+            entry = self._locks[portfolio_id] = _PortfolioLock()
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._locks[portfolio_id]
+
+
+class PortfolioDeltaService:
+    """
+    Servicio de re-análisis incremental: solo los contratos nuevos o modificados
+    pasan por el motor de IA y los agregados se actualizan restando el aporte
+    anterior y sumando el nuevo, con costo proporcional a los cambios.
+    """
+
+    def __init__(self, engine: Optional[ContractIntelligenceEngine] = None,
+                 store: Optional[SnapshotStore] = None):
+        self._engine = engine
+        self.store = store or SnapshotStore()
+
+    @property
+    def engine(self) -> ContractIntelligenceEngine:
+        if self._engine is None:
+            self._engine = get_intelligence_engine()
+        return self._engine
+
+    async def analyze(self, portfolio_id: str, df: pd.DataFrame,
+                      approximate: bool = False) -> PortfolioAnalysisResult:
+        """
+        Re-analizar un portafolio a partir de una carga completa.
+        Con `approximate=True` el motor muestrea las etapas costosas; las métricas
+        por contrato y los agregados siguen siendo exactos.
+        """
+        async with self.store.lock(portfolio_id):
+            return await self._analyze_locked(portfolio_id, df, approximate)
+
+    async def _analyze_locked(self, portfolio_id: str, df: pd.DataFrame,
+                              approximate: bool) -> PortfolioAnalysisResult:
+        df = df.reset_index(drop=True)
+        keys = compute_contract_keys(df)
+
+        duplicated = keys.duplicated(keep="last")
+        if duplicated.any():
+            logger.warning(
+                f"Portafolio {portfolio_id}: {int(duplicated.sum())} claves de contrato "
+                f"duplicadas, se conserva la última aparición"
+            )
+            df = df[~duplicated].reset_index(drop=True)
+            keys = keys[~duplicated].reset_index(drop=True)
+
+        fingerprints = compute_row_fingerprints(df)
+
+        snapshot = await self.store.get(portfolio_id) or PortfolioSnapshot(portfolio_id=portfolio_id)
+        previous = snapshot.records
+
+        # Diff vectorizado contra las huellas del snapshot anterior
+        fingerprint_values = fingerprints.to_numpy(dtype=np.uint64)
+        if previous:
+            previous_keys = pd.Index(list(previous.keys()))
+            previous_fingerprints = np.fromiter(
+                (record.fingerprint for record in previous.values()),
+                dtype=np.uint64, count=len(previous)
+            )
+            positions = previous_keys.get_indexer(keys)
+            new_mask = positions < 0
+            changed_mask = ~new_mask & (
+                previous_fingerprints[np.where(new_mask, 0, positions)] != fingerprint_values
+            )
+        else:
+            new_mask = np.ones(len(df), dtype=bool)
+            changed_mask = np.zeros(len(df), dtype=bool)
+
+        is_new = pd.Series(new_mask, index=df.index)
+        is_changed = pd.Series(changed_mask, index=df.index)
+        pending = is_new | is_changed
+
+        current_keys = set(keys)
+        delta = PortfolioDelta(
+            added=keys[is_new].tolist(),
+            changed=keys[is_changed].tolist(),
+            removed=[key for key in previous if key not in current_keys],
+            unchanged=int((~pending).sum()),
+        )
+
+        pending_df = df[pending]
+        ai_analysis = None
+        if not pending_df.empty:
+            ai_analysis = await self.engine.analyze_contract_data(pending_df, approximate=approximate)
+
+        # Actualización incremental de registros y agregados
+        aggregates = snapshot.aggregates
+        for key in delta.removed:
+            aggregates.remove(previous.pop(key))
+
+        now = datetime.now()
+        metrics = compute_row_metrics(pending_df)
+        pending_keys = keys[pending]
+        pending_fingerprints = fingerprints[pending]
+        for key, fingerprint, row in zip(pending_keys, pending_fingerprints,
+                                         metrics.itertuples(index=False)):
+            old_record = previous.get(key)
+            if old_record is not None:
+                aggregates.remove(old_record)
+            record = ContractRecord(
+                key=key,
+                fingerprint=int(fingerprint),
+                presupuesto=float(row.presupuesto),
+                ejecutado=float(row.ejecutado),
+                avance=float(row.avance),
+                riesgo=float(row.riesgo),
+                sobrecosto=int(row.sobrecosto),
+                riesgo_alto=int(row.riesgo_alto),
+                analyzed_at=now,
+            )
+            previous[key] = record
+            aggregates.add(record)
+
+        snapshot.updated_at = now
+        await self.store.put(snapshot)
+
+        logger.info(
+            f"Portafolio {portfolio_id}: {len(pending_df)} contratos analizados, "
+            f"{delta.unchanged} sin cambios, {len(delta.removed)} eliminados"
+        )
+
+        return PortfolioAnalysisResult(
+            portfolio_id=portfolio_id,
+            delta=delta,
+            aggregates=aggregates.to_dict(),
+            ai_analysis=ai_analysis,
+        )
+
+
+# Instancia global del servicio de portafolios
+portfolio_delta_service = PortfolioDeltaService()
@@ -1,6 +1,6 @@
 # Fichero: backend/app/services/report_generator.py
 
-from app.schemas.report import TechnicalMessage, ReportSection
+from app.schemas.report import ReportSection, trusted_message, trusted_section
 from typing import Dict, Any, List
 import datetime
 import pandas as pd
@@ -34,9 +34,9 @@ class ReportGeneratorService:
             message_text += "PRECAUCIÓN: Ejecución superior al 75%. Se debe monitorear semanalmente el flujo de caja para asegurar la cobertura hasta el final."
             severity = 'WARNING'
 
-        message = TechnicalMessage(block_name="Análisis Presupuestal", message=message_text, severity=severity)
+        message = trusted_message(block_name="Análisis Presupuestal", message=message_text, severity=severity)
         
-        return ReportSection(
+        return trusted_section(
             title="Análisis Presupuestal",
             data={
                 "Presupuesto Aprobado": f"${presupuesto:,.2f} COP",
@@ -46,6 +46,24 @@ class ReportGeneratorService:
             message=message
         )
 
+    @staticmethod
+    def _parse_end_date(value: Any) -> datetime.date:
+        """
+        Fecha de fin planificada como date. Las fechas ISO (el caso común) se parsean
+        con fromisoformat; pd.to_datetime infiere el formato en cada llamada y domina
+        el costo de generar informes en masa, así que queda solo para otros formatos.
+        """
+        if isinstance(value, datetime.datetime):  # Incluye pd.Timestamp
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        if isinstance(value, str):
+            try:
+                return datetime.datetime.fromisoformat(value).date()
+            except ValueError:
+                pass
+        return pd.to_datetime(value).date()
+
     def _generate_timeline_message(self) -> ReportSection:
         """Genera la sección y el mensaje técnico para el bloque de cronograma."""
         try:
@@ -57,7 +75,7 @@ class ReportGeneratorService:
             if not fecha_fin_str:
                 fecha_fin = datetime.date(2025, 12, 31)  # Fecha por defecto
             else:
-                fecha_fin = pd.to_datetime(fecha_fin_str).date()
+                fecha_fin = self._parse_end_date(fecha_fin_str)
                 
             avance = float(self.data.get('porcentaje_avance_fisico', 0))
             
@@ -81,9 +99,9 @@ class ReportGeneratorService:
             message_text = "No se pudo analizar el cronograma. Verifique el formato de las fechas en el archivo Excel."
             severity = 'WARNING'
 
-        message = TechnicalMessage(block_name="Análisis de Cronograma", message=message_text, severity=severity)
+        message = trusted_message(block_name="Análisis de Cronograma", message=message_text, severity=severity)
         
-        return ReportSection(
+        return trusted_section(
             title="Análisis de Cronograma",
             data={
                 "Fecha de Finalización Planificada": self.data.get('fecha_fin_planificada'),
@@ -0,0 +1,38 @@
+"""
+Trabajos de generación de informes ejecutados por la cola de trabajos
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+from app.core.job_queue import Job, job_queue
+from app.core.logging.config import get_logger
+from app.services.intelligent_report_service import IntelligentReportService
+
+logger = get_logger(__name__)
+
+REPORT_JOB = "report"
+
+
+async def run_report_job(job: Job, report_progress: Callable[[float], Awaitable[None]]) -> Dict[str, Any]:
+    """
+    Generar los informes inteligentes de todos los contratos del trabajo.
+    Payload: {"contracts": [registros], "latency_budget": segundos | None}.
+    Los contratos se procesan por bloques de STREAM_CHUNK_SIZE para reportar progreso.
+    """
+    contracts = job.payload["contracts"]
+    latency_budget = job.payload.get("latency_budget")
+    service = IntelligentReportService()
+    chunk_size = settings.STREAM_CHUNK_SIZE
+
+    reports = []
+    for start in range(0, len(contracts), chunk_size):
+        chunk = contracts[start:start + chunk_size]
+        chunk_reports = await service.generate_intelligent_reports(chunk, latency_budget=latency_budget)
+        reports.extend(report.model_dump() for report in chunk_reports)
+        await report_progress(len(reports) / len(contracts))
+
+    logger.info(f"Trabajo {job.id}: {len(reports)} informes generados")
+    return {"total_contratos": len(contracts), "reports": reports}
+
+
+job_queue.register(REPORT_JOB, run_report_job)
@@ -0,0 +1,93 @@
+"""
+Plantillas de mensajes de informes compiladas y formateo vectorizado
+Permite renderizar las secciones de un lote de contratos en una sola pasada
+"""
+from string import Formatter
+from typing import Any, Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+Column = Union[str, Sequence[str], np.ndarray]
+
+# Separador de miles sobre la parte entera de un número ya formateado con decimales
+_THOUSANDS_PATTERN = r"(\d)(?=(?:\d{3})+\.)"
+
+
+def _as_float_array(values: Iterable[Any]) -> np.ndarray:
+    return np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=np.float64)
+
+
+def format_number(values: Iterable[Any], decimals: int = 2) -> np.ndarray:
+    """Equivalente vectorizado de f"{x:.{decimals}f}" """
+    return np.char.mod(f"%.{decimals}f", _as_float_array(values)).astype(object)
+
+
+def format_percent(values: Iterable[Any], decimals: int = 2) -> np.ndarray:
+    """Equivalente vectorizado de f"{x:.{decimals}%}" (x en fracción)"""
+    return format_number(_as_float_array(values) * 100, decimals) + "%"
+
+
+def format_currency(values: Iterable[Any], currency: str = "COP") -> np.ndarray:
+    """Equivalente vectorizado de f"${x:,.2f} COP" """
+    grouped = pd.Series(format_number(values, 2), dtype=object).str.replace(
+        _THOUSANDS_PATTERN, r"\1,", regex=True
+    )
+    return "$" + grouped.to_numpy(dtype=object) + f" {currency}"
+
+
+class MessageTemplate:
+    """
+    Plantilla de mensaje compilada una sola vez.
+
+    Usa la sintaxis de str.format con campos sin especificación de formato: los
+    valores llegan ya formateados (ver format_percent / format_currency), de modo
+    que renderizar un lote es concatenar columnas de strings.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if format_spec or conversion:
+                raise ValueError(f"Campo con formato no soportado en plantilla: {field_name}")
+            self._parts.append((literal, field_name))
+        self.fields = [name for _, name in self._parts if name is not None]
+
+    def render(self, **values: Any) -> str:
+        """Renderizar un único mensaje"""
+        return "".join(
+            literal + (str(values[name]) if name is not None else "")
+            for literal, name in self._parts
+        )
+
+    def render_batch(self, size: int, **columns: Column) -> List[str]:
+        """
+        Renderizar `size` mensajes. Cada columna es una secuencia de strings de
+        longitud `size` o un string común a todo el lote.
+        """
+        rendered = np.full(size, "", dtype=object)
+        for literal, name in self._parts:
+            if literal:
+                rendered = rendered + literal
+            if name is not None:
+                column = columns[name]
+                rendered = rendered + (column if isinstance(column, str) else np.asarray(column, dtype=object))
+        return rendered.tolist()
+
+
+def conditional_lines(lines: Dict[str, np.ndarray], size: int) -> np.ndarray:
+    """Concatenar, por contrato, las líneas cuya condición (máscara booleana) se cumple"""
+    rendered = np.full(size, "", dtype=object)
+    for line, mask in lines.items():
+        rendered = rendered + np.where(mask, line, "").astype(object)
+    return rendered
+
+
+def numbered_lines(items: Sequence[Sequence[str]], template: MessageTemplate,
+                   limit: int = None) -> List[str]:
+    """Listas numeradas (1., 2., ...) de longitud variable por contrato"""
+    return [
+        "".join(template.render(index=i, item=item) for i, item in enumerate(row[:limit], 1))
+        for row in items
+    ]
@@ -0,0 +1,107 @@
+"""
+Exportación de informes inteligentes a Excel (XLSX) en streaming
+Usa el modo write-only de openpyxl: las filas se escriben a disco a medida que se
+generan los informes de cada bloque, de modo que la memoria no crece con el portafolio.
+"""
+import asyncio
+from pathlib import Path
+from typing import Any, List, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from app.core.config import settings
+from app.core.logging.config import get_logger
+from app.core.serialization import dumps
+from app.services.ai_intelligence_engine import SeverityLevel
+from app.services.intelligent_report_service import IntelligentReportService
+
+logger = get_logger(__name__)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Límite de caracteres de una celda de Excel
+MAX_CELL_LENGTH = 32767
+
+SUMMARY_HEADER = [
+    "Índice", "Clave del contrato", "Score de riesgo", "Severidad", "Confianza",
+    "Anomalías", "Recomendaciones", "Etapas omitidas", "Tiempo de análisis (s)", "Error",
+]
+SECTIONS_HEADER = [
+    "Índice", "Clave del contrato", "Sección", "Bloque", "Severidad", "Mensaje", "Datos",
+]
+
+
+def _cell(value: Any) -> Any:
+    """Texto apto para una celda: sin caracteres de control y dentro del límite de Excel"""
+    if not isinstance(value, str):
+        return value
+    return ILLEGAL_CHARACTERS_RE.sub("", value)[:MAX_CELL_LENGTH]
+
+
+async def write_reports_xlsx(df: pd.DataFrame, keys: List[str], path: Path,
+                             service: IntelligentReportService,
+                             latency_budget: Optional[float] = None) -> None:
+    """
+    Generar los informes de todos los contratos de `df` y escribirlos en `path`.
+
+    - **Hoja "Resumen"**: una fila por contrato con el análisis de IA (o el error).
+    - **Hoja "Secciones"**: una fila por sección de informe, en formato largo.
+
+    Los contratos se procesan por bloques de `BATCH_CHUNK_SIZE`.
+    """
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet("Resumen")
+    sections = workbook.create_sheet("Secciones")
+    summary.append(SUMMARY_HEADER)
+    sections.append(SECTIONS_HEADER)
+
+    errors = 0
+    for start in range(0, len(df), settings.BATCH_CHUNK_SIZE):
+        chunk = df.iloc[start:start + settings.BATCH_CHUNK_SIZE]
+        records = [
+            {key: value for key, value in row.items() if not pd.isna(value)}
+            for row in chunk.to_dict(orient="records")
+        ]
+        try:
+            outcomes = await service.generate_intelligent_reports_with_analysis(
+                records, latency_budget=latency_budget
+            )
+        except Exception as e:
+            outcomes = [e] * len(chunk)
+
+        for index, outcome in enumerate(outcomes, start):
+            if isinstance(outcome, Exception):
+                errors += 1
+                summary.append([index, keys[index]] + [None] * (len(SUMMARY_HEADER) - 3) + [_cell(str(outcome))])
+                continue
+
+            report, analysis = outcome
+            severity = analysis.severity.value if isinstance(analysis.severity, SeverityLevel) else analysis.severity
+            summary.append([
+                index,
+                keys[index],
+                round(float(analysis.risk_score), 4),
+                severity,
+                round(float(analysis.confidence), 4),
+                len(analysis.anomalies),
+                len(analysis.recommendations),
+                _cell(", ".join(analysis.skipped_stages)),
+                round(float(analysis.processing_time), 4),
+                None,
+            ])
+            for section in report.sections:
+                sections.append([
+                    index,
+                    keys[index],
+                    _cell(section.title),
+                    _cell(section.message.block_name),
+                    section.message.severity,
+                    _cell(section.message.message),
+                    _cell(dumps(section.data).decode()),
+                ])
+
+    # El guardado comprime las hojas ya escritas en disco; fuera del event loop
+    await asyncio.to_thread(workbook.save, str(path))
+    logger.info(f"Exportación XLSX generada: {len(df)} contratos, {errors} errores")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modo aproximado (approximate=true) del motor de IA
+Compara el análisis exacto contra el muestreo estratificado sobre portafolios sintéticos
+
+Uso (desde backend/):
+    python -m benchmarks.bench_approximate --rows 100000 500000 --repeats 3
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.ai_intelligence_engine import get_intelligence_engine
+
+UBICACIONES = [f"Comuna {i}" for i in range(1, 17)] + ["Corregimiento San Cristóbal", "Corregimiento Altavista"]
+TIPOS_CONTRATO = ["Urgencia Manifiesta", "Obra Pública", "Interventoría", "Consultoría"]
+
+
+def build_portfolio(rows: int, seed: int = 7) -> pd.DataFrame:
+    """Portafolio sintético con estratos desbalanceados y ~5% de contratos atípicos"""
+    rng = np.random.default_rng(seed)
+    presupuesto = rng.lognormal(mean=15, sigma=0.6, size=rows)
+    ejecucion = rng.beta(5, 2, size=rows)
+    atipicos = rng.random(rows) < 0.05
+    ejecucion[atipicos] *= rng.uniform(1.3, 2.0, size=atipicos.sum())
+
+    return pd.DataFrame({
+        "presupuesto_aprobado": presupuesto,
+        "valor_ejecutado": presupuesto * ejecucion,
+        "porcentaje_avance_fisico": np.clip(rng.normal(70, 15, size=rows), 0, 100),
+        "fecha_fin_planificada": pd.Timestamp("2025-06-01") + pd.to_timedelta(rng.integers(0, 540, size=rows), unit="D"),
+        "ubicacion": rng.choice(UBICACIONES, size=rows, p=np.linspace(2, 1, len(UBICACIONES)) / np.linspace(2, 1, len(UBICACIONES)).sum()),
+        "tipo_contrato": rng.choice(TIPOS_CONTRATO, size=rows, p=[0.55, 0.25, 0.12, 0.08]),
+        "descripcion": rng.choice([
+            "Avance adecuado de las obras sin novedades relevantes",
+            "Retrasos por lluvias y problemas con proveedores de materiales",
+            "Excelente gestión del contratista y cumplimiento de hitos",
+        ], size=rows),
+    })
+
+
+async def timed(engine, df: pd.DataFrame, approximate: bool):
+    # Vaciar el cache del motor para medir el análisis completo
+    engine._analysis_cache.clear()
+    engine._stage_cache.clear()
+    start = time.perf_counter()
+    result = await engine.analyze_contract_data(df, approximate=approximate)
+    return time.perf_counter() - start, result
+
+
+async def main(rows_list, repeats):
+    engine = get_intelligence_engine()
+    print(f"Tamaño de muestra: {settings.APPROXIMATE_SAMPLE_SIZE}")
+    print(f"{'filas':>10} {'exacto (s)':>12} {'aprox (s)':>12} {'speedup':>8} "
+          f"{'tasa exacta':>12} {'tasa aprox':>12} {'IC95':>22} {'cubre':>6}")
+
+    for rows in rows_list:
+        df = build_portfolio(rows)
+        exact_times, approx_times = [], []
+        for _ in range(repeats):
+            t_exact, exact = await timed(engine, df, approximate=False)
+            t_approx, approx = await timed(engine, df, approximate=True)
+            exact_times.append(t_exact)
+            approx_times.append(t_approx)
+
+        exact_rate = len(exact.anomalies) / rows
+        estimate = approx.insights["approximation"]["estimaciones"]["tasa_anomalias"]
+        low, high = estimate["ic95"]
+        t_exact, t_approx = np.median(exact_times), np.median(approx_times)
+        print(f"{rows:>10} {t_exact:>12.3f} {t_approx:>12.3f} {t_exact / t_approx:>7.1f}x "
+              f"{exact_rate:>12.4f} {estimate['valor']:>12.4f} {f'[{low:.4f}, {high:.4f}]':>22} "
+              f"{'sí' if low <= exact_rate <= high else 'no':>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeats))
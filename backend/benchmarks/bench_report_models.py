@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark de construcción y serialización de modelos de informe (GeneratedReport)
+Mide, por sección, el costo de construir ReportSection/TechnicalMessage con validación,
+con model_construct y con la construcción confiable (trusted_*, más rápida que validar), y el costo de responder
+por la ruta de response_model de FastAPI frente a model_response (model_dump + orjson)
+
+Uso (desde backend/):
+    python -m benchmarks.bench_report_models --contracts 1000 --repeats 7
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.serialization import model_response
+from app.schemas.report import (
+    GeneratedReport,
+    ReportSection,
+    TechnicalMessage,
+    trusted_message,
+    trusted_report,
+    trusted_section,
+)
+
+# Secciones por informe: 2 base mejoradas + predictiva, anomalías, insights y recomendaciones
+SECTIONS_PER_REPORT = 6
+
+
+def section_values(index: int) -> dict:
+    """Valores con la forma de una sección generada por IntelligentReportService"""
+    return {
+        'title': '🧠 Insights Avanzados IA',
+        'data': {
+            'Eficiencia Global': f'{index % 100}.00%',
+            'Riesgo Financiero': '45.10%',
+            'Riesgo Temporal': '12.00%',
+            'Costo Final Estimado': f'${index * 1000:,.2f} COP',
+            'Score de Riesgo IA': '70.00%',
+            'Confianza del Análisis': '75.00%',
+        },
+        'block_name': 'Insights Avanzados IA',
+        'message': '🧠 INSIGHTS AVANZADOS DE IA\n\n' + 'Análisis profundo basado en múltiples algoritmos. ' * 8,
+        'severity': ('INFO', 'WARNING', 'CRITICAL')[index % 3],
+    }
+
+
+def build_validated(values: dict) -> ReportSection:
+    return ReportSection(
+        title=values['title'], data=values['data'],
+        message=TechnicalMessage(block_name=values['block_name'], message=values['message'], severity=values['severity'])
+    )
+
+
+def build_constructed(values: dict) -> ReportSection:
+    return ReportSection.model_construct(
+        title=values['title'], data=values['data'],
+        message=TechnicalMessage.model_construct(block_name=values['block_name'], message=values['message'],
+                                                 severity=values['severity'])
+    )
+
+
+def build_trusted(values: dict) -> ReportSection:
+    return trusted_section(
+        title=values['title'], data=values['data'],
+        message=trusted_message(block_name=values['block_name'], message=values['message'], severity=values['severity'])
+    )
+
+
+def median_time(func, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(contracts: int, repeats: int):
+    total = contracts * SECTIONS_PER_REPORT
+    values = [section_values(i) for i in range(total)]
+
+    print(f"Contratos: {contracts} ({total} secciones)")
+    print(f"{'construcción':<40} {'µs/sección':>12}")
+    timings = {}
+    for name, build in (('validada (ReportSection(...))', build_validated),
+                        ('model_construct', build_constructed),
+                        ('confiable (trusted_section)', build_trusted)):
+        timings[build] = median_time(lambda: [build(v) for v in values], repeats)
+        print(f"{name:<40} {timings[build] / total * 1e6:>12.2f}")
+    print(f"Speedup de la construcción: {timings[build_validated] / timings[build_trusted]:.1f}x")
+
+    sections = [build_trusted(v) for v in values]
+    reports = [
+        trusted_report(sections[i:i + SECTIONS_PER_REPORT])
+        for i in range(0, total, SECTIONS_PER_REPORT)
+    ]
+    assert [build_validated(v) for v in values[:SECTIONS_PER_REPORT]] == reports[0].sections, \
+        "La construcción confiable difiere de la validada"
+
+    field = create_model_field(name='response', type_=GeneratedReport, mode='serialization')
+
+    async def fastapi_path():
+        for report in reports:
+            content = await serialize_response(field=field, response_content=report)
+            JSONResponse(content).body
+
+    def fast_path():
+        for report in reports:
+            model_response(report).body
+
+    loop = asyncio.new_event_loop()
+    before = median_time(lambda: loop.run_until_complete(fastapi_path()), repeats)
+    after = median_time(fast_path, repeats)
+    expected = loop.run_until_complete(serialize_response(field=field, response_content=reports[0]))
+    assert orjson.loads(model_response(reports[0]).body) == expected, "Las dos rutas producen JSON distinto"
+    loop.close()
+
+    print(f"{'respuesta':<40} {'µs/sección':>12} {'µs/informe':>12}")
+    print(f"{'response_model (validar + serializar)':<40} {before / total * 1e6:>12.2f} {before / contracts * 1e6:>12.1f}")
+    print(f"{'model_response (model_dump + orjson)':<40} {after / total * 1e6:>12.2f} {after / contracts * 1e6:>12.1f}")
+    print(f"Speedup de la respuesta: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=1_000)
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+    main(args.contracts, args.repeats)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización de respuestas del motor de IA
+Compara la ruta por defecto de FastAPI (jsonable_encoder + json) contra FastJSONResponse (orjson)
+para la respuesta de un portafolio de N contratos, con los tipos NumPy que produce el motor
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization --contracts 10000 --repeats 5
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import FastJSONResponse
+from app.services.ai_intelligence_engine import AIAnalysisResult, SeverityLevel
+
+# Sin estos encoders la ruta por defecto falla con np.float32 / np.int64
+NUMPY_ENCODERS = {np.generic: lambda value: value.item(), np.ndarray: lambda value: value.tolist()}
+
+
+@dataclass
+class DictAIAnalysisResult:
+    """Misma forma que AIAnalysisResult antes de usar slots (solo para comparar memoria)"""
+    risk_score: float
+    confidence: float
+    predictions: Dict[str, Any]
+    anomalies: List[Dict[str, Any]]
+    recommendations: List[str]
+    severity: SeverityLevel
+    insights: Dict[str, Any]
+    processing_time: float
+    memory_usage: float
+    skipped_stages: List[str] = field(default_factory=list)
+    cached_stages: List[str] = field(default_factory=list)
+
+
+def build_result(rng: np.random.Generator, index: int) -> AIAnalysisResult:
+    """Resultado sintético de un contrato con los tipos NumPy que produce el motor"""
+    anomalies = [{
+        'index': np.int64(index),
+        'severity': 'CRITICAL',
+        'description': f'Anomalía detectada en fila {index + 1}',
+        'columns_affected': ['presupuesto_aprobado', 'valor_ejecutado'],
+        'values': {'presupuesto_aprobado': np.float64(rng.lognormal(15, 0.6)),
+                   'valor_ejecutado': np.float32(rng.lognormal(15, 0.6))},
+    }] if index % 20 == 0 else []
+    return AIAnalysisResult(
+        risk_score=np.float64(rng.random()),
+        confidence=np.float32(rng.random()),
+        predictions={'probabilidad_sobrecosto': np.float32(rng.random()),
+                     'probabilidad_retraso': np.float64(rng.random()),
+                     'importancia_variables': rng.random(4)},
+        anomalies=anomalies,
+        recommendations=['⏰ RIESGO DE RETRASO: Acelerar frentes de trabajo críticos'],
+        severity=SeverityLevel.WARNING,
+        insights={'performance_metrics': {'eficiencia_global': np.float64(rng.random()),
+                                          'contratos_evaluados': np.int64(1)}},
+        processing_time=0.01,
+        memory_usage=0.0,
+    )
+
+
+def build_response(contracts: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(7)
+    return {
+        'portfolio_id': 'bench',
+        'results': [build_result(rng, i).to_dict() for i in range(contracts)],
+    }
+
+
+def default_render(payload: Dict[str, Any], encoders=None) -> bytes:
+    """Ruta por defecto de FastAPI: jsonable_encoder y JSONResponse.render"""
+    return JSONResponse(content=None).render(jsonable_encoder(payload, custom_encoder=encoders or {}))
+
+
+def median_time(func, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def instance_size(obj: Any) -> int:
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main(contracts: int, repeats: int):
+    payload = build_response(contracts)
+    fast = FastJSONResponse(content=None)
+
+    try:
+        default_render(payload)
+        status = 'ok'
+    except (TypeError, ValueError) as e:
+        status = f'falla ({type(e).__name__}: {str(e)[:60]})'
+    print(f"Contratos: {contracts}")
+    print(f"Ruta por defecto sin encoders NumPy: {status}")
+
+    before = median_time(lambda: default_render(payload, NUMPY_ENCODERS), repeats)
+    after = median_time(lambda: fast.render(payload), repeats)
+    before_body = default_render(payload, NUMPY_ENCODERS)
+    after_body = fast.render(payload)
+    # orjson escribe np.float32 con su representación float32 más corta; comparar a esa precisión
+    as_float32 = lambda text: float(np.float32(text))
+    assert json.loads(before_body, parse_float=as_float32) == json.loads(after_body, parse_float=as_float32), \
+        "Las dos rutas producen JSON distinto"
+
+    print(f"{'ruta':<45} {'mediana (ms)':>14} {'bytes':>12}")
+    print(f"{'jsonable_encoder + json (encoders NumPy)':<45} {before * 1000:>14.1f} {len(before_body):>12}")
+    print(f"{'FastJSONResponse (orjson)':<45} {after * 1000:>14.1f} {len(after_body):>12}")
+    print(f"Speedup: {before / after:.1f}x")
+
+    rng = np.random.default_rng(7)
+    slotted = build_result(rng, 1)
+    plain = DictAIAnalysisResult(**{f.name: getattr(slotted, f.name) for f in fields(AIAnalysisResult)})
+    print(f"Tamaño por instancia (sin contenido anidado): slots={instance_size(slotted)} B, "
+          f"dict={instance_size(plain)} B")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    main(args.contracts, args.repeats)
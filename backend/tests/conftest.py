@@ -18,7 +18,7 @@ from sqlalchemy.sql import text
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.main import app
-from app.db.session import get_db, Base
+from app.db.session import get_db, get_db_read, Base
 from app.core.config import settings
 
 # --- URLs de Base de Datos ---
@@ -28,11 +28,14 @@ DB_PASSWORD = "password"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 DB_NAME_TEST = "informes_test_db"
+# Segunda BD que hace de réplica de lectura en los tests de enrutamiento (sin replicación real)
+DB_NAME_REPLICA_TEST = "informes_test_replica_db"
 
 # URL para la base de datos de mantenimiento (para crear/eliminar la BD de prueba)
 MAINTENANCE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/postgres"
 # URL para la base de datos de prueba
 TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME_TEST}"
+REPLICA_TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME_REPLICA_TEST}"
 
 
 # --- Motor y Sesión de Prueba ---
@@ -63,22 +66,26 @@ async def setup_test_database():
     engine_maintenance = create_async_engine(MAINTENANCE_URL, isolation_level="AUTOCOMMIT")
     
     async with engine_maintenance.connect() as conn:
-        # Forzar el cierre de conexiones existentes a la BD de prueba
-        await conn.execute(text(f"""
-            SELECT pg_terminate_backend(pg_stat_activity.pid)
-            FROM pg_stat_activity
-            WHERE pg_stat_activity.datname = '{DB_NAME_TEST}'
-              AND pid <> pg_backend_pid();
-        """))
-        # Eliminar la BD si existe y crearla de nuevo
-        await conn.execute(text(f"DROP DATABASE IF EXISTS {DB_NAME_TEST}"))
-        await conn.execute(text(f"CREATE DATABASE {DB_NAME_TEST}"))
+        for db_name in (DB_NAME_TEST, DB_NAME_REPLICA_TEST):
+            # Forzar el cierre de conexiones existentes a la BD de prueba
+            await conn.execute(text(f"""
+                SELECT pg_terminate_backend(pg_stat_activity.pid)
+                FROM pg_stat_activity
+                WHERE pg_stat_activity.datname = '{db_name}'
+                  AND pid <> pg_backend_pid();
+            """))
+            # Eliminar la BD si existe y crearla de nuevo
+            await conn.execute(text(f"DROP DATABASE IF EXISTS {db_name}"))
+            await conn.execute(text(f"CREATE DATABASE {db_name}"))
     
     await engine_maintenance.dispose()
 
-    # Crear todas las tablas en la nueva BD de prueba
-    async with engine_test.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Crear todas las tablas en las nuevas BD de prueba
+    engine_replica = create_async_engine(REPLICA_TEST_DATABASE_URL)
+    for engine in (engine_test, engine_replica):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    await engine_replica.dispose()
 
     yield  # Las pruebas se ejecutan aquí
 
@@ -86,6 +93,7 @@ async def setup_test_database():
     await engine_test.dispose()  # Cerrar todas las conexiones del pool
     async with engine_maintenance.connect() as conn:
         await conn.execute(text(f"DROP DATABASE IF EXISTS {DB_NAME_TEST}"))
+        await conn.execute(text(f"DROP DATABASE IF EXISTS {DB_NAME_REPLICA_TEST}"))
     
     await engine_maintenance.dispose()
 
@@ -103,6 +111,12 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
         await session.close()
 
 
+@pytest.fixture
+def replica_database_url() -> str:
+    """URL de la BD de prueba que hace de réplica de lectura (tests de enrutamiento)"""
+    return REPLICA_TEST_DATABASE_URL
+
+
 @pytest_asyncio.fixture(scope="function")
 async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     """
@@ -114,6 +128,7 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_read] = override_get_db
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
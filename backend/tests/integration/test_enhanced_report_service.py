@@ -0,0 +1,340 @@
+"""
+Test de integración para la persistencia de EnhancedReportService
+"""
+import asyncio
+import numpy as np
+import pytest
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession
+import uuid
+from app.db.models import Project, Report, ReportAnalytics, ReportSection
+from app.services.enhanced_report_service import EnhancedReportService, ProjectIdCache, project_ids
+
+
+CONTRACT = {
+    'presupuesto_aprobado': 1000000.0,
+    'valor_ejecutado': 1200000.0,
+    'porcentaje_avance_fisico': 40.0,
+    'fecha_fin_planificada': '2025-06-30',
+}
+
+
+class TestEnhancedReportService:
+    """Tests para generate_and_save_report"""
+
+    @pytest.mark.asyncio
+    async def test_report_is_saved_in_one_transaction(self, db_session):
+        """Test: proyecto, informe, secciones y analytics se confirman en un solo commit"""
+        # Arrange
+        commits = []
+        event.listen(db_session.sync_session, 'after_commit', lambda session: commits.append(1))
+        service = EnhancedReportService(db_session)
+
+        # Act
+        report = await service.generate_and_save_report(
+            CONTRACT, project_name='Hospital de Prueba', supervisor_name='Supervisor'
+        )
+
+        # Assert
+        project = (await db_session.execute(select(Project).where(Project.name == 'Hospital de Prueba'))).scalars().one()
+        stored = (await db_session.execute(select(Report).where(Report.project_id == project.id))).scalars().one()
+        sections = await db_session.scalar(
+            select(func.count()).select_from(ReportSection).where(ReportSection.report_id == stored.id)
+        )
+        analytics = (await db_session.execute(
+            select(ReportAnalytics).where(ReportAnalytics.report_id == stored.id)
+        )).scalars().one()
+        assert len(commits) == 1
+        assert sections == len(report.sections) > 0
+        assert analytics.report_id == stored.id
+        assert report.contract_type == stored.contract_type
+
+    @pytest.mark.asyncio
+    async def test_failure_leaves_nothing_persisted(self, db_session, monkeypatch):
+        """Test: si falla un paso, no queda ni el proyecto ni el informe a medias"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+        sections_before = await db_session.scalar(select(func.count()).select_from(ReportSection))
+
+        async def failing_analytics(report, contract_data):
+            raise RuntimeError('fallo en analytics')
+
+        monkeypatch.setattr(service, '_calculate_analytics', failing_analytics)
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await service.generate_and_save_report(CONTRACT, project_name='Proyecto Fallido')
+
+        # Assert
+        assert await db_session.scalar(select(func.count()).select_from(Project).where(Project.name == 'Proyecto Fallido')) == 0
+        assert await db_session.scalar(select(func.count()).select_from(ReportSection)) == sections_before
+        assert project_ids.get('Proyecto Fallido') is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('copy_drivers', [EnhancedReportService.COPY_DRIVERS, frozenset()],
+                             ids=['copy', 'executemany'])
+    async def test_bulk_save_writes_portfolio(self, db_session, monkeypatch, copy_drivers):
+        """Test: la persistencia masiva (COPY o executemany) guarda informes, secciones y analytics y retorna los IDs en orden"""
+        # Arrange
+        contracts = [
+            {**CONTRACT, 'presupuesto_aprobado': np.float64(1000000.0 + i), 'porcentaje_avance_fisico': np.int64(10 + i)}
+            for i in range(25)
+        ]
+        monkeypatch.setattr(EnhancedReportService, 'COPY_DRIVERS', copy_drivers)
+        service = EnhancedReportService(db_session)
+        inserts = []
+        engine = db_session.bind.sync_engine
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            inserts.append(statement.startswith('INSERT INTO reports '))
+
+        event.listen(engine, 'before_cursor_execute', capture)
+
+        # Act
+        try:
+            report_ids = await service.save_reports_bulk(contracts, project_name='Portafolio Masivo', chunk_size=10)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        # Assert
+        stored = {
+            report.id: report
+            for report in (await db_session.execute(select(Report).where(Report.id.in_(report_ids)))).scalars()
+        }
+        sections = await db_session.scalar(
+            select(func.count()).select_from(ReportSection).where(ReportSection.report_id.in_(report_ids))
+        )
+        analytics = await db_session.scalar(
+            select(func.count()).select_from(ReportAnalytics).where(ReportAnalytics.report_id.in_(report_ids))
+        )
+        assert len(report_ids) == len(set(report_ids)) == 25
+        assert len(stored) == 25
+        assert stored[report_ids[3]].presupuesto_aprobado == 1000003.0
+        assert stored[report_ids[3]].raw_data['porcentaje_avance_fisico'] == 13
+        assert stored[report_ids[0]].contract_type == 'Urgencia Manifiesta'
+        assert stored[report_ids[0]].created_at is not None
+        assert sections == sum(len(report.sections_data) for report in stored.values())
+        assert analytics == 25
+        # Sin COPY los informes se escriben con INSERT por lotes
+        assert any(inserts) == (not copy_drivers)
+
+    @pytest.mark.asyncio
+    async def test_bulk_save_with_known_project_is_one_transaction(self, db_session):
+        """Test: con el proyecto en caché, el primer bloque del COPY también queda en la transacción"""
+        # Arrange
+        name = f'Masivo {uuid.uuid4()}'
+        service = EnhancedReportService(db_session)
+        await service.generate_and_save_report(CONTRACT, project_name=name)
+
+        # Act
+        report_ids = await service.save_reports_bulk([CONTRACT] * 5, project_name=name, chunk_size=2)
+
+        # Assert
+        created = (await db_session.execute(select(Report.created_at).where(Report.id.in_(report_ids)))).scalars().all()
+        # now() es el inicio de la transacción: un solo valor si todos los bloques la comparten
+        assert len(created) == 5
+        assert len(set(created)) == 1
+
+    @pytest.mark.asyncio
+    async def test_find_reports_filters_in_sql(self, db_session):
+        """Test: find_reports filtra por campos subidos (indexados o no) y severidad de secciones"""
+        # Arrange
+        contracts = [
+            {**CONTRACT, 'ubicacion': 'Tunja', 'tipo_contrato': 'obra', 'frentes': 2},
+            {**CONTRACT, 'ubicacion': 'Tunja', 'tipo_contrato': 'interventoria', 'frentes': 3},
+            {**CONTRACT, 'ubicacion': 'Bogotá', 'tipo_contrato': 'obra', 'valor_ejecutado': 100000.0, 'frentes': 2},
+        ]
+        service = EnhancedReportService(db_session)
+        report_ids = await service.save_reports_bulk(contracts, project_name=f'Búsqueda {uuid.uuid4()}')
+        project_id = (await db_session.execute(select(Report.project_id).where(Report.id == report_ids[0]))).scalar_one()
+        stored = {
+            report.id: report
+            for report in (await db_session.execute(select(Report).where(Report.id.in_(report_ids)))).scalars()
+        }
+        critical = {
+            report_id for report_id, report in stored.items()
+            if any(section['message']['severity'] == 'CRITICAL' for section in report.sections_data)
+        }
+
+        async def found(**kwargs):
+            return {report.id for report in await service.find_reports(project_id=project_id, **kwargs)}
+
+        # Act / Assert
+        assert await found(filters={'ubicacion': 'Tunja'}) == set(report_ids[:2])
+        assert await found(filters={'ubicacion': 'Tunja', 'tipo_contrato': 'obra'}) == {report_ids[0]}
+        assert await found(filters={'frentes': 2}) == {report_ids[0], report_ids[2]}
+        assert await found(filters={'frentes': 2, 'tipo_contrato': 'obra'}, severity='CRITICAL') == \
+            {report_ids[0], report_ids[2]} & critical
+        assert await found(severity='CRITICAL') == critical
+        assert await found(filters={'ubicacion': 'Cali'}) == set()
+
+    @pytest.mark.asyncio
+    async def test_list_reports_paginates_with_cursor(self, db_session):
+        """Test: la paginación por cursor recorre todos los informes una vez, en orden, sin columnas pesadas"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+        report_ids = await service.save_reports_bulk([CONTRACT] * 7, project_name=f'Listado {uuid.uuid4()}')
+        project_id = (await db_session.execute(select(Report.project_id).where(Report.id == report_ids[0]))).scalar_one()
+
+        # Act
+        pages, cursor = [], None
+        while True:
+            items, cursor = await service.list_reports(project_id=project_id, cursor=cursor, limit=3)
+            pages.append(items)
+            if cursor is None:
+                break
+
+        # Assert
+        rows = [row for page in pages for row in page]
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert {row['id'] for row in rows} == set(report_ids)
+        assert [(row['created_at'], row['id']) for row in rows] == \
+            sorted(((row['created_at'], row['id']) for row in rows), reverse=True)
+        assert 'sections_data' not in rows[0] and 'raw_data' not in rows[0]
+        assert rows[0]['contract_type'] == 'Urgencia Manifiesta'
+
+    @pytest.mark.asyncio
+    async def test_list_reports_selects_fields(self, db_session):
+        """Test: fields limita las columnas (id y created_at siempre) y rechaza campos desconocidos"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+        report_ids = await service.save_reports_bulk([CONTRACT], project_name=f'Campos {uuid.uuid4()}')
+        project_id = (await db_session.execute(select(Report.project_id).where(Report.id == report_ids[0]))).scalar_one()
+
+        # Act
+        items, cursor = await service.list_reports(project_id=project_id, fields=['year', 'raw_data'])
+
+        # Assert
+        assert cursor is None
+        assert set(items[0]) == {'id', 'created_at', 'year', 'raw_data'}
+        assert items[0]['raw_data']['presupuesto_aprobado'] == CONTRACT['presupuesto_aprobado']
+        with pytest.raises(ValueError):
+            await service.list_reports(project_id=project_id, fields=['contraseña'])
+        with pytest.raises(ValueError):
+            await service.list_reports(project_id=project_id, cursor='no-es-un-cursor')
+
+    @pytest.mark.asyncio
+    async def test_project_names_are_normalized(self, db_session):
+        """Test: nombres que solo difieren en mayúsculas y espacios corresponden al mismo proyecto"""
+        # Arrange
+        suffix = uuid.uuid4()
+        service = EnhancedReportService(db_session)
+
+        # Act
+        await service.generate_and_save_report(CONTRACT, project_name=f'Hospital  Norte {suffix}')
+        await service.save_reports_bulk([CONTRACT] * 2, project_name=f' hospital norte {suffix} ')
+
+        # Assert
+        projects = (await db_session.execute(
+            select(Project.id, Project.name).where(Project.name.ilike(f'%{suffix}%'))
+        )).all()
+        assert [name for _, name in projects] == [f'Hospital  Norte {suffix}']
+        assert await db_session.scalar(
+            select(func.count()).select_from(Report).where(Report.project_id == projects[0].id)
+        ) == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_saves_create_one_project(self, db_session):
+        """Test: dos guardados simultáneos de un proyecto nuevo, en sesiones distintas, no lo duplican"""
+        # Arrange
+        name = f'Concurrente {uuid.uuid4()}'
+        other_session = AsyncSession(db_session.bind)
+
+        # Act
+        try:
+            await asyncio.gather(
+                EnhancedReportService(db_session).generate_and_save_report(CONTRACT, project_name=name),
+                EnhancedReportService(other_session).generate_and_save_report(CONTRACT, project_name=name),
+            )
+        finally:
+            await other_session.close()
+
+        # Assert
+        project_id = (await db_session.execute(select(Project.id).where(Project.name == name))).scalar_one()
+        assert await db_session.scalar(
+            select(func.count()).select_from(Report).where(Report.project_id == project_id)
+        ) == 2
+        assert project_ids.get(name) == project_id
+
+    @pytest.mark.asyncio
+    async def test_known_project_costs_no_queries(self, db_session):
+        """Test: con el ID del proyecto en caché, guardar otro informe no consulta la tabla projects"""
+        # Arrange
+        name = f'En caché {uuid.uuid4()}'
+        service = EnhancedReportService(db_session)
+        await service.generate_and_save_report(CONTRACT, project_name=name)
+        statements = []
+        engine = db_session.bind.sync_engine
+        capture = lambda conn, cursor, statement, *args: statements.append(statement)
+
+        # Act
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            await service.generate_and_save_report(CONTRACT, project_name=name)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        # Assert
+        assert statements
+        assert not [statement for statement in statements if 'projects' in statement]
+
+    @pytest.mark.asyncio
+    async def test_name_variants_share_cache_entry(self, db_session):
+        """Test: una variante del nombre (espacios, mayúsculas) usa el ID en caché sin consultar projects"""
+        # Arrange
+        suffix = uuid.uuid4()
+        service = EnhancedReportService(db_session)
+        await service.generate_and_save_report(CONTRACT, project_name=f'Obra A {suffix}')
+        statements = []
+        engine = db_session.bind.sync_engine
+        capture = lambda conn, cursor, statement, *args: statements.append(statement)
+
+        # Act
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            await service.generate_and_save_report(CONTRACT, project_name=f'  obra\ta {suffix} ')
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        # Assert
+        assert not [statement for statement in statements if 'projects' in statement]
+        assert project_ids.get(f'OBRA A {suffix}') == project_ids.get(f'Obra A {suffix}') is not None
+        assert await db_session.scalar(
+            select(func.count()).select_from(Project).where(Project.name.like(f'%{suffix}%'))
+        ) == 1
+
+    def test_project_id_cache_is_bounded(self):
+        """Test: la caché de IDs de proyecto descarta el nombre usado hace más tiempo"""
+        # Arrange
+        cache = ProjectIdCache(max_size=2)
+        first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        cache.put('A', first)
+        cache.put('B', second)
+
+        # Act
+        cache.get('A')
+        cache.put('C', third)
+
+        # Assert
+        assert cache.get('A') == first
+        assert cache.get('B') is None
+        assert cache.get('C') == third
+
+    @pytest.mark.asyncio
+    async def test_entity_listings_skip_document_columns(self, db_session):
+        """Test: get_project_reports no carga sections_data ni raw_data"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+        report_ids = await service.save_reports_bulk([CONTRACT], project_name=f'Livianos {uuid.uuid4()}')
+        project_id = (await db_session.execute(select(Report.project_id).where(Report.id == report_ids[0]))).scalar_one()
+
+        # Act
+        reports = await service.get_project_reports(project_id)
+
+        # Assert
+        assert [report.id for report in reports] == report_ids
+        assert {'sections_data', 'raw_data'} <= inspect(reports[0]).unloaded
+        assert reports[0].presupuesto_aprobado == CONTRACT['presupuesto_aprobado']
+        with pytest.raises(InvalidRequestError):
+            reports[0].raw_data
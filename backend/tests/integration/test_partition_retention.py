@@ -0,0 +1,93 @@
+"""
+Test de integración para la retención de particiones mensuales (app/db/partitions.py)
+"""
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.exc import IntegrityError
+import uuid
+from app.db.models import Project, ProjectRollup, Report, ReportAnalytics, ReportSection
+from app.db.partitions import add_months, apply_retention, ensure_partitions, list_partitions, months_ago, partition_name
+
+
+class TestPartitionRetention:
+    """Tests para apply_retention"""
+
+    @pytest.mark.asyncio
+    async def test_expired_month_is_archived_and_retired(self, db_session, tmp_path):
+        """Test: un mes fuera de la retención queda en Parquet y sale de la base de datos con sus analytics"""
+        # Arrange
+        expired = add_months(months_ago(12), -2)
+        await db_session.run_sync(lambda session: ensure_partitions(session.connection(), first_month=expired))
+        project_id, report_id = uuid.uuid4(), uuid.uuid4()
+        created_at = expired.replace(day=15)
+        db_session.add(Project(id=project_id, name=f'Retención {project_id}'))
+        await db_session.flush()
+        db_session.add_all([
+            Report(id=report_id, project_id=project_id, created_at=created_at, sections_data=[],
+                   raw_data={'ubicacion': 'Medellín'}),
+            ReportSection(report_id=report_id, report_created_at=created_at, title='Presupuesto', severity='CRITICAL'),
+            ReportAnalytics(report_id=report_id, report_created_at=created_at, risk_score=0.7),
+        ])
+        await db_session.commit()
+        reports_partition = partition_name('reports', expired)
+
+        # Act
+        retired = await apply_retention(db_session, retention_months=12, archive_dir=str(tmp_path))
+
+        # Assert
+        archived = pq.read_table(tmp_path / 'reports' / f'{reports_partition}.parquet').to_pylist()
+        sections = pq.read_table(tmp_path / 'report_sections' / f"{partition_name('report_sections', expired)}.parquet")
+        analytics = pq.read_table(tmp_path / 'report_analytics' / f"{partition_name('report_analytics', expired)}.parquet")
+        partitions = await db_session.run_sync(lambda session: list_partitions(session.connection(), 'reports'))
+        assert reports_partition in retired
+        assert [row['id'] for row in archived] == [str(report_id)]
+        assert archived[0]['raw_data'] == '{"ubicacion":"Medellín"}'
+        assert archived[0]['created_at'] == created_at
+        assert sections.num_rows == analytics.num_rows == 1
+        assert expired not in partitions
+        assert months_ago(1) in partitions
+        assert await db_session.scalar(select(func.count()).select_from(Report).where(Report.id == report_id)) == 0
+        assert await db_session.scalar(
+            select(func.count()).select_from(ReportAnalytics).where(ReportAnalytics.report_id == report_id)
+        ) == 0
+        # Los rollups se reconstruyen con los informes que quedan en línea
+        assert await db_session.get(ProjectRollup, project_id) is None
+
+    @pytest.mark.asyncio
+    async def test_child_rows_reference_their_report(self, db_session):
+        """Test: secciones y analytics exigen un informe existente y se borran con él"""
+        # Arrange
+        report_id = uuid.uuid4()
+        db_session.add(Report(id=report_id, sections_data=[]))
+        db_session.add_all([
+            ReportSection(report_id=report_id, title='Presupuesto', severity='INFO'),
+            ReportAnalytics(report_id=report_id, risk_score=0.1),
+        ])
+        await db_session.commit()
+        report_created_at = await db_session.scalar(select(Report.created_at).where(Report.id == report_id))
+
+        # Act
+        db_session.add(ReportSection(report_id=uuid.uuid4(), title='Huérfana'))
+        with pytest.raises(IntegrityError):
+            await db_session.commit()
+        await db_session.rollback()
+        await db_session.execute(delete(Report).where(Report.id == report_id))
+        await db_session.commit()
+
+        # Assert
+        for model in (ReportSection, ReportAnalytics):
+            assert await db_session.scalar(
+                select(func.count()).select_from(model).where(model.report_created_at == report_created_at)
+            ) == 0
+
+    @pytest.mark.asyncio
+    async def test_retention_disabled(self, db_session, tmp_path):
+        """Test: con retención 0 no se retira ninguna partición"""
+        # Act
+        retired = await apply_retention(db_session, retention_months=0, archive_dir=str(tmp_path))
+
+        # Assert
+        assert retired == []
+        assert not any(tmp_path.iterdir())
+        assert await db_session.scalar(text("SELECT count(*) FROM pg_inherits WHERE inhparent = 'reports'::regclass")) > 0
@@ -0,0 +1,112 @@
+"""
+Test de integración para los rollups por proyecto (app/db/rollups.py)
+"""
+import pytest
+from sqlalchemy import delete, select
+import uuid
+from app.db.models import Project, ProjectRollup, Report, ReportAnalytics
+from app.db.rollups import rebuild_project_rollups, rollup_summary
+from app.services.enhanced_report_service import EnhancedReportService
+
+
+CONTRACT = {
+    'presupuesto_aprobado': 1000000.0,
+    'valor_ejecutado': 1200000.0,
+    'porcentaje_avance_fisico': 40.0,
+    'fecha_fin_planificada': '2025-06-30',
+}
+
+
+async def _project_id(db_session, name):
+    return await db_session.scalar(select(Project.id).where(Project.name == name))
+
+
+async def _summary(db_session, project_id):
+    rollup = await db_session.get(ProjectRollup, project_id, populate_existing=True)
+    if rollup is None:
+        return None
+    summary = rollup_summary(rollup)
+    summary.pop('updated_at')
+    return summary
+
+
+class TestProjectRollups:
+    """Tests para el mantenimiento incremental y la reconstrucción de project_rollups"""
+
+    @pytest.mark.asyncio
+    async def test_incremental_rollup_matches_rebuild(self, db_session):
+        """Test: los guardados individuales y masivos dejan el mismo rollup que la reconstrucción"""
+        # Arrange
+        name = f'Rollup {uuid.uuid4()}'
+        service = EnhancedReportService(db_session)
+        await service.generate_and_save_report(CONTRACT, project_name=name)
+        await service.generate_and_save_report(
+            {**CONTRACT, 'valor_ejecutado': 300000.0, 'porcentaje_avance_fisico': 90.0}, project_name=name
+        )
+        bulk_ids = await service.save_reports_bulk(
+            [{**CONTRACT, 'valor_ejecutado': 500000.0 + i * 100000} for i in range(5)],
+            project_name=name, chunk_size=2
+        )
+        project_id = await _project_id(db_session, name)
+
+        # Act
+        incremental = await _summary(db_session, project_id)
+        await rebuild_project_rollups(db_session, project_id)
+        await db_session.commit()
+        rebuilt = await _summary(db_session, project_id)
+
+        # Assert
+        assert incremental == rebuilt
+        assert incremental['report_count'] == 7
+        assert incremental['latest_report_id'] == max(bulk_ids)
+        assert incremental['latest_execution_pct'] == pytest.approx(100 * await db_session.scalar(
+            select(ReportAnalytics.budget_efficiency).where(ReportAnalytics.report_id == max(bulk_ids))
+        ))
+        assert incremental['worst_severity'] in ('INFO', 'WARNING', 'CRITICAL')
+        assert 0 <= incremental['average_risk_score'] <= 1
+
+    @pytest.mark.asyncio
+    async def test_failed_save_leaves_rollup_untouched(self, db_session, monkeypatch):
+        """Test: el rollup se escribe en la transacción del informe; si ésta falla no cambia"""
+        # Arrange
+        name = f'Rollup {uuid.uuid4()}'
+        service = EnhancedReportService(db_session)
+        await service.generate_and_save_report(CONTRACT, project_name=name)
+        project_id = await _project_id(db_session, name)
+        before = await _summary(db_session, project_id)
+
+        async def failing_analytics(report, contract_data):
+            raise RuntimeError('fallo en analytics')
+
+        monkeypatch.setattr(service, '_calculate_analytics', failing_analytics)
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await service.generate_and_save_report(CONTRACT, project_id=project_id)
+
+        # Assert
+        assert await _summary(db_session, project_id) == before
+        assert before['report_count'] == 1
+
+    @pytest.mark.asyncio
+    async def test_rebuild_backfills_missing_rollup(self, db_session):
+        """Test: la reconstrucción crea el rollup de un proyecto con informes anteriores a la tabla"""
+        # Arrange
+        name = f'Rollup {uuid.uuid4()}'
+        service = EnhancedReportService(db_session)
+        await service.save_reports_bulk([CONTRACT] * 3, project_name=name)
+        project_id = await _project_id(db_session, name)
+        await db_session.execute(delete(ProjectRollup).where(ProjectRollup.project_id == project_id))
+        await db_session.commit()
+
+        # Act
+        written = await rebuild_project_rollups(db_session, project_id)
+        await db_session.commit()
+
+        # Assert
+        summary = await _summary(db_session, project_id)
+        assert written == 1
+        assert summary['report_count'] == 3
+        assert summary['latest_report_id'] in set(
+            (await db_session.execute(select(Report.id).where(Report.project_id == project_id))).scalars()
+        )
@@ -0,0 +1,172 @@
+"""
+Test de regresión de planes de consulta: las consultas de EnhancedReportService
+deben poder resolverse con los índices de app/db/models.py (migraciones a7c4e2f91b3d, b3e8d5a2c619 y e2b7c9a4f183)
+y consultar solo las particiones mensuales necesarias (migración d8a2f6c4b917)
+"""
+import uuid
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import event, text
+from app.db.models import Project
+from app.db.partitions import add_months, ensure_partitions, month_start, months_ago, partition_name
+from app.services.enhanced_report_service import EnhancedReportService, encode_cursor
+
+
+async def _query_plans(db_session, call):
+    """
+    Ejecutar `call` capturando sus SELECT y devolver el EXPLAIN de cada uno.
+    Con enable_seqscan desactivado el planificador solo recurre a un scan secuencial
+    si no hay un índice utilizable, así el resultado no depende del tamaño de las tablas.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    engine = db_session.bind.sync_engine
+    await db_session.execute(text('SET LOCAL enable_seqscan = off'))
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        await call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    connection = await (await db_session.connection()).get_raw_connection()
+    plans = []
+    for statement, parameters in statements:
+        rows = await connection.driver_connection.fetch(f'EXPLAIN {statement}', *parameters)
+        plans.append('\n'.join(row[0] for row in rows))
+    await db_session.rollback()
+    return plans
+
+
+class TestQueryPlans:
+    """Tests de los planes de las consultas de informes"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('method, argument, index', [
+        ('get_reports_by_user', uuid.uuid4(), 'ix_reports_created_by_created_at'),
+        ('get_project_reports', uuid.uuid4(), 'ix_reports_project_id_created_at'),
+        ('get_section_severity_counts', uuid.uuid4(), 'ix_report_sections_report_id_severity'),
+        ('get_report_version', uuid.uuid4(), 'ix_reports_id_version'),
+    ])
+    async def test_query_uses_index(self, db_session, method, argument, index):
+        """Test: la consulta usa su índice y no recorre la tabla completa"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+
+        # Act
+        plans = await _query_plans(db_session, lambda: getattr(service, method)(argument))
+
+        # Assert
+        assert plans
+        assert index in plans[0]
+        assert 'Seq Scan' not in plans[0]
+
+    @pytest.mark.asyncio
+    async def test_project_lookup_uses_name_key(self, db_session):
+        """Test: un proyecto existente que no está en caché se busca por el índice de nombre normalizado"""
+        # Arrange
+        name = f'Hospital {uuid.uuid4()}'
+        db_session.add(Project(name=name))
+        await db_session.commit()
+        service = EnhancedReportService(db_session)
+
+        # Act
+        plans = await _query_plans(db_session, lambda: service._get_or_create_project(f'  {name.upper()} '))
+
+        # Assert
+        assert plans
+        assert 'ix_projects_name_key' in plans[0]
+        assert 'Seq Scan' not in plans[0]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('kwargs, index', [
+        ({'filters': {'ubicacion': 'Bogotá'}}, 'ix_reports_raw_data_ubicacion'),
+        ({'filters': {'tipo_contrato': 'obra'}}, 'ix_reports_raw_data_tipo_contrato'),
+        ({'filters': {'municipio': 'Tunja'}}, 'ix_reports_raw_data'),
+        ({'severity': 'CRITICAL'}, 'ix_reports_sections_data'),
+    ])
+    async def test_find_reports_uses_jsonb_index(self, db_session, kwargs, index):
+        """Test: los filtros sobre los documentos JSONB se resuelven con sus índices (migración b3e8d5a2c619)"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+
+        # Act
+        plans = await _query_plans(db_session, lambda: service.find_reports(**kwargs))
+
+        # Assert
+        assert plans
+        assert index in plans[0]
+        assert 'Seq Scan' not in plans[0]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('scope, index', [
+        ('user_id', 'ix_reports_created_by_created_at'),
+        ('project_id', 'ix_reports_project_id_created_at'),
+    ])
+    async def test_list_reports_page_is_index_range(self, db_session, scope, index):
+        """Test: una página intermedia del listado es un rango del índice, sin ordenar ni saltar filas"""
+        # Arrange
+        service = EnhancedReportService(db_session)
+        cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+
+        # Act
+        plans = await _query_plans(db_session, lambda: service.list_reports(**{scope: uuid.uuid4()}, cursor=cursor))
+
+        # Assert
+        assert plans
+        assert index in plans[0]
+        # La posición del cursor acota el rango del índice (no es un filtro posterior)
+        assert 'ROW(created_at, id) <' in next(line for line in plans[0].splitlines() if 'Index Cond' in line)
+        assert 'Sort' not in plans[0]
+        assert 'Seq Scan' not in plans[0]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('method, table', [
+        ('get_report_by_id', 'reports'),
+        ('get_report_version', 'reports'),
+        ('get_section_severity_counts', 'report_sections'),
+    ])
+    async def test_lookup_by_id_prunes_partitions(self, db_session, method, table):
+        """Test: una búsqueda por id con la fecha de creación del informe solo consulta la partición de su mes"""
+        # Arrange
+        await db_session.run_sync(lambda session: ensure_partitions(session.connection(), first_month=months_ago(4)))
+        await db_session.commit()
+        service = EnhancedReportService(db_session)
+        old_partition = partition_name(table, months_ago(4))
+        current_partition = partition_name(table, month_start())
+
+        # Act
+        pruned = await _query_plans(
+            db_session, lambda: getattr(service, method)(uuid.uuid4(), datetime.now(timezone.utc)))
+        unpruned = await _query_plans(db_session, lambda: getattr(service, method)(uuid.uuid4()))
+
+        # Assert
+        assert current_partition in pruned[0]
+        assert old_partition not in pruned[0]
+        assert old_partition in unpruned[0]
+        assert 'Seq Scan' not in pruned[0]
+
+    @pytest.mark.asyncio
+    async def test_recent_months_prune_partitions(self, db_session):
+        """Test: el listado de los últimos meses y las páginas por cursor solo consultan las particiones de su rango"""
+        # Arrange
+        await db_session.run_sync(lambda session: ensure_partitions(session.connection(), first_month=months_ago(4)))
+        await db_session.commit()
+        service = EnhancedReportService(db_session)
+        old_partition = partition_name('reports', months_ago(4))
+        current_partition = partition_name('reports', month_start())
+        next_partition = partition_name('reports', add_months(month_start(), 1))
+        cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+
+        # Act
+        recent = await _query_plans(db_session, lambda: service.list_reports(user_id=uuid.uuid4(), since=months_ago(2)))
+        page = await _query_plans(db_session, lambda: service.list_reports(user_id=uuid.uuid4(), cursor=cursor))
+
+        # Assert
+        assert current_partition in recent[0]
+        assert old_partition not in recent[0]
+        assert old_partition in page[0]
+        assert next_partition not in page[0]
@@ -0,0 +1,92 @@
+"""
+Test de integración del enrutamiento de lecturas a réplicas con dos bases de datos
+locales: la de prueba hace de principal y una segunda de réplica (sin replicación
+real, así se distingue de dónde lee cada consulta)
+"""
+import uuid
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.models import Project
+from app.db.session import ReadRouter, Replica
+from app.services.enhanced_report_service import EnhancedReportService
+
+
+CONTRACT = {
+    'presupuesto_aprobado': 1000000.0,
+    'valor_ejecutado': 500000.0,
+    'porcentaje_avance_fisico': 50.0,
+    'fecha_fin_planificada': '2025-06-30',
+}
+
+
+@pytest_asyncio.fixture
+async def replica(replica_database_url):
+    replica = Replica(replica_database_url, max_lag=5, lag_check_interval=0)
+    yield replica
+    await replica.engine.dispose()
+
+
+@pytest.fixture
+def router(replica, db_session):
+    return ReadRouter([replica], async_sessionmaker(db_session.bind, class_=AsyncSession, expire_on_commit=False))
+
+
+class TestReadRouting:
+    """Tests para ReadRouter y Replica contra PostgreSQL"""
+
+    @pytest.mark.asyncio
+    async def test_reads_go_to_replica_and_writes_to_primary(self, router, db_session):
+        """Test: el servicio escribe en la principal y sus listados leen de la réplica"""
+        # Arrange
+        # El mismo proyecto en ambas BD; el informe se escribirá solo en la principal
+        project_id = uuid.uuid4()
+        async with (await router.sessionmaker())() as read_db:
+            read_db.add(Project(id=project_id, name=f'Proyecto {project_id}'))
+            await read_db.commit()
+        db_session.add(Project(id=project_id, name=f'Proyecto {project_id}'))
+        await db_session.commit()
+
+        # Act
+        async with (await router.sessionmaker())() as read_db:
+            service = EnhancedReportService(db_session, read_db=read_db)
+            await service.generate_and_save_report(CONTRACT, project_id=project_id)
+            replica_reports = await service.get_project_reports(project_id)
+            primary_reports = await EnhancedReportService(db_session).get_project_reports(project_id)
+
+        # Assert
+        assert replica_reports == []
+        assert len(primary_reports) == 1
+        assert router.replica_reads == 2
+        assert router.fallbacks == 0
+        assert router.replicas[0].lag == 0.0
+
+    @pytest.mark.asyncio
+    async def test_lagging_replica_falls_back_to_primary(self, router, replica, db_session):
+        """Test: con retraso mayor al permitido las lecturas van a la principal"""
+        # Arrange
+        replica.max_lag = -1.0
+
+        # Act
+        sessions = await router.sessionmaker()
+
+        # Assert
+        assert sessions is router.primary
+        assert router.fallbacks == 1
+        assert router.stats()['replicas'][0]['lag_seconds'] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_unreachable_replica_falls_back_to_primary(self, replica_database_url, db_session):
+        """Test: una réplica inalcanzable no se usa y no interrumpe las lecturas"""
+        # Arrange
+        unreachable = Replica(replica_database_url.rsplit('/', 1)[0] + '/bd_inexistente', lag_check_interval=1)
+        router = ReadRouter([unreachable], async_sessionmaker(db_session.bind, class_=AsyncSession))
+
+        # Act
+        sessions = await router.sessionmaker()
+        await unreachable.engine.dispose()
+
+        # Assert
+        assert sessions is router.primary
+        assert unreachable.lag is None
+        assert unreachable.monitor.failures == 1
@@ -4,6 +4,9 @@ Tests de integración para los endpoints de reportes
 import pytest
 from httpx import AsyncClient
 import io
+import json
+import uuid
+from app.db.models import Project, ProjectRollup, Report
 
 class TestReportsAPI:
     """Tests de integración para la API de reportes"""
@@ -41,6 +44,35 @@ class TestReportsAPI:
         assert "sections" in data
         assert len(data["sections"]) > 0
     
+    @pytest.mark.asyncio
+    async def test_generate_report_conditional_request(self, client: AsyncClient):
+        """Test: con If-None-Match coincidente se responde 304 sin cuerpo"""
+        # Arrange
+        csv_content = b"presupuesto_aprobado,valor_ejecutado,fecha_fin_planificada,porcentaje_avance_fisico\n2000000.0,1500000.0,2025-12-31,75.0"
+        
+        # Act
+        first = await client.post("/api/v1/reports/generate", files={"file": ("test.csv", csv_content, "text/csv")})
+        etag = first.headers["etag"]
+        cached = await client.post(
+            "/api/v1/reports/generate",
+            files={"file": ("test.csv", csv_content, "text/csv")},
+            headers={"If-None-Match": etag}
+        )
+        changed = await client.post(
+            "/api/v1/reports/generate",
+            files={"file": ("test.csv", csv_content.replace(b"75.0", b"80.0"), "text/csv")},
+            headers={"If-None-Match": etag}
+        )
+        
+        # Assert
+        assert first.status_code == 200
+        assert etag.startswith('W/"')
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert cached.content == b""
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+    
     @pytest.mark.asyncio
     async def test_generate_report_invalid_file_type(self, client: AsyncClient):
         """Test: archivo con tipo no válido debe fallar"""
@@ -66,3 +98,112 @@ class TestReportsAPI:
         data = response.json()
         assert "detail" in data
         assert "soportado" in data["detail"].lower()
+    
+    @pytest.mark.asyncio
+    async def test_batch_reports_stream_ndjson(self, client: AsyncClient):
+        """Test: el endpoint batch envía una línea por contrato y reporta errores en línea"""
+        # Arrange
+        csv_content = """numero_contrato,presupuesto_aprobado,valor_ejecutado,fecha_fin_planificada,porcentaje_avance_fisico
+C-1,2000000.0,1500000.0,2025-12-31,75.0
+C-2,1000000.0,1200000.0,2025-10-31,40.0
+C-3,no-numerico,1200000.0,2025-10-31,40.0"""
+        
+        files = {
+            "file": ("test.csv", io.BytesIO(csv_content.encode()), "text/csv")
+        }
+        
+        # Act
+        response = await client.post("/api/v1/reports/batch", files=files)
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["type"] for line in lines] == ["report", "report", "error", "summary"]
+        assert [line.get("contract_key") for line in lines[:3]] == ["C-1", "C-2", "C-3"]
+        assert len(lines[0]["report"]["sections"]) > 0
+        assert lines[-1] == {"type": "summary", "total_contratos": 3, "reports": 2, "errors": 1}
+    
+    @pytest.mark.asyncio
+    async def test_stored_report_etag(self, client: AsyncClient, db_session):
+        """Test: un informe guardado lleva ETag y responde 304 si no cambió"""
+        # Arrange
+        report_id = uuid.uuid4()
+        report = Report(
+            id=report_id,
+            sections_data=[{
+                "title": "Análisis Presupuestal",
+                "data": {"Porcentaje de Ejecución": "75.00%"},
+                "message": {"block_name": "Análisis Presupuestal", "message": "Ejecución presupuestal al 75.00%.", "severity": "INFO"}
+            }]
+        )
+        db_session.add(report)
+        await db_session.commit()
+        
+        # Act
+        first = await client.get(f"/api/v1/reports/stored/{report_id}")
+        cached = await client.get(f"/api/v1/reports/stored/{report_id}", headers={"If-None-Match": first.headers["etag"]})
+        missing = await client.get(f"/api/v1/reports/stored/{uuid.uuid4()}")
+        created_at = {"created_at": report.created_at.isoformat()}
+        by_month = await client.get(f"/api/v1/reports/stored/{report_id}", params=created_at)
+        other_month = await client.get(f"/api/v1/reports/stored/{report_id}",
+                                       params={"created_at": "2001-01-15T00:00:00+00:00"})
+        
+        # Assert
+        assert first.status_code == 200
+        assert first.json()["sections"][0]["title"] == "Análisis Presupuestal"
+        assert cached.status_code == 304
+        assert missing.status_code == 404
+        assert by_month.status_code == 200
+        assert by_month.headers["etag"] == first.headers["etag"]
+        assert other_month.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_list_stored_reports_paginates(self, client: AsyncClient, db_session):
+        """Test: el listado de informes se recorre por cursor y devuelve solo los campos pedidos"""
+        # Arrange
+        project_id = uuid.uuid4()
+        report_ids = {uuid.uuid4() for _ in range(3)}
+        db_session.add(Project(id=project_id, name=f"Listado API {project_id}"))
+        await db_session.flush()
+        db_session.add_all([Report(id=report_id, project_id=project_id, sections_data=[]) for report_id in report_ids])
+        await db_session.commit()
+        url = f"/api/v1/reports/stored?project_id={project_id}&limit=2&fields=year"
+        
+        # Act
+        first = await client.get(url)
+        second = await client.get(f"{url}&cursor={first.json()['next_cursor']}")
+        unscoped = await client.get("/api/v1/reports/stored")
+        unknown_field = await client.get(f"/api/v1/reports/stored?project_id={project_id}&fields=clave")
+        
+        # Assert
+        assert first.status_code == 200
+        assert len(first.json()["items"]) == 2
+        assert set(first.json()["items"][0]) == {"id", "created_at", "year"}
+        assert second.json()["next_cursor"] is None
+        assert len(second.json()["items"]) == 1
+        assert {item["id"] for item in first.json()["items"] + second.json()["items"]} == {str(i) for i in report_ids}
+        assert unscoped.status_code == 400
+        assert unknown_field.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_project_rollup(self, client: AsyncClient, db_session):
+        """Test: el resumen del proyecto se sirve desde project_rollups; sin informes, 404"""
+        # Arrange
+        project_id = uuid.uuid4()
+        db_session.add(Project(id=project_id, name=f"Resumen API {project_id}"))
+        await db_session.flush()
+        db_session.add(ProjectRollup(project_id=project_id, report_count=4, worst_severity_rank=2,
+                                     risk_score_sum=1.2, risk_score_count=4))
+        await db_session.commit()
+        
+        # Act
+        response = await client.get(f"/api/v1/reports/projects/{project_id}/rollup")
+        missing = await client.get(f"/api/v1/reports/projects/{uuid.uuid4()}/rollup")
+        
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["report_count"] == 4
+        assert response.json()["worst_severity"] == "CRITICAL"
+        assert response.json()["average_risk_score"] == pytest.approx(0.3)
+        assert missing.status_code == 404
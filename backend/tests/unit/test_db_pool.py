@@ -0,0 +1,203 @@
+"""
+Test unitario para el pool de conexiones instrumentado, las opciones del motor y el enrutamiento de lecturas
+"""
+import sqlite3
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+from app.core.config import settings
+from app.db import pool as db_pool, session as db_session_module
+from app.db.pool import InstrumentedPool, PoolMonitor
+from app.db.session import ReadRouter, Replica, engine_options, get_db_optional
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    """Monitor nuevo por test (InstrumentedPool registra en app.db.pool.pool_monitor)"""
+    monitor = PoolMonitor(retry_interval=60)
+    monkeypatch.setattr(db_pool, 'pool_monitor', monitor)
+    monkeypatch.setattr(db_session_module, 'pool_monitor', monitor)
+    return monitor
+
+
+class TestEngineOptions:
+    """Tests para las opciones del motor tomadas de Settings"""
+
+    def test_postgres_uses_instrumented_pool_and_statement_cache(self):
+        """Test: PostgreSQL usa el pool instrumentado con los tamaños y la cache de sentencias configurados"""
+        # Act
+        options = engine_options('postgresql+asyncpg://postgres@localhost/informes_db')
+
+        # Assert
+        assert options['poolclass'] is InstrumentedPool
+        assert options['pool_size'] == settings.DB_POOL_SIZE
+        assert options['max_overflow'] == settings.DB_MAX_OVERFLOW
+        assert options['pool_recycle'] == settings.DB_POOL_RECYCLE
+        assert options['pool_pre_ping'] == settings.DB_POOL_PRE_PING
+        assert options['connect_args'] == {'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE}
+        assert options['echo'] is False
+
+    def test_statement_cache_disabled_for_pgbouncer(self, monkeypatch):
+        """Test: con DB_STATEMENT_CACHE_SIZE=0 se desactivan ambas caches de asyncpg"""
+        # Arrange
+        monkeypatch.setattr(settings, 'DB_STATEMENT_CACHE_SIZE', 0)
+
+        # Act
+        options = engine_options('postgresql+asyncpg://postgres@localhost/informes_db')
+
+        # Assert
+        assert options['connect_args'] == {'prepared_statement_cache_size': 0, 'statement_cache_size': 0}
+
+    def test_other_dialects_keep_their_pool(self):
+        """Test: dialectos sin pool de conexiones (SQLite) no reciben opciones de pool"""
+        assert engine_options('sqlite+aiosqlite:///:memory:') == {'echo': settings.DB_ECHO}
+
+
+class TestInstrumentedPool:
+    """Tests para las métricas de checkout y la disponibilidad"""
+
+    @pytest.mark.asyncio
+    async def test_checkout_wait_and_saturation(self, monitor):
+        """Test: cada checkout registra su espera y la saturación refleja las conexiones en uso"""
+        # Arrange
+        pool = InstrumentedPool(lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=1, timeout=0.05)
+
+        # Act
+        first = await greenlet_spawn(pool.connect)
+        second = await greenlet_spawn(pool.connect)
+        with pytest.raises(exc.TimeoutError):
+            await greenlet_spawn(pool.connect)
+        stats = monitor.stats(pool)
+        first.close()
+        second.close()
+
+        # Assert
+        assert stats['checkouts'] == 2
+        assert stats['timeouts'] == 1
+        assert stats['checked_out'] == 2
+        assert stats['saturation'] == 1.0
+        assert stats['wait_ms']['max'] >= stats['wait_ms']['avg'] > 0
+        assert monitor.available()
+        assert monitor.stats(pool)['saturation'] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_connection_failure_marks_database_unavailable(self, monitor):
+        """Test: un fallo de conexión marca la BD como no disponible hasta el siguiente checkout exitoso"""
+        # Arrange
+        def refuse():
+            raise OSError('conexión rechazada')
+
+        # Act
+        with pytest.raises(OSError):
+            await greenlet_spawn(InstrumentedPool(refuse, pool_size=1).connect)
+        after_failure = monitor.available()
+        connection = await greenlet_spawn(InstrumentedPool(lambda: sqlite3.connect(':memory:'), pool_size=1).connect)
+        connection.close()
+
+        # Assert
+        assert after_failure is False
+        assert monitor.failures == 1
+        assert 'conexión rechazada' in monitor.last_error
+        assert monitor.available()
+
+
+class TestGetDbOptional:
+    """Tests para la dependencia opcional de sesión"""
+
+    @pytest.mark.asyncio
+    async def test_yields_session_without_probe_query(self, monitor):
+        """Test: entrega la sesión sin ejecutar consultas ni tomar una conexión del pool"""
+        # Act
+        dependency = get_db_optional()
+        session = await dependency.__anext__()
+        await dependency.aclose()
+
+        # Assert
+        assert session is not None
+        assert monitor.checkouts == 0
+
+    @pytest.mark.asyncio
+    async def test_yields_none_while_database_unavailable(self, monitor):
+        """Test: tras un fallo de conexión reciente entrega None sin intentar conectar"""
+        # Arrange
+        monitor.record_failure(OSError('conexión rechazada'))
+
+        # Act
+        dependency = get_db_optional()
+        session = await dependency.__anext__()
+        await dependency.aclose()
+
+        # Assert
+        assert session is None
+
+
+def _replica(lag, lag_check_interval=60):
+    """Réplica sin conexión real: el retraso se mide con una función falsa"""
+    replica = Replica('postgresql+asyncpg://postgres@replica/informes_db', max_lag=5,
+                      lag_check_interval=lag_check_interval)
+    replica.measurements = 0
+
+    async def measure_lag():
+        replica.measurements += 1
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    replica.measure_lag = measure_lag
+    return replica
+
+
+class TestReadRouter:
+    """Tests para el enrutamiento de lecturas entre réplicas y la principal"""
+
+    PRIMARY = object()
+
+    @pytest.mark.asyncio
+    async def test_round_robin_between_replicas(self):
+        """Test: las lecturas rotan entre las réplicas al día"""
+        # Arrange
+        replicas = [_replica(0.0), _replica(1.0)]
+        router = ReadRouter(replicas, self.PRIMARY)
+
+        # Act
+        chosen = [await router.sessionmaker() for _ in range(4)]
+
+        # Assert
+        assert chosen == [replicas[0].sessions, replicas[1].sessions] * 2
+        assert router.replica_reads == 4
+
+    @pytest.mark.asyncio
+    async def test_lagging_or_failing_replicas_fall_back_to_primary(self):
+        """Test: réplicas con retraso excesivo o sin respuesta no se usan; sin ninguna, la principal"""
+        # Arrange
+        router = ReadRouter([_replica(30.0), _replica(OSError('sin respuesta'))], self.PRIMARY)
+
+        # Act
+        chosen = await router.sessionmaker()
+
+        # Assert
+        assert chosen is self.PRIMARY
+        assert router.fallbacks == 1
+        assert [replica['lag_seconds'] for replica in router.stats()['replicas']] == [30.0, None]
+
+    @pytest.mark.asyncio
+    async def test_lag_is_measured_once_per_interval(self):
+        """Test: el retraso se mide como máximo una vez por intervalo, no en cada lectura"""
+        # Arrange
+        replica = _replica(0.0)
+        router = ReadRouter([replica], self.PRIMARY)
+
+        # Act
+        for _ in range(5):
+            await router.sessionmaker()
+
+        # Assert
+        assert replica.measurements == 1
+
+    @pytest.mark.asyncio
+    async def test_without_replicas_reads_use_primary(self):
+        """Test: sin réplicas configuradas las lecturas van a la principal sin contarse como fallback"""
+        router = ReadRouter([], self.PRIMARY)
+
+        assert await router.sessionmaker() is self.PRIMARY
+        assert router.fallbacks == 0
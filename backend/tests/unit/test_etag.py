@@ -0,0 +1,37 @@
+"""
+Test unitario para ETags y solicitudes condicionales
+"""
+from starlette.requests import Request
+from app.core.etag import etag_matches, not_modified, report_etag
+
+
+def _request(if_none_match=None):
+    headers = [(b'if-none-match', if_none_match.encode())] if if_none_match else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+class TestEtag:
+    """Tests para report_etag y etag_matches"""
+
+    def test_report_etag_depends_on_content_and_parameters(self):
+        """Test: el ETag es débil y cambia con el contenido o los parámetros"""
+        etag = report_etag(b'presupuesto_aprobado\n1000', 'generate', None)
+
+        assert etag.startswith('W/"')
+        assert etag == report_etag(b'presupuesto_aprobado\n1000', 'generate', None)
+        assert etag != report_etag(b'presupuesto_aprobado\n2000', 'generate', None)
+        assert etag != report_etag(b'presupuesto_aprobado\n1000', 'generate', 500)
+
+    def test_if_none_match(self):
+        """Test: If-None-Match acepta listas, comodín y ETags con o sin W/ (comparación débil)"""
+        etag = report_etag(b'datos')
+
+        assert not etag_matches(_request(), etag)
+        assert not etag_matches(_request('"otro"'), etag)
+        assert etag_matches(_request(f'"otro", {etag}'), etag)
+        assert etag_matches(_request(etag.removeprefix('W/')), etag)
+        assert etag_matches(_request('*'), etag)
+
+        response = not_modified(etag)
+        assert response.status_code == 304
+        assert response.headers['etag'] == etag and response.body == b''
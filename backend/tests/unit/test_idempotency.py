@@ -0,0 +1,160 @@
+"""
+Test unitario para el middleware de claves de idempotencia
+"""
+import asyncio
+import fakeredis
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from app.core.idempotency import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    InMemoryIdempotencyBackend,
+    RedisIdempotencyBackend,
+    StoredResponse,
+    request_fingerprint,
+)
+
+
+@pytest.fixture(params=['memoria', 'redis'])
+def backend(request):
+    """Backend en proceso y Redis (fakeredis, con los scripts Lua)"""
+    if request.param == 'memoria':
+        return InMemoryIdempotencyBackend(ttl=60, lock_ttl=60, max_keys=10)
+    backend = RedisIdempotencyBackend(fakeredis.FakeAsyncRedis(), ttl=60, lock_ttl=60)
+    backend.POLL_INTERVAL = 0.01
+    return backend
+
+
+async def _expire(backend, key):
+    """Simular que la reserva superó IDEMPOTENCY_LOCK_TTL"""
+    if isinstance(backend, InMemoryIdempotencyBackend):
+        backend._records[key].expires_at = 0
+    else:
+        await backend.client.delete(backend.KEY.format(key))
+
+
+def _client(backend, wait_timeout=5.0):
+    calls = []
+    release = asyncio.Event()
+
+    async def generate(request):
+        body = await request.body()
+        calls.append(body)
+        await release.wait()
+        if body == b'error':
+            return JSONResponse({'detail': 'falló'}, status_code=500)
+        return JSONResponse({'informe': len(calls)})
+
+    app = IdempotencyMiddleware(
+        Starlette(routes=[Route('/generate', generate, methods=['POST'])]),
+        paths=['/generate'],
+        store=IdempotencyStore(backend),
+        wait_timeout=wait_timeout,
+    )
+    client = AsyncClient(transport=ASGITransport(app=app), base_url='http://test')
+    return client, calls, release
+
+
+class TestIdempotencyMiddleware:
+    """Tests para IdempotencyMiddleware con el backend en proceso y con Redis"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_retry_waits_for_original(self, backend):
+        """Test: un reintento en curso espera la respuesta original sin repetir el trabajo"""
+        client, calls, release = _client(backend)
+        headers = {'Idempotency-Key': 'clave-1'}
+
+        first = asyncio.create_task(client.post('/generate', content=b'datos', headers=headers))
+        await asyncio.sleep(0.05)
+        retry = asyncio.create_task(client.post('/generate', content=b'datos', headers=headers))
+        await asyncio.sleep(0.05)
+        release.set()
+        first, retry = await first, await retry
+        later = await client.post('/generate', content=b'datos', headers=headers)
+
+        assert len(calls) == 1
+        assert first.json() == retry.json() == later.json() == {'informe': 1}
+        assert 'idempotent-replayed' not in first.headers
+        assert retry.headers['idempotent-replayed'] == 'true'
+
+    @pytest.mark.asyncio
+    async def test_key_reuse_with_other_body_is_rejected(self, backend):
+        """Test: la misma clave con otro cuerpo responde 422"""
+        client, calls, release = _client(backend)
+        release.set()
+
+        await client.post('/generate', content=b'datos', headers={'Idempotency-Key': 'clave-2'})
+        response = await client.post('/generate', content=b'otros', headers={'Idempotency-Key': 'clave-2'})
+        without_key = await client.post('/generate', content=b'otros')
+
+        assert response.status_code == 422
+        assert without_key.status_code == 200
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_response_is_not_stored(self, backend):
+        """Test: una respuesta de error libera la clave y el reintento se ejecuta de nuevo"""
+        client, calls, release = _client(backend)
+        release.set()
+
+        first = await client.post('/generate', content=b'error', headers={'Idempotency-Key': 'clave-3'})
+        retry = await client.post('/generate', content=b'error', headers={'Idempotency-Key': 'clave-3'})
+
+        assert first.status_code == retry.status_code == 500
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_gets_conflict_after_wait_timeout(self, backend):
+        """Test: si la solicitud original no termina durante la espera se responde 409"""
+        client, calls, release = _client(backend, wait_timeout=0.05)
+        headers = {'Idempotency-Key': 'clave-4'}
+
+        first = asyncio.create_task(client.post('/generate', content=b'datos', headers=headers))
+        await asyncio.sleep(0.05)
+        retry = await client.post('/generate', content=b'datos', headers=headers)
+        release.set()
+        await first
+
+        assert retry.status_code == 409
+        assert 'retry-after' in retry.headers
+
+    @pytest.mark.asyncio
+    async def test_expired_owner_does_not_touch_retry_reservation(self, backend):
+        """Test: una solicitud que sobrevive a su reserva no libera ni pisa la del reintento"""
+        response = StoredResponse(200, [('content-type', 'application/json')], b'{"informe": 1}')
+        await backend.reserve('clave-5', 'huella', 'original')
+        await _expire(backend, 'clave-5')
+        assert await backend.reserve('clave-5', 'huella', 'reintento') is None
+
+        await backend.release('clave-5', 'original')
+        stored = await backend.complete('clave-5', 'huella', 'original', response)
+        record = await backend.reserve('clave-5', 'huella', 'otro')
+
+        assert stored is False
+        assert record.token == 'reintento'
+        assert record.response is None
+
+    @pytest.mark.asyncio
+    async def test_owner_completes_its_reservation(self, backend):
+        """Test: el dueño de la reserva guarda la respuesta y la libera solo con su token"""
+        response = StoredResponse(200, [], b'{"informe": 1}')
+        await backend.reserve('clave-6', 'huella', 'original')
+        await backend.release('clave-6', 'ajeno')
+
+        assert await backend.complete('clave-6', 'huella', 'original', response) is True
+        record = await backend.reserve('clave-6', 'huella', 'reintento')
+        assert record.response.body == b'{"informe": 1}'
+
+    def test_fingerprint_ignores_multipart_boundary(self):
+        """Test: el mismo formulario con otro boundary tiene la misma huella"""
+        body = '--{b}\r\nContent-Disposition: form-data; name="file"\r\n\r\ndatos\r\n--{b}--\r\n'
+
+        first = request_fingerprint('POST', '/generate', 'multipart/form-data; boundary=aaa111',
+                                    body.format(b='aaa111').encode())
+        second = request_fingerprint('POST', '/generate', 'multipart/form-data; boundary=bbb222',
+                                     body.format(b='bbb222').encode())
+
+        assert first == second
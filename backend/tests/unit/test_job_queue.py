@@ -0,0 +1,174 @@
+"""
+Test unitario para la cola de trabajos de informes
+"""
+import asyncio
+import fakeredis
+import pytest
+from app.core.config import settings
+from app.core.job_queue import (
+    InMemoryJobBackend,
+    JobBackend,
+    JobQueue,
+    JobStatus,
+    QueueFullError,
+    RedisJobBackend,
+)
+
+
+@pytest.fixture(params=['memoria', 'redis'])
+def make_backend(request):
+    """Fábrica de backends: en proceso y Redis (fakeredis, con los scripts Lua)"""
+    def make(max_size=10, visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT):
+        if request.param == 'memoria':
+            return InMemoryJobBackend(max_size=max_size, max_jobs=50)
+        return RedisJobBackend(fakeredis.FakeAsyncRedis(), max_size=max_size,
+                               visibility_timeout=visibility_timeout, poll_interval=0.01)
+    return make
+
+
+def _queue(backend, workers=1):
+    queue = JobQueue(backend=backend, workers=workers)
+    processed = []
+
+    async def handler(job, report_progress):
+        if job.payload == 'error':
+            raise ValueError('datos inválidos')
+        if job.payload == 'lento':
+            await asyncio.sleep(0.3)
+        processed.append(job.payload)
+        await report_progress(0.5)
+        return {'procesado': job.payload}
+
+    queue.register('prueba', handler)
+    return queue, processed
+
+
+async def _wait(queue, job_id):
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError('El trabajo no terminó')
+
+
+class TestJobQueue:
+    """Tests para JobQueue con el backend en proceso y con Redis"""
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_by_priority(self, make_backend):
+        """Test: los trabajos de mayor prioridad se atienden primero, FIFO dentro de cada prioridad"""
+        queue, processed = _queue(make_backend())
+        await queue.submit('prueba', 'normal-1')
+        await queue.submit('prueba', 'low', priority='low')
+        await queue.submit('prueba', 'high', priority='high')
+        last = await queue.submit('prueba', 'normal-2')
+
+        await queue.start()
+        job = await _wait(queue, last.id)
+        await queue.stop()
+
+        assert processed[:3] == ['high', 'normal-1', 'normal-2']
+        assert job.status == JobStatus.SUCCEEDED
+        assert job.progress == 1.0
+        assert job.to_dict()['result'] == {'procesado': 'normal-2'}
+
+    @pytest.mark.asyncio
+    async def test_bounded_queue_rejects_jobs(self, make_backend):
+        """Test: con la cola llena se rechazan trabajos nuevos"""
+        queue, _ = _queue(make_backend(max_size=2))
+        await queue.submit('prueba', 'a')
+        await queue.submit('prueba', 'b')
+
+        with pytest.raises(QueueFullError):
+            await queue.submit('prueba', 'c')
+        assert await queue.pending() == 2
+        with pytest.raises(ValueError):
+            await queue.submit('desconocido', 'd')
+
+    @pytest.mark.asyncio
+    async def test_failed_job_keeps_error(self, make_backend):
+        """Test: un trabajo que falla registra el error sin detener al worker"""
+        queue, processed = _queue(make_backend())
+        failed = await queue.submit('prueba', 'error')
+        ok = await queue.submit('prueba', 'ok')
+
+        await queue.start()
+        failed = await _wait(queue, failed.id)
+        ok = await _wait(queue, ok.id)
+        await queue.stop()
+
+        assert failed.status == JobStatus.FAILED
+        assert failed.error == 'datos inválidos'
+        assert failed.to_dict()['result'] is None
+        assert ok.status == JobStatus.SUCCEEDED
+        assert processed == ['ok']
+
+    @pytest.mark.asyncio
+    async def test_interrupted_job_fails_after_max_attempts(self, make_backend, monkeypatch):
+        """Test: un trabajo que se interrumpió en cada intento se marca como fallido sin ejecutarse"""
+        monkeypatch.setattr(settings, 'JOB_MAX_ATTEMPTS', 2)
+        queue, processed = _queue(make_backend())
+        job = await queue.submit('prueba', 'inestable')
+        job.attempts = 2
+        await queue.backend.save(job)
+
+        job = await queue.run_job(await queue.backend.dequeue(timeout=1))
+
+        assert job.status == JobStatus.FAILED
+        assert job.attempts == 3
+        assert 'interrumpió 2 veces' in job.error
+        assert (await queue.get(job.id)).status == JobStatus.FAILED
+        assert await queue.pending() == 0
+        assert processed == []
+
+    def test_backend_interface_is_abstract(self):
+        """Test: un backend debe implementar todas las operaciones de la cola"""
+        class IncompleteBackend(JobBackend):
+            async def enqueue(self, job):
+                pass
+
+        with pytest.raises(TypeError):
+            IncompleteBackend()
+
+
+class TestRedisJobBackend:
+    """Tests para las reservas con timeout de visibilidad de RedisJobBackend"""
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_requeued(self):
+        """Test: un trabajo reservado sin confirmar vuelve a la cola al vencer la reserva"""
+        client = fakeredis.FakeAsyncRedis()
+        backend = RedisJobBackend(client, visibility_timeout=0.05, poll_interval=0.01)
+        queue, processed = _queue(backend)
+        submitted = await queue.submit('prueba', 'huérfano')
+        reserved = await backend.dequeue(timeout=1)
+        reserved.attempts += 1
+        await backend.save(reserved)
+
+        assert await backend.dequeue(timeout=0.02) is None
+        await asyncio.sleep(0.06)
+        job = await queue.run_job(await backend.dequeue(timeout=1))
+
+        assert job.id == reserved.id == submitted.id
+        assert job.status == JobStatus.SUCCEEDED
+        assert job.attempts == 2
+        assert processed == ['huérfano']
+        assert await client.zcard(RedisJobBackend.PROCESSING_KEY) == 0
+        assert await client.hlen(RedisJobBackend.SCORES_KEY) == 0
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_keeps_running_job_reserved(self, monkeypatch):
+        """Test: un trabajo más largo que la reserva no se entrega a otro worker mientras corre"""
+        monkeypatch.setattr(settings, 'JOB_VISIBILITY_TIMEOUT', 0.09)
+        backend = RedisJobBackend(fakeredis.FakeAsyncRedis(), visibility_timeout=0.09, poll_interval=0.01)
+        queue, processed = _queue(backend, workers=2)
+        job = await queue.submit('prueba', 'lento')
+
+        await queue.start()
+        job = await _wait(queue, job.id)
+        await queue.stop()
+
+        assert job.status == JobStatus.SUCCEEDED
+        assert job.attempts == 1
+        assert processed == ['lento']
@@ -0,0 +1,144 @@
+"""
+Test unitario para el presupuesto de latencia del motor de IA
+"""
+import asyncio
+import threading
+import time
+import pytest
+from app.core.config import settings
+from app.services import ai_intelligence_engine
+from app.services.ai_intelligence_engine import ContractIntelligenceEngine, StageExecutor
+
+
+CONTRACT = {
+    'numero_contrato': 'C-1',
+    'presupuesto_aprobado': 1000.0,
+    'valor_ejecutado': 1200.0,
+    'porcentaje_avance_fisico': 40.0,
+}
+
+
+def _slow_stage(data):
+    time.sleep(0.5)
+    return [{'index': 0}]
+
+
+class TestLatencyBudget:
+    """Tests para la degradación controlada por presupuesto de latencia"""
+
+    @pytest.mark.asyncio
+    async def test_slow_optional_stage_is_skipped(self, monkeypatch):
+        """Test: una etapa opcional que agota el presupuesto se omite y baja la confianza"""
+        engine = ContractIntelligenceEngine()
+        complete = await engine.analyze_contract_data(CONTRACT)
+        engine._analysis_cache.clear()
+        engine._stage_cache.clear()
+        monkeypatch.setattr(engine, '_detect_anomalies', _slow_stage)
+
+        result = await engine.analyze_contract_data(CONTRACT, latency_budget=0.1)
+
+        assert result.skipped_stages == ['anomalies']
+        assert result.anomalies == []
+        assert result.confidence < complete.confidence
+        assert result.processing_time < 0.5
+        # Un resultado degradado no se guarda en cache
+        assert not engine._analysis_cache
+
+    @pytest.mark.asyncio
+    async def test_timed_out_stage_served_from_cache(self, monkeypatch):
+        """Test: si hay un resultado previo de la etapa para los mismos datos, se reutiliza"""
+        engine = ContractIntelligenceEngine()
+        complete = await engine.analyze_contract_data(CONTRACT)
+        engine._analysis_cache.clear()
+        monkeypatch.setattr(engine, '_detect_anomalies', _slow_stage)
+
+        result = await engine.analyze_contract_data(CONTRACT, latency_budget=0.1)
+
+        assert result.skipped_stages == []
+        assert result.cached_stages == ['anomalies']
+        assert result.anomalies == complete.anomalies
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_stages_as_they_finish(self, monkeypatch):
+        """Test: en streaming las etapas corren en paralelo y una etapa lenta no retrasa a las demás"""
+        engine = ContractIntelligenceEngine()
+        monkeypatch.setattr(engine, '_analyze_risk_factors', lambda data: time.sleep(0.3) or {})
+        monkeypatch.setattr(engine, '_generate_predictions', lambda data: time.sleep(0.3) or {})
+
+        start = time.perf_counter()
+        events = [stage async for stage, _ in engine.analyze_contract_data_stream(CONTRACT)]
+        elapsed = time.perf_counter() - start
+
+        assert events[-1] == 'result'
+        assert set(events[-3:-1]) == {'risk_factors', 'predictions'}
+        assert sorted(events[:-1]) == sorted(name for name, _, _, _ in engine.ANALYSIS_STAGES)
+        # Las dos etapas lentas se solapan: el total es el de la más lenta, no la suma
+        assert elapsed < 0.55
+
+    @pytest.mark.asyncio
+    async def test_failed_stage_is_reported_as_skipped(self, monkeypatch):
+        """Test: una etapa que falla se lista en skipped_stages y el resultado no se guarda en cache"""
+        engine = ContractIntelligenceEngine()
+        complete = await engine.analyze_contract_data(CONTRACT)
+        engine._analysis_cache.clear()
+        engine._stage_cache.clear()
+
+        def failing_stage(data):
+            raise RuntimeError('fallo en predicciones')
+
+        monkeypatch.setattr(engine, '_generate_predictions', failing_stage)
+
+        result = await engine.analyze_contract_data(CONTRACT)
+
+        assert result.skipped_stages == ['predictions']
+        assert result.confidence < complete.confidence
+        assert not engine._analysis_cache
+
+    @pytest.mark.asyncio
+    async def test_optional_stage_timeout_leaves_reserve(self, monkeypatch):
+        """Test: con etapas en paralelo, una etapa opcional lenta se corta al llegar a la reserva"""
+        engine = ContractIntelligenceEngine()
+        monkeypatch.setattr(engine, '_detect_anomalies', _slow_stage)
+
+        result = await engine.analyze_contract_data(CONTRACT, latency_budget=0.25)
+
+        assert result.skipped_stages == ['anomalies']
+        # El timeout de la etapa opcional es el presupuesto menos la reserva (20%)
+        assert result.processing_time < 0.25
+
+    @pytest.mark.asyncio
+    async def test_stage_timeout_only_when_configured(self, monkeypatch):
+        """Test: sin presupuesto ni ANALYSIS_STAGE_TIMEOUT una etapa lenta no se corta"""
+        engine = ContractIntelligenceEngine()
+        monkeypatch.setattr(engine, '_detect_anomalies', lambda data: time.sleep(0.2) or [{'index': 0}])
+
+        complete = await engine.analyze_contract_data(CONTRACT)
+        engine._analysis_cache.clear()
+        engine._stage_cache.clear()
+        monkeypatch.setattr(settings, 'ANALYSIS_STAGE_TIMEOUT', 0.05)
+        limited = await engine.analyze_contract_data(CONTRACT)
+
+        assert complete.skipped_stages == []
+        assert complete.anomalies == [{'index': 0}]
+        assert limited.skipped_stages == ['anomalies']
+
+    @pytest.mark.asyncio
+    async def test_saturated_pool_skips_optional_stage(self, monkeypatch):
+        """Test: con el pool de etapas saturado la etapa opcional se omite sin ejecutarse"""
+        executor = StageExecutor(workers=1)
+        monkeypatch.setattr(ai_intelligence_engine, 'stage_executor', executor)
+        engine = ContractIntelligenceEngine()
+        calls = []
+        monkeypatch.setattr(engine, '_detect_anomalies', lambda data: calls.append(data) or [])
+        blocker = threading.Event()
+        busy = executor.submit(blocker.wait)
+        asyncio.get_running_loop().call_later(0.1, blocker.set)
+
+        result = await engine.analyze_contract_data(CONTRACT, latency_budget=2.0)
+        await busy
+        executor.shutdown()
+
+        assert result.skipped_stages == ['anomalies']
+        assert calls == []
+        # Las etapas obligatorias esperan su turno en el pool y se completan
+        assert executor.pending == 0
@@ -0,0 +1,63 @@
+"""
+Test unitario para los nombres, rangos e índices de las particiones mensuales
+"""
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.db.partitions import add_months, copy_index, month_start, months_ago, partition_name
+
+
+class TestPartitionMonths:
+    """Tests para el cálculo de meses de partición"""
+
+    def test_month_start_is_utc(self):
+        """Test: el mes de una fecha con zona horaria se calcula en UTC"""
+        # Arrange
+        bogota = timezone(timedelta(hours=-5))
+
+        # Act
+        month = month_start(datetime(2025, 1, 31, 22, 0, tzinfo=bogota))
+
+        # Assert
+        assert month == datetime(2025, 2, 1, tzinfo=timezone.utc)
+
+    def test_add_months_crosses_years(self):
+        """Test: sumar y restar meses cruza los límites de año"""
+        month = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+        assert add_months(month, 2) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+        assert add_months(month, -11) == datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+    def test_months_ago_includes_current_month(self):
+        """Test: los últimos N meses empiezan N-1 meses antes del mes en curso"""
+        assert months_ago(1) == month_start()
+        assert months_ago(3) == add_months(month_start(), -2)
+
+    def test_partition_name(self):
+        """Test: la partición lleva el año y el mes como sufijo"""
+        assert partition_name('reports', datetime(2025, 3, 1, tzinfo=timezone.utc)) == 'reports_p202503'
+
+
+class TestCopyIndex:
+    """Tests para la copia de definiciones de índices a las particiones"""
+
+    def test_partitioned_index_definition(self):
+        """Test: el índice de la tabla padre (ON ONLY) se replica en la partición con otro nombre"""
+        # Arrange
+        definition = "CREATE INDEX ix_reports_raw_data ON ONLY public.reports USING gin (raw_data jsonb_path_ops)"
+
+        # Act
+        copied = copy_index(definition, 'ix_reports_raw_data_p202503', 'reports_p202503')
+
+        # Assert
+        assert copied == "CREATE INDEX ix_reports_raw_data_p202503 ON reports_p202503 USING gin (raw_data jsonb_path_ops)"
+
+    def test_unique_index_keeps_uniqueness(self):
+        """Test: los índices únicos siguen siendo únicos"""
+        definition = "CREATE UNIQUE INDEX ix_users_email ON public.users USING btree (email)"
+
+        assert copy_index(definition, 'ix', 't').startswith('CREATE UNIQUE INDEX ix ON t ')
+
+    def test_unknown_definition_is_rejected(self):
+        """Test: una definición no reconocida no se aplica a ciegas"""
+        with pytest.raises(ValueError):
+            copy_index('CREATE TABLE reports ()', 'ix', 't')
@@ -0,0 +1,68 @@
+"""
+Test unitario para la exportación PDF en segundo plano
+"""
+import pytest
+from app.core.artifact_cache import ArtifactCache
+from app.core.job_queue import InMemoryJobBackend, JobQueue, JobStatus
+from app.schemas.report import GeneratedReport, ReportSection, TechnicalMessage
+from app.services.pdf_export import PDF_JOB, PdfExportService, contract_html
+
+FINGERPRINT_A = 'a' * 64
+FINGERPRINT_B = 'b' * 64
+
+
+def _service(tmp_path):
+    queue = JobQueue(backend=InMemoryJobBackend(max_size=10, max_jobs=50), workers=1)
+
+    async def handler(job, report_progress):
+        return {'fingerprint': job.payload['fingerprint']}
+
+    queue.register(PDF_JOB, handler)
+    return PdfExportService(queue=queue, cache=ArtifactCache(directory=str(tmp_path))), queue
+
+
+class TestPdfExportService:
+    """Tests para PdfExportService"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_coalesced(self, tmp_path):
+        """Test: solicitudes del mismo contenido en curso comparten un único trabajo"""
+        service, queue = _service(tmp_path)
+
+        first = await service.request(FINGERPRINT_A, [{'a': 1}], ['c1'])
+        second = await service.request(FINGERPRINT_A, [{'a': 1}], ['c1'])
+        other = await service.request(FINGERPRINT_B, [{'a': 2}], ['c2'])
+
+        assert first['status'] == JobStatus.QUEUED.value and not first['coalesced']
+        assert second['job_id'] == first['job_id'] and second['coalesced']
+        assert other['job_id'] != first['job_id']
+        assert await queue.pending() == 2
+
+    @pytest.mark.asyncio
+    async def test_cached_pdf_is_served_without_job(self, tmp_path):
+        """Test: un PDF ya renderizado no encola trabajos"""
+        service, queue = _service(tmp_path)
+
+        async def write(path):
+            path.write_bytes(b'%PDF-1.7')
+
+        await service.cache.put(FINGERPRINT_A, '.pdf', write)
+        state = await service.request(FINGERPRINT_A, [{'a': 1}], ['c1'])
+
+        assert state['status'] == JobStatus.SUCCEEDED.value and state['job_id'] is None
+        assert (await service.status(FINGERPRINT_A))['progress'] == 1.0
+        assert await service.status(FINGERPRINT_B) is None
+        assert await queue.pending() == 0
+
+    def test_contract_html_escapes_content(self):
+        """Test: el contenido de los informes se escapa en el HTML"""
+        report = GeneratedReport(sections=[ReportSection(
+            title='Avance <físico>',
+            data={},
+            message=TechnicalMessage(block_name='avance', message='a & b', severity='CRITICAL'),
+        )])
+
+        html = contract_html('C-1', report)
+
+        assert 'Avance &lt;físico&gt;' in html and 'a &amp; b' in html
+        assert 'No fue posible' in contract_html('C-2', ValueError('<error>'))
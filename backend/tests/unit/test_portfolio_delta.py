@@ -0,0 +1,162 @@
+"""
+Test unitario para el re-análisis incremental de portafolios
+"""
+import asyncio
+import fakeredis
+import pandas as pd
+import pytest
+from app.core.config import settings
+from app.services.portfolio_delta import (
+    PortfolioDeltaService,
+    SnapshotStore,
+    compute_contract_keys,
+    compute_row_fingerprints,
+)
+
+
+class RecordingEngine:
+    """Motor de prueba que registra cuántas filas recibe"""
+
+    def __init__(self):
+        self.analyzed_rows = []
+
+    async def analyze_contract_data(self, data, approximate=False):
+        self.analyzed_rows.append(len(data))
+        return None
+
+
+class SlowEngine(RecordingEngine):
+    """Motor de prueba lento que registra cuántos análisis se solapan"""
+
+    def __init__(self, fail=False):
+        super().__init__()
+        self.fail = fail
+        self.running = 0
+        self.max_running = 0
+
+    async def analyze_contract_data(self, data, approximate=False):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.05)
+            if self.fail:
+                raise RuntimeError('fallo del motor')
+            return await super().analyze_contract_data(data, approximate)
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture(params=['memoria', 'redis'])
+def make_store(request, monkeypatch):
+    """Fábrica de almacenes de snapshots: en proceso y en Redis (fakeredis)"""
+    monkeypatch.setattr(settings, 'PORTFOLIO_SNAPSHOT_BACKEND', 'memory')
+    client = fakeredis.FakeAsyncRedis()
+
+    def make(max_portfolios=2):
+        if request.param == 'memoria':
+            return SnapshotStore(max_portfolios=max_portfolios)
+        return SnapshotStore(max_portfolios=max_portfolios, client=client)
+    return make
+
+
+def _portfolio(**overrides):
+    rows = [
+        {'numero_contrato': 'C-1', 'presupuesto_aprobado': 1000.0, 'valor_ejecutado': 500.0, 'porcentaje_avance_fisico': 50.0},
+        {'numero_contrato': 'C-2', 'presupuesto_aprobado': 2000.0, 'valor_ejecutado': 2500.0, 'porcentaje_avance_fisico': 90.0},
+        {'numero_contrato': 'C-3', 'presupuesto_aprobado': 3000.0, 'valor_ejecutado': 1500.0, 'porcentaje_avance_fisico': 85.0},
+    ]
+    for key, values in overrides.items():
+        for row in rows:
+            if row['numero_contrato'] == key:
+                row.update(values)
+    return pd.DataFrame(rows)
+
+
+class TestPortfolioDelta:
+    """Tests para PortfolioDeltaService"""
+
+    def test_keys_and_fingerprints(self):
+        """Test: la huella no depende del orden de las columnas"""
+        df = _portfolio()
+
+        keys = compute_contract_keys(df)
+        fingerprints = compute_row_fingerprints(df)
+        reordered = compute_row_fingerprints(df[list(reversed(df.columns))])
+
+        assert keys.tolist() == ['C-1', 'C-2', 'C-3']
+        assert fingerprints.tolist() == reordered.tolist()
+
+    @pytest.mark.asyncio
+    async def test_only_changed_rows_are_analyzed(self, make_store):
+        """Test: una re-carga solo envía al motor las filas nuevas o modificadas"""
+        engine = RecordingEngine()
+        service = PortfolioDeltaService(engine=engine, store=make_store())
+
+        first = await service.analyze('semanal', _portfolio())
+        second = await service.analyze('semanal', _portfolio(**{'C-2': {'valor_ejecutado': 1800.0}}))
+
+        assert engine.analyzed_rows == [3, 1]
+        assert first.delta.to_dict() == {'nuevos': 3, 'modificados': 0, 'eliminados': 0, 'sin_cambios': 0}
+        assert second.delta.to_dict() == {'nuevos': 0, 'modificados': 1, 'eliminados': 0, 'sin_cambios': 2}
+        assert second.aggregates['valor_ejecutado_total'] == 3800.0
+        assert second.aggregates['contratos_sobrecosto'] == 0
+
+    @pytest.mark.asyncio
+    async def test_removed_rows_update_aggregates(self, make_store):
+        """Test: los contratos eliminados se restan de los agregados"""
+        engine = RecordingEngine()
+        service = PortfolioDeltaService(engine=engine, store=make_store())
+
+        await service.analyze('semanal', _portfolio())
+        result = await service.analyze('semanal', _portfolio().iloc[:2])
+
+        assert engine.analyzed_rows == [3]
+        assert result.delta.removed == ['C-3']
+        assert result.aggregates['total_contratos'] == 2
+        assert result.aggregates['presupuesto_total'] == 3000.0
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_shared_across_workers(self):
+        """Test: con Redis otro worker (o un reinicio) re-analiza solo los cambios y recarga snapshots más nuevos"""
+        client = fakeredis.FakeAsyncRedis()
+        engine = RecordingEngine()
+        first_worker = PortfolioDeltaService(engine=engine, store=SnapshotStore(client=client))
+        second_worker = PortfolioDeltaService(engine=engine, store=SnapshotStore(client=client))
+        changed = _portfolio(**{'C-2': {'valor_ejecutado': 1800.0}})
+
+        await first_worker.analyze('semanal', _portfolio())
+        restarted = await second_worker.analyze('semanal', changed)
+        stale = await first_worker.analyze('semanal', changed)
+
+        assert engine.analyzed_rows == [3, 1]
+        assert restarted.delta.to_dict() == {'nuevos': 0, 'modificados': 1, 'eliminados': 0, 'sin_cambios': 2}
+        # El primer worker tenía en memoria el snapshot anterior: recarga el de Redis
+        assert stale.delta.unchanged == 3
+        assert stale.aggregates == restarted.aggregates
+
+    @pytest.mark.asyncio
+    async def test_held_lock_is_not_evicted(self, make_store):
+        """Test: descartar snapshots por capacidad no libera el lock de una carga en curso"""
+        engine = SlowEngine()
+        service = PortfolioDeltaService(engine=engine, store=make_store(max_portfolios=1))
+
+        await asyncio.gather(
+            service.analyze('semanal', _portfolio()),
+            service.analyze('otro', _portfolio()),
+            service.analyze('semanal', _portfolio(**{'C-1': {'valor_ejecutado': 900.0}})),
+        )
+
+        # Las dos cargas de 'semanal' se serializan; solo 'otro' corre en paralelo
+        assert engine.max_running == 2
+        assert engine.analyzed_rows == [3, 3, 1]
+        assert service.store._locks == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_analysis_releases_lock(self, make_store):
+        """Test: un análisis fallido no deja su lock en el almacén"""
+        service = PortfolioDeltaService(engine=SlowEngine(fail=True), store=make_store())
+
+        with pytest.raises(RuntimeError):
+            await service.analyze('semanal', _portfolio())
+
+        assert service.store._locks == {}
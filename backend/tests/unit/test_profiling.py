@@ -0,0 +1,80 @@
+"""
+Test unitario para el perfilado de memoria muestreado
+"""
+import tracemalloc
+import pytest
+from app.core.profiling import MemoryProfiler, profile_stage
+from app.services import ai_intelligence_engine
+from app.services.ai_intelligence_engine import ContractIntelligenceEngine
+
+
+class TestMemoryProfiler:
+    """Tests para MemoryProfiler"""
+
+    def test_disabled_profiler_never_samples(self):
+        """Test: sin PROFILING_ENABLED no se inicia tracemalloc"""
+        profiler = MemoryProfiler(enabled=False, sample_rate=1.0)
+
+        session = profiler.start('analisis')
+        with profile_stage(session, 'etapa'):
+            pass
+        profiler.finish(session)
+
+        assert session is None
+        assert not tracemalloc.is_tracing()
+        assert profiler.get_summary()['profiles'] == []
+
+    def test_stage_peak_and_allocation_sites(self):
+        """Test: cada etapa registra su pico y los sitios de asignación retenidos"""
+        profiler = MemoryProfiler(enabled=True, sample_rate=1.0, max_profiles=2, top_n=5)
+
+        session = profiler.start('analisis')
+        assert profiler.start('concurrente') is None  # Un request perfilado a la vez
+        with session.stage('asignacion'):
+            retained = [bytearray(1024) for _ in range(512)]
+        profiler.finish(session)
+
+        profile = profiler.get_summary()['profiles'][0]
+        stage = profile['stages'][0]
+        assert not tracemalloc.is_tracing()
+        assert stage['stage'] == 'asignacion'
+        assert stage['peak_kb'] >= 512
+        assert any(__file__ in site['site'] for site in stage['top_allocations'])
+        assert len(retained) == 512
+
+    @pytest.mark.asyncio
+    async def test_sampled_analysis_reports_stages(self, monkeypatch):
+        """Test: un análisis muestreado registra la preparación y cada etapa del motor"""
+        profiler = MemoryProfiler(enabled=True, sample_rate=1.0)
+        monkeypatch.setattr(ai_intelligence_engine, 'memory_profiler', profiler)
+        engine = ContractIntelligenceEngine()
+
+        result = await engine.analyze_contract_data({
+            'presupuesto_aprobado': 1000.0,
+            'valor_ejecutado': 800.0,
+            'porcentaje_avance_fisico': 70.0,
+        })
+
+        stages = [stage['stage'] for stage in profiler.get_summary()['profiles'][0]['stages']]
+        assert stages == ['preparacion'] + [name for name, _, _, _ in engine.ANALYSIS_STAGES]
+        assert result.memory_usage > 0
+
+    def test_concurrent_requests_are_not_profiled(self):
+        """Test: con otros requests en curso no se perfila, y un perfil en el que empieza otro se descarta"""
+        profiler = MemoryProfiler(enabled=True, sample_rate=1.0)
+
+        with profiler.track(), profiler.track():
+            busy = profiler.start('ocupado')
+        with profiler.track():
+            session = profiler.start('solo')
+            with profiler.track():
+                pass
+            profiler.finish(session)
+
+        summary = profiler.get_summary()
+        assert busy is None
+        assert session is not None
+        assert not tracemalloc.is_tracing()
+        assert summary['profiles'] == []
+        assert summary['skipped_busy'] == 1
+        assert summary['discarded_overlapping'] == 1
@@ -0,0 +1,70 @@
+"""
+Test unitario para la construcción confiable de modelos de informe
+"""
+import asyncio
+import numpy as np
+import orjson
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.core.serialization import model_response
+from app.schemas.report import (
+    GeneratedReport,
+    ReportSection,
+    TechnicalMessage,
+    trusted_message,
+    trusted_report,
+    trusted_section,
+)
+
+
+def _validated():
+    message = TechnicalMessage(block_name='Análisis Presupuestal', message='Ejecución al 85.00%', severity='WARNING')
+    return GeneratedReport(sections=[ReportSection(title='Presupuesto', data={'Valor': '$1.00 COP'}, message=message)])
+
+
+def _trusted():
+    message = trusted_message(block_name='Análisis Presupuestal', message='Ejecución al 85.00%', severity='WARNING')
+    return trusted_report([trusted_section(title='Presupuesto', data={'Valor': '$1.00 COP'}, message=message)])
+
+
+class TestTrustedReportModels:
+    """Tests para trusted_message, trusted_section, trusted_report y model_response"""
+
+    def test_trusted_models_match_validated(self):
+        """Test: los modelos sin validación son equivalentes a los validados"""
+        validated, trusted = _validated(), _trusted()
+
+        assert trusted == validated
+        assert trusted.model_dump_json() == validated.model_dump_json()
+        assert trusted.model_fields_set == validated.model_fields_set
+        assert trusted.sections[0].model_fields_set == validated.sections[0].model_fields_set
+        assert trusted_report([], year=2026).year == 2026
+        assert trusted_report([], year=2026).model_fields_set == {'sections', 'year'}
+
+    def test_trusted_models_behave_as_models(self):
+        """Test: los modelos sin validación comparten `data` y admiten copia y asignación"""
+        data = {'Valor': '$1.00 COP'}
+        section = trusted_section(title='t', data=data, message=trusted_message(block_name='b', message='m', severity='INFO'))
+
+        copy = section.model_copy(update={'title': 'u'})
+        section.title = 'v'
+
+        assert section.data is data
+        assert copy.title == 'u' and copy.message == section.message
+        assert section.model_dump()['title'] == 'v'
+
+    def test_model_response_matches_fastapi_serialization(self):
+        """Test: model_response produce el mismo JSON que la ruta de response_model de FastAPI"""
+        report = _trusted()
+        field = create_model_field(name='response', type_=GeneratedReport, mode='serialization')
+
+        expected = asyncio.run(serialize_response(field=field, response_content=report))
+
+        assert orjson.loads(model_response(report).body) == expected
+
+    def test_model_response_serializes_numpy_values(self):
+        """Test: valores NumPy en los datos de una sección no rompen la respuesta"""
+        message = trusted_message(block_name='b', message='m', severity='INFO')
+        report = trusted_report([trusted_section(title='t', data={'n': np.int64(3), 'x': np.float32(0.5)}, message=message)])
+
+        assert orjson.loads(model_response(report).body)['sections'][0]['data'] == {'n': 3, 'x': 0.5}
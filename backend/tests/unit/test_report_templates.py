@@ -0,0 +1,101 @@
+"""
+Test unitario para las plantillas de mensajes y el renderizado por lotes
+"""
+import pytest
+from app.services.intelligent_report_service import IntelligentReportService
+from app.services.ai_intelligence_engine import AIAnalysisResult, SeverityLevel
+from app.services.report_generator import ReportGeneratorService
+from app.services.report_templates import (
+    MessageTemplate,
+    format_currency,
+    format_number,
+    format_percent,
+)
+
+VALUES = [0, 0.123456, 1.5, -0.004999, 12.3456, -1234567.891, 999.995, 1e12, float('nan')]
+
+
+def _analysis(**overrides):
+    values = dict(
+        risk_score=0.8123,
+        confidence=0.456,
+        predictions={'probabilidad_sobrecosto': 0.75, 'probabilidad_retraso': 0.2, 'probabilidad_cumplimiento': 0.4},
+        anomalies=[],
+        recommendations=['Revisar rubros', 'Acelerar frentes'],
+        severity=SeverityLevel.WARNING,
+        insights={'predictive_insights': {'costo_final_estimado': 1234567.5}},
+        processing_time=0.0,
+        memory_usage=0.0,
+    )
+    values.update(overrides)
+    return AIAnalysisResult(**values)
+
+
+class TestReportTemplates:
+    """Tests para app.services.report_templates"""
+
+    def test_vectorized_formatting_matches_fstrings(self):
+        """Test: el formateo vectorizado coincide con el de f-strings"""
+        assert format_percent(VALUES).tolist() == [f"{x:.2%}" for x in VALUES]
+        assert format_number(VALUES).tolist() == [f"{x:.2f}" for x in VALUES]
+        assert format_number(VALUES, 1).tolist() == [f"{x:.1f}" for x in VALUES]
+        assert format_currency(VALUES).tolist() == [f"${x:,.2f} COP" for x in VALUES]
+
+    def test_template_batch_render(self):
+        """Test: una plantilla compilada renderiza columnas y valores comunes"""
+        template = MessageTemplate("{index}. {item} ({unit})\n")
+
+        assert template.fields == ['index', 'item', 'unit']
+        assert template.render(index=1, item='a', unit='COP') == "1. a (COP)\n"
+        assert template.render_batch(2, index=['1', '2'], item=['a', 'b'], unit='COP') == ["1. a (COP)\n", "2. b (COP)\n"]
+        with pytest.raises(ValueError):
+            MessageTemplate("{valor:.2f}")
+
+
+class TestIntelligentReportBatch:
+    """Tests para el renderizado por lotes de IntelligentReportService"""
+
+    def test_single_contract_output(self):
+        """Test: las secciones de un contrato conservan el texto de los mensajes"""
+        service = IntelligentReportService()
+
+        predictive, insights, recommendations = service._create_ai_sections(_analysis())
+
+        assert predictive.data['Probabilidad de Sobrecosto'] == "75.00%"
+        assert predictive.message.message.endswith(
+            "⚠️ ALTA PROBABILIDAD DE SOBRECOSTO detectada por IA.\n"
+            "🚨 BAJA PROBABILIDAD DE CUMPLIMIENTO del cronograma.\n"
+        )
+        assert predictive.message.severity == 'WARNING'
+        assert insights.data['Costo Final Estimado'] == "$1,234,567.50 COP"
+        assert recommendations.message.message == (
+            "💡 RECOMENDACIONES INTELIGENTES\n\n"
+            "El sistema de IA ha generado 2 recomendaciones específicas:\n\n"
+            "1. Revisar rubros\n\n"
+            "2. Acelerar frentes\n\n"
+            "📊 Score de Riesgo: 81.23%\n"
+            "🎯 Confianza del Análisis: 45.60%"
+        )
+
+    def test_batch_matches_single_contract_rendering(self):
+        """Test: renderizar un lote produce lo mismo que renderizar cada contrato"""
+        service = IntelligentReportService()
+        contracts = [
+            {'presupuesto_aprobado': 1000.0, 'valor_ejecutado': 1100.0, 'porcentaje_avance_fisico': 50.0},
+            {'presupuesto_aprobado': 5000.0, 'valor_ejecutado': 1000.0, 'fecha_fin_planificada': '2025-09-10'},
+        ]
+        analyses = [
+            _analysis(),
+            _analysis(recommendations=[], severity=SeverityLevel.CRITICAL,
+                      anomalies=[{'severity': 'CRITICAL', 'description': 'Anomalía detectada en fila 1'}]),
+        ]
+        base = [ReportGeneratorService(data=contract).generate_full_report() for contract in contracts]
+
+        batch = service._enhance_sections_batch(base, analyses)
+        batch_ai = service._create_ai_sections_batch(analyses)
+
+        for i, analysis in enumerate(analyses):
+            assert batch[i] == service._enhance_sections_with_ai(base[i], analysis)
+            assert batch_ai[i] == service._create_ai_sections(analysis)
+        assert batch[0][0].message.message.endswith("📊 Confianza del análisis: 45.6%")
+        assert batch_ai[1][1].message.severity == 'CRITICAL'
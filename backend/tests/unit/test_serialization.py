@@ -0,0 +1,53 @@
+"""
+Test unitario para la serialización JSON de resultados del motor de IA
+"""
+import json
+import numpy as np
+import pytest
+from app.core.serialization import FastJSONResponse, dumps
+from app.core.streaming import format_sse
+from app.services.ai_intelligence_engine import AIAnalysisResult, SeverityLevel
+
+
+def _result():
+    return AIAnalysisResult(
+        risk_score=np.float64(0.75),
+        confidence=np.float32(0.5),
+        predictions={'probabilidad_sobrecosto': np.float32(0.25), 'scores': np.array([1, 2])},
+        anomalies=[{'index': np.int64(3), 'values': {'valor_ejecutado': np.float64(10.5)}}],
+        recommendations=[],
+        severity=SeverityLevel.CRITICAL,
+        insights={'total': np.int64(7), 'tasa': float('nan')},
+        processing_time=0.1,
+        memory_usage=0.0,
+    )
+
+
+class TestSerialization:
+    """Tests para app.core.serialization"""
+
+    def test_result_is_slotted(self):
+        """Test: AIAnalysisResult no reserva __dict__ por instancia"""
+        result = _result()
+
+        assert not hasattr(result, '__dict__')
+        with pytest.raises(AttributeError):
+            result.extra = 1
+
+    def test_numpy_types_serialize_natively(self):
+        """Test: escalares y arreglos NumPy, Enum y NaN se serializan sin conversión previa"""
+        body = json.loads(FastJSONResponse(_result().to_dict()).body)
+
+        assert body['severity'] == 'CRITICAL'
+        assert body['confidence'] == 0.5
+        assert body['predictions'] == {'probabilidad_sobrecosto': 0.25, 'scores': [1, 2]}
+        assert body['anomalies'][0]['index'] == 3
+        assert body['insights'] == {'total': 7, 'tasa': None}
+
+    def test_sse_payload_uses_fast_serializer(self):
+        """Test: los eventos SSE aceptan el resultado completo"""
+        event = format_sse('result', _result())
+
+        assert event.startswith('event: result\ndata: ')
+        assert json.loads(event.split('data: ', 1)[1])['risk_score'] == 0.75
+        assert dumps({'ñ': 'á'}).decode() == '{"ñ":"á"}'
@@ -0,0 +1,199 @@
+"""
+Test unitario para el agrupamiento single-flight de análisis idénticos
+"""
+import asyncio
+import time
+import fakeredis
+import pytest
+from app.core.config import settings
+from app.core.single_flight import SingleFlight, single_flight_stats
+from app.services.ai_intelligence_engine import AIAnalysisResult, ContractIntelligenceEngine, analysis_flight
+
+
+CONTRACT = {
+    'numero_contrato': 'C-1',
+    'presupuesto_aprobado': 1000.0,
+    'valor_ejecutado': 1200.0,
+    'porcentaje_avance_fisico': 40.0,
+}
+
+
+def _group(name):
+    return SingleFlight(name, encode=str.encode, decode=bytes.decode)
+
+
+class TestSingleFlight:
+    """Tests para SingleFlight en proceso"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test: las llamadas concurrentes de una clave esperan el mismo cálculo"""
+        group = _group('test-concurrent')
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'informe'
+
+        results = await asyncio.gather(*(group.do('huella', compute) for _ in range(10)))
+
+        assert results == ['informe'] * 10
+        assert len(calls) == 1
+        stats = single_flight_stats()['test-concurrent']
+        assert stats['executions'] == 1
+        assert stats['coalesced_local'] == 9
+        assert stats['coalesce_rate'] == 0.9
+        assert stats['in_flight'] == 0
+
+    @pytest.mark.asyncio
+    async def test_error_is_shared_and_not_retained(self):
+        """Test: un error llega a todos los que esperaban y la siguiente llamada recalcula"""
+        group = _group('test-error')
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError('datos inválidos')
+
+        results = await asyncio.gather(*(group.do('huella', failing) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await group.do('huella', failing)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_followers(self):
+        """Test: si se cancela quien inició el cálculo, los demás reciben el resultado"""
+        group = _group('test-cancel')
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return 'informe'
+
+        first = asyncio.create_task(group.do('huella', compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(group.do('huella', compute))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == 'informe'
+        assert group.executions == 1
+
+
+class TestAnalysisCoalescing:
+    """Tests para el agrupamiento en ContractIntelligenceEngine.analyze_contract_data"""
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_analyses_run_once(self, monkeypatch):
+        """Test: análisis idénticos concurrentes ejecutan las etapas una sola vez"""
+        engine = ContractIntelligenceEngine()
+        detect = engine._detect_anomalies
+        calls = []
+
+        def counted_stage(data):
+            calls.append(1)
+            time.sleep(0.05)
+            return detect(data)
+
+        monkeypatch.setattr(engine, '_detect_anomalies', counted_stage)
+        before = analysis_flight.stats()
+
+        results = await asyncio.gather(*(engine.analyze_contract_data(dict(CONTRACT)) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert analysis_flight.stats()['coalesced_local'] - before['coalesced_local'] == 4
+
+    def test_result_round_trip(self):
+        """Test: un resultado publicado por otra instancia se reconstruye igual"""
+        engine = ContractIntelligenceEngine()
+        result = asyncio.run(engine.analyze_contract_data(CONTRACT))
+
+        restored = analysis_flight.decode(analysis_flight.encode(result))
+
+        assert isinstance(restored, AIAnalysisResult)
+        assert restored.severity == result.severity
+        assert restored.to_dict().keys() == result.to_dict().keys()
+        assert restored.risk_score == pytest.approx(float(result.risk_score))
+
+
+class TestDistributedSingleFlight:
+    """Tests para SingleFlight entre instancias, con dos grupos que comparten un Redis (fakeredis)"""
+
+    @pytest.fixture
+    def groups(self, monkeypatch):
+        monkeypatch.setattr(settings, 'SINGLE_FLIGHT_DISTRIBUTED', True)
+        client = fakeredis.FakeAsyncRedis()
+
+        async def client_factory():
+            return client
+
+        def make():
+            group = SingleFlight('test-distribuido', encode=str.encode, decode=bytes.decode,
+                                 wait_timeout=2, client_factory=client_factory)
+            group.POLL_INTERVAL = 0.01
+            return group
+
+        return make(), make(), client
+
+    @pytest.mark.asyncio
+    async def test_second_instance_waits_for_published_result(self, groups):
+        """Test: otra instancia espera el resultado del dueño del lock en vez de calcularlo"""
+        owner, follower, client = groups
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'informe'
+
+        first = asyncio.create_task(owner.do('huella', compute, distributed=True))
+        await asyncio.sleep(0.02)
+        second = await follower.do('huella', compute, distributed=True)
+
+        assert await first == second == 'informe'
+        assert len(calls) == 1
+        assert follower.coalesced_remote == 1
+        assert await client.get(SingleFlight.LOCK_KEY.format('test-distribuido', 'huella')) is None
+        # Una llamada posterior se sirve del resultado publicado
+        assert await follower.do('huella', compute, distributed=True) == 'informe'
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_owner_failure_falls_back_to_local(self, groups):
+        """Test: si el dueño falla sin publicar, la instancia que esperaba calcula localmente"""
+        owner, follower, _ = groups
+
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise ValueError('worker caído')
+
+        async def compute():
+            return 'local'
+
+        first = asyncio.create_task(owner.do('huella', failing, distributed=True))
+        await asyncio.sleep(0.01)
+        second = await follower.do('huella', compute, distributed=True)
+
+        with pytest.raises(ValueError):
+            await first
+        assert second == 'local'
+        assert follower.executions == 1
+        assert follower.coalesced_remote == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_lock_taken_by_another_owner_is_kept(self, groups):
+        """Test: al terminar, un dueño cuyo lock expiró no borra el lock que tomó otra instancia"""
+        owner, _, client = groups
+        lock_key = SingleFlight.LOCK_KEY.format('test-distribuido', 'huella')
+
+        async def slow():
+            # El lock expiró y lo tomó otra instancia mientras se calculaba
+            await client.set(lock_key, 'otro-dueño')
+            return 'informe'
+
+        assert await owner.do('huella', slow, distributed=True) == 'informe'
+        assert (await client.get(lock_key)).decode() == 'otro-dueño'
@@ -0,0 +1,88 @@
+"""
+Test unitario para la exportación XLSX y el cache de artefactos
+"""
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from app.core.artifact_cache import ArtifactCache
+from app.core.fingerprint import dataframe_fingerprint
+from app.schemas.report import GeneratedReport, ReportSection, TechnicalMessage
+from app.services.ai_intelligence_engine import AIAnalysisResult, SeverityLevel
+from app.services.xlsx_export import write_reports_xlsx
+
+
+class _FakeReportService:
+    """Servicio de informes determinista: falla con presupuestos negativos"""
+
+    async def generate_intelligent_reports_with_analysis(self, contracts, latency_budget=None):
+        outcomes = []
+        for contract in contracts:
+            if contract['presupuesto_aprobado'] < 0:
+                outcomes.append(ValueError('presupuesto inválido'))
+                continue
+            report = GeneratedReport(sections=[ReportSection(
+                title='Avance',
+                data={'avance': contract['porcentaje_avance_fisico']},
+                message=TechnicalMessage(block_name='avance', message='Avance \x07normal', severity='INFO'),
+            )])
+            analysis = AIAnalysisResult(
+                risk_score=0.25, confidence=0.9, predictions={}, anomalies=[], recommendations=['Revisar'],
+                severity=SeverityLevel.WARNING, insights={}, processing_time=0.01, memory_usage=0.0,
+            )
+            outcomes.append((report, analysis))
+        return outcomes
+
+
+class TestXlsxExport:
+    """Tests para write_reports_xlsx"""
+
+    @pytest.mark.asyncio
+    async def test_workbook_rows(self, tmp_path):
+        """Test: una fila de resumen por contrato y una fila por sección, con errores aislados"""
+        df = pd.DataFrame({
+            'presupuesto_aprobado': [1000.0, -1.0],
+            'porcentaje_avance_fisico': [70.0, 10.0],
+        })
+        path = tmp_path / 'informes.xlsx'
+
+        await write_reports_xlsx(df, ['c1', 'c2'], path, _FakeReportService())
+
+        workbook = load_workbook(path, read_only=True)
+        summary = list(workbook['Resumen'].values)
+        sections = list(workbook['Secciones'].values)
+        assert summary[1][:7] == (0, 'c1', 0.25, 'WARNING', 0.9, 0, 1)
+        assert summary[2][1] == 'c2' and summary[2][-1] == 'presupuesto inválido'
+        assert len(sections) == 2
+        assert sections[1][:6] == (0, 'c1', 'Avance', 'avance', 'INFO', 'Avance normal')
+
+
+class TestArtifactCache:
+    """Tests para ArtifactCache y dataframe_fingerprint"""
+
+    def test_fingerprint_ignores_column_order(self):
+        """Test: la huella depende del contenido, no del orden de columnas"""
+        df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+
+        assert dataframe_fingerprint(df, 'xlsx') == dataframe_fingerprint(df[['b', 'a']], 'xlsx')
+        assert dataframe_fingerprint(df, 'xlsx') != dataframe_fingerprint(df, 'pdf')
+        assert dataframe_fingerprint(df) != dataframe_fingerprint(df.assign(a=[1, 3]))
+
+    @pytest.mark.asyncio
+    async def test_hit_and_eviction(self, tmp_path):
+        """Test: un artefacto cacheado no se regenera y se expulsa el menos usado"""
+        cache = ArtifactCache(directory=str(tmp_path), max_bytes=15)
+        writes = []
+
+        async def write(path):
+            writes.append(path)
+            path.write_bytes(b'0123456789')
+
+        assert cache.get('aa11', '.xlsx') is None
+        first = await cache.put('aa11', '.xlsx', write)
+        assert cache.get('aa11', '.xlsx') == first
+        assert first.read_bytes() == b'0123456789'
+
+        await cache.put('bb22', '.xlsx', write)
+        assert len(writes) == 2
+        assert cache.get('aa11', '.xlsx') is None
+        assert cache.get('bb22', '.xlsx') is not None